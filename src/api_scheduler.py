@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Agendador central das chamadas à API da Garmin.
+
+Toda chamada do cliente entregue pelo garmin_session passa por aqui:
+  - token bucket: no máximo RATE chamadas/s, com rajadas de até BURST;
+  - no máximo MAX_CONCURRENT chamadas em andamento, não importa quantos
+    workers os pools em massa usem;
+  - 429/5xx: espera o Retry-After (ou backoff exponencial com jitter) e a
+    pausa vale para todas as threads. Num 429 a taxa cai pela metade e
+    volta a subir aos poucos enquanto as respostas vierem ok, então os
+    lotes grandes se acomodam na maior taxa que a conta aguenta.
+
+Criações (POST) só são repetidas em 429: num 5xx não dá para saber se o
+treino foi criado ou não.
+
+run_async() é a mesma fila para corrotinas (garmin_async): taxa e backoff
+são os mesmos da conta; a espera é um asyncio.sleep e não prende thread.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+
+from metrics import GARMIN_WAIT, GARMIN_RETRIES
+
+try:
+    from garminconnect import GarminConnectConnectionError, GarminConnectTooManyRequestsError as TooManyRequestsError
+except ImportError:
+    GarminConnectConnectionError = TooManyRequestsError = None
+
+# Erro HTTP do cliente do garminconnect >= 0.3, que não guarda a resposta:
+# raise GarminConnectConnectionError(f"API Error {status} - {mensagem}")
+GARMINCONNECT_STATUS = re.compile(r'API Error ([1-5]\d\d)\b')
+
+RATE = float(os.getenv("GARMIN_RATE_LIMIT", "4"))          # chamadas por segundo
+BURST = int(os.getenv("GARMIN_RATE_BURST", "8"))
+MAX_CONCURRENT = int(os.getenv("GARMIN_MAX_CONCURRENT", "6"))
+MAX_RETRIES = int(os.getenv("GARMIN_MAX_RETRIES", "4"))
+
+BACKOFF_BASE = 1.0      # segundos
+BACKOFF_MAX = 30.0
+MIN_RATE = 0.5          # piso da taxa depois de vários 429
+RECOVERY_STEP = 0.5     # chamadas/s a mais...
+RECOVERY_EVERY = 10     # ...a cada N sucessos seguidos
+SLOWDOWN_WINDOW = 1.0   # 429s dentro desta janela (s) contam como um só corte
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+
+def error_chain(exc):
+    """A exceção e as que ela embrulha (error do garth, __cause__, __context__)."""
+    seen = set()
+    stack = [exc]
+    while stack:
+        current = stack.pop()
+        if current is None or id(current) in seen: continue
+        seen.add(id(current))
+        yield current
+        stack.extend([getattr(current, 'error', None), current.__cause__, current.__context__])
+
+
+def error_response(exc):
+    """Procura a resposta HTTP dentro da exceção (garminconnect/garth/requests/curl_cffi)."""
+    for current in error_chain(exc):
+        response = getattr(current, 'response', None)
+        if response is not None and getattr(response, 'status_code', None):
+            return response
+    return None
+
+
+def error_status(exc):
+    """
+    Status HTTP de uma exceção da Garmin (None se não der para saber): o da
+    resposta, senão um atributo status_code/status da própria exceção, senão
+    o que o garminconnect registra sem resposta (TooManyRequests = 429 e o
+    "API Error NNN" no começo da mensagem do GarminConnectConnectionError).
+    Texto livre não conta: "falhou após 500 ms" não é um HTTP 500.
+    """
+    response = error_response(exc)
+    if response is not None: return response.status_code
+    for current in error_chain(exc):
+        for attr in ('status_code', 'status'):
+            value = getattr(current, attr, None)
+            if isinstance(value, int) and not isinstance(value, bool) and 100 <= value < 600:
+                return value
+        if TooManyRequestsError is not None and isinstance(current, TooManyRequestsError):
+            return 429
+        if GarminConnectConnectionError is not None and isinstance(current, GarminConnectConnectionError):
+            match = GARMINCONNECT_STATUS.match(str(current))
+            if match: return int(match.group(1))
+    return None
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After em segundos: aceita delta-seconds ("120") e HTTP-date ("Wed, 21 Oct 2015 07:28:00 GMT")."""
+    if value is None: return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None: return None
+    if when.tzinfo is None: when = when.replace(tzinfo=timezone.utc)   # "-0000": UTC
+    now = now if now is not None else time.time()
+    return max(0.0, when.timestamp() - now)
+
+
+def retry_after(exc):
+    """Segundos pedidos pelo servidor no header Retry-After, se houver."""
+    response = error_response(exc)
+    headers = getattr(response, 'headers', None) if response is not None else None
+    return parse_retry_after(headers.get('Retry-After')) if headers else None
+
+
+def is_retryable(status):
+    return status == 429 or (status is not None and status >= 500)
+
+
+def is_idempotent(method_name, kwargs):
+    """Dá para repetir a chamada em 5xx sem risco de duplicar algo?"""
+    if method_name in ("connectapi", "download"):
+        return str(kwargs.get("method", "GET")).upper() in IDEMPOTENT_METHODS
+    return method_name.startswith("get_")
+
+
+class TokenBucket:
+    """Limite de taxa compartilhado entre as threads, com ajuste após 429."""
+
+    def __init__(self, rate=RATE, burst=BURST, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._last_slowdown = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Pega um token se houver (retorna 0); senão, quantos segundos esperar."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.reserve()
+            if not wait: return
+            time.sleep(wait)
+
+    def slow_down(self):
+        """429: corta a taxa pela metade e descarta a rajada acumulada."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+            self._successes = 0
+            # Vários workers recebem 429 da mesma rajada: corta uma vez só
+            if self._updated - self._last_slowdown < SLOWDOWN_WINDOW: return
+            self._last_slowdown = self._updated
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def record_success(self):
+        with self._lock:
+            if self.rate >= self.max_rate: return
+            self._successes += 1
+            if self._successes >= RECOVERY_EVERY:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + RECOVERY_STEP)
+                self._successes = 0
+
+
+class Backoff:
+    """Pausa compartilhada entre as threads quando a Garmin pede calma."""
+
+    def __init__(self, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+        self.base = base
+        self.maximum = maximum
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+
+    def remaining(self):
+        with self._lock:
+            return max(0.0, self._pause_until - time.monotonic())
+
+    def wait(self):
+        while True:
+            remaining = self.remaining()
+            if not remaining: return
+            time.sleep(remaining)
+
+    def penalize(self, attempt, exc):
+        delay = retry_after(exc)
+        if delay is None:
+            delay = min(self.maximum, self.base * (2 ** attempt))
+            delay = random.uniform(delay / 2, delay)
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + delay)
+        return delay
+
+
+class ApiScheduler:
+    """Fila única das chamadas de uma conta: taxa, concorrência e retries."""
+
+    def __init__(self, rate=RATE, burst=BURST, max_concurrent=MAX_CONCURRENT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.bucket = TokenBucket(rate, burst)
+        self.backoff = Backoff(backoff_base, backoff_max)
+        self.max_retries = max_retries
+        self.max_concurrent = max(1, max_concurrent)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._async_slots = None    # Criado no event loop do garmin_async
+
+    def run(self, call, retry_server_errors=True, label=""):
+        """
+        Executa call() quando houver token e vaga livre. Repete em 429 (e em
+        5xx, se retry_server_errors); outras falhas sobem na hora.
+        """
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            self.backoff.wait()
+            self.bucket.acquire()
+            with self._slots:
+                GARMIN_WAIT.observe(time.perf_counter() - queued_at)
+                try:
+                    result = call()
+                except Exception as e:
+                    error, status = e, error_status(e)
+                else:
+                    self.bucket.record_success()
+                    return result
+
+            # Fora do slot: quem está esperando não ocupa vaga
+            self._penalize(error, status, attempt, retry_server_errors, label)
+            attempt += 1
+
+    async def run_async(self, call, retry_server_errors=True, label=""):
+        """Como run(), mas call() é uma corrotina e as esperas não prendem thread."""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrent)
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            while True:
+                # Backoff primeiro: durante a pausa nenhum token é consumido
+                wait = self.backoff.remaining() or self.bucket.reserve()
+                if not wait: break
+                await asyncio.sleep(wait)
+            async with self._async_slots:
+                GARMIN_WAIT.observe(time.perf_counter() - queued_at)
+                try:
+                    result = await call()
+                except Exception as e:
+                    error, status = e, error_status(e)
+                else:
+                    self.bucket.record_success()
+                    return result
+
+            self._penalize(error, status, attempt, retry_server_errors, label)
+            attempt += 1
+
+    def _penalize(self, error, status, attempt, retry_server_errors, label):
+        """Agenda a pausa antes da próxima tentativa; relança o erro se não for para repetir."""
+        retryable = status == 429 or (retry_server_errors and is_retryable(status))
+        if not retryable or attempt >= self.max_retries: raise error
+        if status == 429: self.bucket.slow_down()
+        GARMIN_RETRIES.inc(status=status)
+        delay = self.backoff.penalize(attempt, error)
+        print(f"⏳ {label}: HTTP {status}, nova tentativa em {delay:.1f}s")
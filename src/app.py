@@ -1,133 +1,292 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
 import json
+import time
 import traceback
-import pandas as pd
-import unicodedata
-from flask import Flask, render_template, request, jsonify
-from garminconnect import Garmin
+from datetime import datetime
+from itertools import chain
+from flask import Flask, Response, g, render_template, request, jsonify
 from dotenv import load_dotenv
 
 # --- CONFIGURAÇÕES ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 
+# Permite importar os módulos de src/ tanto via run.py quanto via python src/app.py
+if BASE_DIR not in sys.path: sys.path.insert(0, BASE_DIR)
+from search_engine import APPROXIMATE, FUZZY_MIN_CONFIDENCE
+from catalog_holder import CatalogHolder
+from csv_ingest import WorkoutCsv, CsvFormatError
+from http_cache import PrecompressedBody
+from workout_store import WorkoutStore, fetch_summaries_async, name_filter
+import garmin_session
+import garmin_async
+import metrics
+from jobs import JobRunner
+from bulk_ops import check_unique_names, run_bulk, delete_workouts_bulk, delete_workouts_bulk_async, sync_workouts_bulk, sync_workouts_bulk_async, summarize, DELETED, NOT_FOUND, FAILED, CREATED, UPDATED, UNCHANGED, CANCELLED
+
 ENV_PATH = os.path.join(ROOT_DIR, '.env')
 DB_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.json')
+CATALOG_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.bin')
 SEARCH_RULES_FILE = os.path.join(ROOT_DIR, 'data', 'config', 'search_rules.json')
+WORKOUT_STORE_FILE = os.path.join(ROOT_DIR, 'data', 'workouts.db')
+ACCOUNT_STORES_DIR = os.path.join(ROOT_DIR, 'data', 'accounts')     # Espelho de cada conta extra
 
 load_dotenv(ENV_PATH)
 app = Flask(__name__)
 
-# Caches globais
-EXERCISE_CACHE = {}         
-INTERNAL_KEY_MAP = {}       
-SEARCH_RULES_CACHE = {}
-garmin_client = None
+# Processos para lotes muito grandes de busca (0 = tudo no processo atual)
+MATCH_PROCESSES = int(os.getenv("MATCH_PROCESSES", "0") or 0)
+# Downloads simultâneos de detalhes de treino no PULL
+PULL_WORKERS = int(os.getenv("PULL_WORKERS", "8") or 8)
+PULL_MAX_WORKERS = 32
+# Deleções simultâneas no gerenciador
+DELETE_WORKERS = int(os.getenv("DELETE_WORKERS", "4") or 4)
+DELETE_MAX_WORKERS = 16
+# Envios simultâneos no PUSH em lote
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "6") or 6)
+PUSH_MAX_WORKERS = 16
+# Contas atendidas ao mesmo tempo no PUSH para várias contas
+FANOUT_ACCOUNTS = int(os.getenv("FANOUT_ACCOUNTS", "8") or 8)
+# Treinos por página na listagem do gerenciador
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 500
+
+def build_responses(snapshot):
+    """Corpos de /api/exercises e /api/search_rules, montados uma vez por versão do catálogo"""
+    exercises = sorted(snapshot.exercises.values(), key=lambda x: x['label'])
+    snapshot.responses['exercises'] = PrecompressedBody.from_json(exercises)
+    snapshot.responses['search_rules'] = PrecompressedBody.from_json(snapshot.rules)
+
+# Catálogo + regras em memória, recarregados a quente quando os arquivos mudam
+CATALOG = CatalogHolder(CATALOG_FILE, DB_FILE, SEARCH_RULES_FILE, on_load=build_responses)
+WORKOUT_STORE = WorkoutStore(WORKOUT_STORE_FILE)
+ACCOUNT_STORES = {}
+# PUSH/PULL/deleção em segundo plano (progresso por SSE)
+JOBS = JobRunner()
 
 # --- FUNÇÕES AUXILIARES ---
 
-def normalize_text(text):
-    if not isinstance(text, str): return ""
-    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-
 def load_data():
-    """Carrega dados e cria índices para busca rápida"""
-    global EXERCISE_CACHE, SEARCH_RULES_CACHE, INTERNAL_KEY_MAP
-    
-    if not EXERCISE_CACHE:
-        try:
-            if os.path.exists(DB_FILE):
-                with open(DB_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    EXERCISE_CACHE = {item['id']: item for item in data}
-                    INTERNAL_KEY_MAP = {item.get('internal_key'): item['id'] for item in data if 'internal_key' in item}
-                    print(f"📦 DB Carregado: {len(EXERCISE_CACHE)} itens.")
-            else:
-                print(f"❌ DB não encontrado em: {DB_FILE}")
-        except Exception as e:
-            print(f"❌ Erro ao carregar DB: {e}")
-
-    try:
-        if os.path.exists(SEARCH_RULES_FILE):
-            with open(SEARCH_RULES_FILE, 'r', encoding='utf-8') as f:
-                SEARCH_RULES_CACHE = json.load(f)
-    except Exception as e:
-        print(f"⚠️ Erro ao carregar regras: {e}")
-        SEARCH_RULES_CACHE = {}
-
-def get_garmin_client():
-    global garmin_client
-    email = os.getenv("GARMIN_EMAIL")
-    password = os.getenv("GARMIN_PASSWORD")
-    
-    if garmin_client:
-        try:
-            garmin_client.connectapi("/userprofile-service/userprofile/user-settings")
-            return garmin_client
-        except:
-            garmin_client = None
-
+    """Retrato atual do catálogo (sem I/O depois da primeira carga)"""
+    return CATALOG.current()
+
+def get_garmin_client(account=None):
+    """
+    Cliente da sessão da conta (a do .env por padrão; tokens em disco, renovados só em 401).
+    Com o curl_cffi disponível, o cliente assíncrono (pool keep-alive no loop do processo);
+    a thread da requisição ainda espera o resultado em garmin_async.run()
+    """
     try:
-        client = Garmin(email, password)
-        client.login()
-        garmin_client = client
-        return garmin_client
+        return garmin_async.get_client(account) if garmin_async.AVAILABLE else garmin_session.get_client(account)
     except Exception as e:
-        print(f"Auth Error: {e}")
+        print(f"Auth Error ({account or garmin_session.DEFAULT_ACCOUNT}): {e}")
         return None
 
+def account_store(account=None):
+    """Espelho local da conta: o principal para a do .env, um arquivo por conta extra"""
+    if account in (None, garmin_session.DEFAULT_ACCOUNT): return WORKOUT_STORE
+    store = ACCOUNT_STORES.get(account)
+    if store is None:
+        store = ACCOUNT_STORES.setdefault(account, WorkoutStore(os.path.join(ACCOUNT_STORES_DIR, account, 'workouts.db')))
+    return store
+
 def resolve_exercise_label(category, internal_name):
     if not category or not internal_name: return None, internal_name
     cat_upper = str(category).upper()
     name_upper = str(internal_name).upper()
 
+    data = load_data()
+    exercises = data.exercises
+
     composite_id = f"{cat_upper}_{name_upper}"
-    if composite_id in EXERCISE_CACHE:
-        return composite_id, EXERCISE_CACHE[composite_id]['label']
+    if composite_id in exercises:
+        return composite_id, exercises[composite_id]['label']
     
-    if name_upper in INTERNAL_KEY_MAP:
-        real_id = INTERNAL_KEY_MAP[name_upper]
-        return real_id, EXERCISE_CACHE[real_id]['label']
+    if name_upper in data.internal_keys:
+        real_id = data.internal_keys[name_upper]
+        return real_id, exercises[real_id]['label']
     
-    if name_upper in EXERCISE_CACHE:
-        return name_upper, EXERCISE_CACHE[name_upper]['label']
+    if name_upper in exercises:
+        return name_upper, exercises[name_upper]['label']
 
     return None, internal_name 
 
 def find_exercise_id(query):
-    if not query: return None, ""
-    query_norm = normalize_text(query)
-    
-    if "_" in query and query.isupper() and query in EXERCISE_CACHE:
-        return query, EXERCISE_CACHE[query]['label']
-
-    search_phrases = set()
-    search_phrases.add(query_norm)
-    for rule_key, synonyms in SEARCH_RULES_CACHE.items():
-        norm_key = normalize_text(rule_key)
-        norm_synonyms = [normalize_text(s) for s in synonyms]
-        if query_norm in norm_key or any(query_norm in s for s in norm_synonyms):
-            search_phrases.add(norm_key)
-            for s in norm_synonyms: search_phrases.add(s)
-
-    best_match = None
-    best_score = 0
-    for ex_id, ex_data in EXERCISE_CACHE.items():
-        db_text = normalize_text((ex_data.get('search_term', '') or '') + " " + ex_data['label'])
-        for phrase in search_phrases:
-            if phrase in db_text:
-                score = len(phrase)
-                if db_text.startswith(phrase): score += 50
-                len_diff = len(db_text) - len(phrase)
-                score -= (len_diff * 0.1)
-                if score > best_score:
-                    best_score = score
-                    best_match = ex_data
-
-    if best_match and best_score > 3:
-        return best_match['id'], best_match['label']
-    return None, ""
+    index = load_data().index
+    if not query or index is None: return None, ""
+    return index.find(query)
+
+def match_exercises(queries, index=None):
+    """Busca em lote: [(id, label, confiança, nível)] na mesma ordem dos termos"""
+    if index is None: index = load_data().index
+    if index is None: return [(None, "", 0.0, None) for _ in queries]
+    return index.find_many(queries, processes=MATCH_PROCESSES, scored=True)
+
+def send_precompressed(body):
+    """Resposta pronta: 304 se o navegador já tem essa versão nessa codificação; senão os bytes já comprimidos"""
+    encoding, data = body.choose(lambda name: request.accept_encodings[name] > 0)
+    etag = body.etag_for(encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(data, content_type=body.content_type)
+        if encoding: response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'     # Sempre revalida: o catálogo pode ser recarregado
+    return response
+
+def int_param(data, key, default, low, high=None):
+    """Inteiro do corpo JSON (ou da query string), limitado a [low, high]; ausente, null ou vazio usa o padrão. ValueError se não for inteiro"""
+    value = data.get(key)
+    if value is None or value == '': return default
+    if isinstance(value, bool): raise ValueError(f"'{key}' deve ser um número inteiro")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' deve ser um número inteiro")
+    value = max(low, value)
+    return value if high is None else min(value, high)
+
+def date_param(data, key):
+    """Data YYYY-MM-DD do corpo JSON, normalizada (ex.: 2024-1-5 -> 2024-01-05); ausente, null ou vazio: None. ValueError se não for data"""
+    value = data.get(key)
+    if value is None or value == '': return None
+    try:
+        if not isinstance(value, str): raise ValueError()
+        return datetime.strptime(value.strip(), '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise ValueError(f"'{key}' deve ser uma data no formato AAAA-MM-DD")
+
+def is_weak_match(tier):
+    """Casamento aproximado (palpite de erro de digitação): a interface pede conferência"""
+    return tier == APPROXIMATE
+
+def build_workout_payload(workout_name, raw_steps, exercises=None):
+    """Monta o JSON de treino de força da Garmin a partir das linhas do editor"""
+    if exercises is None: exercises = load_data().exercises
+    workout_steps = []
+    global_order_counter = 1
+
+    for i, step in enumerate(raw_steps):
+        ex_id = step.get('exerciseId')
+        ex_data = exercises.get(ex_id)
+
+        category = "STRENGTH_EQUIPMENT"
+        internal_name = "UNIDENTIFIED"
+
+        if ex_data:
+            category = ex_data.get("category", "STRENGTH_EQUIPMENT")
+            internal_name = ex_data.get("internal_key", ex_id)
+        elif ex_id:
+            parts = ex_id.split('_', 1)
+            if len(parts) > 1:
+                category, internal_name = parts[0], parts[1]
+
+        series = int(step.get('sets', 1))
+        reps = int(step.get('reps', 10))
+        peso = float(step.get('weight', 0) or 0)
+        descanso = int(step.get('restDuration', 0) or step.get('rest', 0) or 0)
+        nota = step.get('note', '')
+
+        child_id = i + 1 
+        final_reps = reps if reps > 0 else 1
+
+        exercise_step = {
+            "type": "ExecutableStepDTO",
+            "stepId": None,
+            "stepOrder": None,
+            "childStepId": child_id, 
+            "description": nota if nota else None,
+            "stepType": { "stepTypeId": 3, "stepTypeKey": "interval", "displayOrder": 3 },
+            "category": category,        
+            "exerciseName": internal_name,   
+            "endCondition": { "conditionTypeId": 10, "conditionTypeKey": "reps", "displayOrder": 10 },
+            "endConditionValue": final_reps,
+            "targetType": { "workoutTargetTypeId": 1, "workoutTargetTypeKey": "no.target" }
+        }
+        if peso > 0:
+            exercise_step["weightValue"] = peso
+            exercise_step["weightUnit"] = {"unitKey": "kilogram"} 
+
+        rest_step = None
+        if descanso > 0:
+            rest_step = {
+                "type": "ExecutableStepDTO",
+                "stepId": None,
+                "stepOrder": None,
+                "childStepId": child_id,
+                "description": f"{descanso}s",
+                "stepType": { "stepTypeId": 4, "stepTypeKey": "rest", "displayOrder": 4 },
+                "endCondition": { "conditionTypeId": 2, "conditionTypeKey": "time", "displayOrder": 2 },
+                "endConditionValue": descanso,
+                "targetType": { "workoutTargetTypeId": 1, "workoutTargetTypeKey": "no.target" }
+            }
+
+        if series > 1:
+            group_order = global_order_counter
+            global_order_counter += 1
+            block_steps = [exercise_step]
+            exercise_step["stepOrder"] = global_order_counter
+            global_order_counter += 1
+
+            if rest_step:
+                rest_step["stepOrder"] = global_order_counter
+                block_steps.append(rest_step)
+                global_order_counter += 1
+
+            workout_steps.append({
+                "type": "RepeatGroupDTO",
+                "stepId": None,
+                "stepOrder": group_order,
+                "stepType": { "stepTypeId": 6, "stepTypeKey": "repeat", "displayOrder": 6 },
+                "childStepId": child_id,
+                "numberOfIterations": series,
+                "smartRepeat": False,
+                "endCondition": { "conditionTypeId": 7, "conditionTypeKey": "iterations", "displayOrder": 7 },
+                "workoutSteps": block_steps,
+                "skipLastRestStep": False
+            })
+        else:
+            exercise_step["stepOrder"] = global_order_counter
+            workout_steps.append(exercise_step)
+            global_order_counter += 1
+            if rest_step:
+                rest_step["stepOrder"] = global_order_counter
+                workout_steps.append(rest_step)
+                global_order_counter += 1
+
+    return {
+        "workoutName": workout_name,
+        "sportType": { "sportTypeId": 5, "sportTypeKey": "strength_training", "displayOrder": 5 },
+        "workoutSegments": [{
+            "segmentOrder": 1,
+            "sportType": { "sportTypeId": 5, "sportTypeKey": "strength_training", "displayOrder": 5 },
+            "workoutSteps": workout_steps
+        }]
+    }
+
+# --- MÉTRICAS ---
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    # Respostas em stream (NDJSON) são medidas até o primeiro byte
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<desconhecida>"
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started,
+                                     route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def api_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 # --- ROTAS ---
 
@@ -137,73 +296,192 @@ def index():
 
 @app.route('/api/exercises')
 def api_exercises():
-    load_data()
-    lista = list(EXERCISE_CACHE.values())
-    lista.sort(key=lambda x: x['label'])
-    return jsonify(lista)
+    return send_precompressed(load_data().responses['exercises'])
     
+@app.route('/api/search')
+def api_search():
+    """Autocomplete do editor: top-k exercícios já ranqueados no servidor"""
+    index = load_data().index
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        limit = 20
+    limit = max(1, min(limit, 100))
+
+    if index is None: return jsonify({"query": query, "phrases": [], "results": []})
+
+    results, phrases = index.search(query, limit)
+    items = [
+        {"id": ex['id'], "label": ex['label'], "category": ex.get('category'), "score": round(score, 2)}
+        for ex, score in results
+    ]
+    if not items and phrases:
+        # Nada por substring: sugere o melhor palpite tolerante a erros de digitação
+        pos, confidence = index.find_approximate(phrases[0])
+        if pos is not None and confidence >= FUZZY_MIN_CONFIDENCE:
+            ex = index.entries[pos]
+            items.append({"id": ex['id'], "label": ex['label'], "category": ex.get('category'),
+                          "score": None, "approximate": True, "confidence": round(confidence, 2)})
+    return jsonify({"query": query, "phrases": phrases, "results": items})
+
 @app.route('/api/search_rules')
 def api_search_rules():
-    load_data()
-    return jsonify(SEARCH_RULES_CACHE)
+    return send_precompressed(load_data().responses['search_rules'])
 
 # --- CORREÇÃO AQUI: Importação CSV Completa ---
 @app.route('/api/import_csv', methods=['POST'])
 def api_import_csv():
     try:
         if 'file' not in request.files: return jsonify({"error": "Nenhum arquivo"}), 400
-        file = request.files['file']
-        
-        # Lê CSV
-        df = pd.read_csv(file)
-        # Normaliza colunas
-        df.columns = [c.lower().strip() for c in df.columns]
-        load_data()
-        
-        imported_rows = []
-        for _, row in df.iterrows():
-            # Limpeza segura de NaNs (Not a Number) que o Pandas gera
-            def clean_val(val):
-                s = str(val).strip()
-                return "" if s.lower() == 'nan' else s
-
-            nota = clean_val(row.get('nota_personalizada', ''))
-            col_ex = clean_val(row.get('exercicio', ''))
-            
-            # Prioridade: Coluna Exercício > Nota Personalizada
-            search_term = col_ex if col_ex else nota
-            
-            # Tenta encontrar ID
-            found_id = None
-            found_label = ""
-            if search_term:
-                found_id, found_label = find_exercise_id(search_term)
-
-            # Valores numéricos com fallback seguro para zero/padrão
-            def get_num(key, default):
-                try:
-                    val = row.get(key)
-                    if pd.isna(val) or str(val).strip() == '': return default
-                    return float(val)
-                except: return default
 
+        # Lê o upload em streaming, linha a linha, já validando as colunas
+        sheet = WorkoutCsv(request.files['file'].stream)
+        rows = list(sheet)
+        errors_by_line = {}
+        for error in sheet.errors:
+            errors_by_line.setdefault(error['line'], []).append(error['message'])
+
+        # Prioridade: Coluna Exercício > Nota Personalizada
+        search_terms = [row['exercicio'] or row['nota_personalizada'] for row in rows]
+
+        # Resolve cada termo único uma vez só (o mesmo exercício se repete nas semanas)
+        matches = match_exercises(search_terms)
+
+        imported_rows = []
+        for row, search_term, (found_id, found_label, confidence, tier) in zip(rows, search_terms, matches):
             imported_rows.append({
-                "workoutName": clean_val(row.get('treino', 'Treino Importado')),
+                "workoutName": row['treino'],
                 "exerciseId": found_id, 
                 "exerciseLabel": found_label if found_id else "",
                 "exerciseSearch": found_label if found_id else search_term, 
-                "note": nota, 
-                "sets": int(get_num('series', 3)),
-                "reps": int(get_num('reps', 10)),
-                "weight": get_num('peso_kg', 0),
-                "rest": int(get_num('intervalo_segundos', 60))
+                "matchConfidence": round(confidence, 2),
+                "matchWeak": is_weak_match(tier),
+                "note": row['nota_personalizada'], 
+                "sets": row['series'],
+                "reps": row['reps'],
+                "weight": row['peso_kg'],
+                "rest": row['intervalo_segundos'],
+                "importErrors": errors_by_line.get(row['line'], [])
             })
             
         return jsonify(imported_rows)
+    except CsvFormatError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/match_batch', methods=['POST'])
+def api_match_batch():
+    """Resolve vários termos de uma vez (deduplicados e memoizados)"""
+    try:
+        terms = (request.json or {}).get('terms', [])
+        if not isinstance(terms, list): return jsonify({"error": "terms deve ser uma lista"}), 400
+        terms = [t if isinstance(t, str) else "" for t in terms]
+
+        index = load_data().index
+        matches = match_exercises(terms, index)
+        return jsonify({
+            "matches": [
+                {"term": t, "id": found_id, "label": found_label, "confidence": round(confidence, 2),
+                 "approximate": tier == APPROXIMATE, "weak": is_weak_match(tier)}
+                for t, (found_id, found_label, confidence, tier) in zip(terms, matches)
+            ],
+            "unique": len({index.term_key(t) for t in terms}) if index else 0
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def push_payloads(payloads, workers=PUSH_WORKERS, on_result=None, cancel=None, account=None):
+    """PUSH idempotente: pula os iguais, atualiza (PUT) os alterados e cria os novos"""
+    def require_client():
+        client = get_garmin_client(account)
+        if not client: raise ConnectionError("Erro de Autenticação")
+        return client
+
+    # Espelho vazio: o sync_workouts_bulk lista a conta antes de decidir POST/PUT
+    store = account_store(account)
+    if garmin_async.AVAILABLE:
+        results = garmin_async.run(sync_workouts_bulk_async(require_client, payloads, store, workers=workers,
+                                                            on_result=on_result, cancel=cancel))
+    else:
+        results = sync_workouts_bulk(require_client, payloads, store, workers=workers,
+                                     on_result=on_result, cancel=cancel)
+    for payload, result in zip(payloads, results):
+        if "400" in (result['error'] or ""):
+            print(f"\n❌ ERRO 400 ({result['workoutName']}) - DUMP:\n", json.dumps(payload, indent=2))
+    return results
+
+def push_summary(results):
+    """Contagem do PUSH em lote: criados, atualizados, sem alterações e falhas"""
+    counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0, FAILED: 0, CANCELLED: 0}
+    for r in results: counts[FAILED if r['error'] and r['action'] != CANCELLED else r['action']] += 1
+    return {
+        "success": counts[FAILED] == 0 and counts[CANCELLED] == 0,
+        "created": counts[CREATED],
+        "updated": counts[UPDATED],
+        "unchanged": counts[UNCHANGED],
+        "failed": counts[FAILED],
+        "cancelled": counts[CANCELLED],
+    }
+
+def push_fanout(payloads, accounts, workers=PUSH_WORKERS, on_result=None, cancel=None):
+    """
+    Mesmo lote para várias contas (FANOUT_ACCOUNTS ao mesmo tempo). Cada
+    conta tem a sua sessão, fila e espelho: a falha de uma não afeta as
+    outras. Um resultado por conta, na ordem pedida.
+    """
+    pool = garmin_session.get_pool()
+    names = {a['id']: a['name'] for a in pool.accounts()}
+
+    def push_account(account):
+        try:
+            results = push_payloads(payloads, workers, cancel=cancel, account=account)
+        except Exception as e:
+            print(f"❌ PUSH para {account}: {e}")
+            return {"account": account, "name": names.get(account, account), "success": False, "error": str(e)}
+        summary = push_summary(results)
+        failed = [r for r in results if r['error'] and r['action'] != CANCELLED]
+        return dict(summary, account=account, name=names.get(account, account),
+                    error=f"{len(failed)} treinos falharam" if failed else None, results=results)
+
+    def skipped(account):
+        return {"account": account, "name": names.get(account, account), "success": False, "error": "Cancelado",
+                "cancelled": len(payloads)}
+
+    return run_bulk(accounts, push_account, FANOUT_ACCOUNTS, on_result, cancel, skipped)
+
+def fanout_summary(results):
+    return {
+        "success": all(r['success'] for r in results),
+        "accounts": len(results),
+        "failedAccounts": [r['account'] for r in results if not r['success']],
+        **{key: sum(r.get(key, 0) for r in results) for key in ("created", "updated", "unchanged", "failed", "cancelled")},
+    }
+
+def batch_payloads(data, route):
+    """Valida o corpo de um PUSH em lote e monta os payloads. (payloads, workers, contas ou None) ou ValueError"""
+    workouts = data.get('workouts', [])
+    workers = int_param(data, 'workers', PUSH_WORKERS, 1, PUSH_MAX_WORKERS)
+    if not workouts: raise ValueError("Nenhum treino enviado")
+    if any(not w.get('workoutName') for w in workouts): raise ValueError("Nome obrigatório")
+    check_unique_names(workouts)
+
+    accounts = data.get('accounts')
+    if accounts is not None:
+        if not isinstance(accounts, list) or not accounts: raise ValueError("Nenhuma conta selecionada")
+        accounts = list(dict.fromkeys(str(a) for a in accounts))
+        pool = garmin_session.get_pool()
+        unknown = [a for a in accounts if a not in pool]
+        if unknown: raise ValueError(f"Conta desconhecida: {', '.join(unknown)}")
+
+    exercises = load_data().exercises   # Mesmo retrato para o lote inteiro
+    with metrics.PAYLOAD_BUILD_LATENCY.time(route=route):
+        payloads = [build_workout_payload(w['workoutName'], w.get('steps', []), exercises) for w in workouts]
+    return payloads, workers, accounts
+
 @app.route('/api/upload', methods=['POST'])
 def api_upload():
     try:
@@ -212,207 +490,211 @@ def api_upload():
         raw_steps = data.get('steps', [])
         if not workout_name: return jsonify({"error": "Nome obrigatório"}), 400
 
-        load_data()
-        client = get_garmin_client()
-        if not client: return jsonify({"error": "Erro de Autenticação"}), 500
-
-        workout_steps = []
-        global_order_counter = 1
-
-        for i, step in enumerate(raw_steps):
-            ex_id = step.get('exerciseId')
-            ex_data = EXERCISE_CACHE.get(ex_id)
-            
-            category = "STRENGTH_EQUIPMENT"
-            internal_name = "UNIDENTIFIED"
-            
-            if ex_data:
-                category = ex_data.get("category", "STRENGTH_EQUIPMENT")
-                internal_name = ex_data.get("internal_key", ex_id)
-            elif ex_id:
-                parts = ex_id.split('_', 1)
-                if len(parts) > 1:
-                    category, internal_name = parts[0], parts[1]
-
-            series = int(step.get('sets', 1))
-            reps = int(step.get('reps', 10))
-            peso = float(step.get('weight', 0) or 0)
-            descanso = int(step.get('restDuration', 0) or step.get('rest', 0) or 0)
-            nota = step.get('note', '')
-
-            child_id = i + 1 
-            final_reps = reps if reps > 0 else 1
-
-            exercise_step = {
-                "type": "ExecutableStepDTO",
-                "stepId": None,
-                "stepOrder": None,
-                "childStepId": child_id, 
-                "description": nota if nota else None,
-                "stepType": { "stepTypeId": 3, "stepTypeKey": "interval", "displayOrder": 3 },
-                "category": category,        
-                "exerciseName": internal_name,   
-                "endCondition": { "conditionTypeId": 10, "conditionTypeKey": "reps", "displayOrder": 10 },
-                "endConditionValue": final_reps,
-                "targetType": { "workoutTargetTypeId": 1, "workoutTargetTypeKey": "no.target" }
-            }
-            if peso > 0:
-                exercise_step["weightValue"] = peso
-                exercise_step["weightUnit"] = {"unitKey": "kilogram"} 
-
-            rest_step = None
-            if descanso > 0:
-                rest_step = {
-                    "type": "ExecutableStepDTO",
-                    "stepId": None,
-                    "stepOrder": None,
-                    "childStepId": child_id,
-                    "description": f"{descanso}s",
-                    "stepType": { "stepTypeId": 4, "stepTypeKey": "rest", "displayOrder": 4 },
-                    "endCondition": { "conditionTypeId": 2, "conditionTypeKey": "time", "displayOrder": 2 },
-                    "endConditionValue": descanso,
-                    "targetType": { "workoutTargetTypeId": 1, "workoutTargetTypeKey": "no.target" }
-                }
-
-            if series > 1:
-                group_order = global_order_counter
-                global_order_counter += 1
-                block_steps = [exercise_step]
-                exercise_step["stepOrder"] = global_order_counter
-                global_order_counter += 1
-                
-                if rest_step:
-                    rest_step["stepOrder"] = global_order_counter
-                    block_steps.append(rest_step)
-                    global_order_counter += 1
-                
-                workout_steps.append({
-                    "type": "RepeatGroupDTO",
-                    "stepId": None,
-                    "stepOrder": group_order,
-                    "stepType": { "stepTypeId": 6, "stepTypeKey": "repeat", "displayOrder": 6 },
-                    "childStepId": child_id,
-                    "numberOfIterations": series,
-                    "smartRepeat": False,
-                    "endCondition": { "conditionTypeId": 7, "conditionTypeKey": "iterations", "displayOrder": 7 },
-                    "workoutSteps": block_steps,
-                    "skipLastRestStep": False
-                })
-            else:
-                exercise_step["stepOrder"] = global_order_counter
-                workout_steps.append(exercise_step)
-                global_order_counter += 1
-                if rest_step:
-                    rest_step["stepOrder"] = global_order_counter
-                    workout_steps.append(rest_step)
-                    global_order_counter += 1
-
-        final_payload = {
-            "workoutName": workout_name,
-            "sportType": { "sportTypeId": 5, "sportTypeKey": "strength_training", "displayOrder": 5 },
-            "workoutSegments": [{
-                "segmentOrder": 1,
-                "sportType": { "sportTypeId": 5, "sportTypeKey": "strength_training", "displayOrder": 5 },
-                "workoutSteps": workout_steps
-            }]
-        }
+        with metrics.PAYLOAD_BUILD_LATENCY.time(route="/api/upload"):
+            final_payload = build_workout_payload(workout_name, raw_steps)
         
         print(f"📤 Tentando enviar: {workout_name}")
-        response = client.connectapi("/workout-service/workout", method="POST", json=final_payload)
-        return jsonify({ "success": True, "message": "Treino criado!", "id": response.get('workoutId') })
+        result = push_payloads([final_payload])[0]
+        if result['error']: return jsonify({"error": result['error']}), 500
+
+        messages = {CREATED: "Treino criado!", UPDATED: "Treino atualizado!", UNCHANGED: "Treino sem alterações."}
+        return jsonify({ "success": True, "message": messages[result['action']], "id": result['id'], "action": result['action'] })
 
     except Exception as e:
-        if "400" in str(e) and 'final_payload' in locals():
-            print("\n❌ ERRO 400 - DUMP:\n", json.dumps(final_payload, indent=2))
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/pull_workouts', methods=['GET'])
-def api_pull_workouts():
+@app.route('/api/upload_batch', methods=['POST'])
+def api_upload_batch():
+    """
+    Envia vários treinos de uma vez: monta todos os payloads antes e envia em
+    paralelo (limite configurável). Treinos iguais ao último envio são
+    pulados e os alterados são atualizados no mesmo id. Devolve o resultado
+    de cada treino.
+    """
     try:
-        load_data()
-        client = get_garmin_client()
-        if not client: return jsonify({"error": "Erro de Autenticação"}), 500
+        try:
+            payloads, workers, accounts = batch_payloads(request.json or {}, "/api/upload_batch")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if accounts:
+            print(f"📤 Enviando {len(payloads)} treinos para {len(accounts)} contas")
+            results = push_fanout(payloads, accounts, workers)
+            return jsonify(dict(fanout_summary(results), results=results))
+
+        print(f"📤 Enviando {len(payloads)} treinos ({workers} em paralelo)")
+        results = push_payloads(payloads, workers)
+        return jsonify(dict(push_summary(results), results=results))
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        workouts = client.get_workouts()
-        full_data = []
-        
-        count = 0
-        for w_summary in workouts:
-            if count > 20: break 
-            
-            w_id = w_summary['workoutId']
-            w_name = w_summary['workoutName']
-            
-            if w_summary.get('sportType', {}).get('sportTypeKey') != 'strength_training':
-                continue
+def flatten_workout(w_name, w_data):
+    """Converte os passos de um treino da Garmin nas linhas do editor"""
+    rows = []
+    steps = w_data.get('workoutSegments', [{}])[0].get('workoutSteps', [])
+
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+
+        # Grupo
+        if step['type'] == 'RepeatGroupDTO':
+            iterations = step.get('numberOfIterations', 1)
+            sub_steps = step.get('workoutSteps', [])
+
+            ex_step = next((s for s in sub_steps if s.get('stepType', {}).get('stepTypeKey') == 'interval'), None)
+            rest_step = next((s for s in sub_steps if s.get('stepType', {}).get('stepTypeKey') in ['rest', 'recovery']), None)
+
+            if ex_step:
+                cat = ex_step.get('category')
+                name = ex_step.get('exerciseName')
+                found_id, found_label = resolve_exercise_label(cat, name)
+
+                rows.append({
+                    "workoutName": w_name,
+                    "exerciseId": found_id,
+                    "exerciseLabel": found_label,
+                    "exerciseSearch": found_label,
+                    "note": ex_step.get('description', ''),
+                    "sets": iterations,
+                    "reps": ex_step.get('endConditionValue', 0),
+                    "weight": ex_step.get('weightValue', 0),
+                    "rest": rest_step.get('endConditionValue', 0) if rest_step else 0
+                })
+
+        # Passo Simples
+        elif step['type'] == 'ExecutableStepDTO' and step.get('stepType', {}).get('stepTypeKey') == 'interval':
+            cat = step.get('category')
+            name = step.get('exerciseName')
+            found_id, found_label = resolve_exercise_label(cat, name)
+
+            rest_val = 0
+            if i + 1 < len(steps):
+                next_step = steps[i+1]
+                if next_step['type'] == 'ExecutableStepDTO' and next_step.get('stepType', {}).get('stepTypeKey') in ['rest', 'recovery']:
+                    rest_val = next_step.get('endConditionValue', 0)
+                    i += 1
+
+            rows.append({
+                "workoutName": w_name,
+                "exerciseId": found_id,
+                "exerciseLabel": found_label,
+                "exerciseSearch": found_label,
+                "note": step.get('description', ''),
+                "sets": 1,
+                "reps": step.get('endConditionValue', 0),
+                "weight": step.get('weightValue', 0),
+                "rest": rest_val
+            })
+
+        i += 1
+    return rows
+
+def pull_workout_groups(client, summaries, workers=PULL_WORKERS, ordered=True):
+    """
+    Gera (workoutId, linhas do editor) para os treinos. Detalhes vêm do
+    espelho local; só os novos/alterados são baixados (pool limitado).
+    ordered=False entrega primeiro os locais e depois os baixados, na ordem
+    em que terminam.
+    """
+    ids = [w['workoutId'] for w in summaries]
+    names = {w['workoutId']: w['workoutName'] for w in summaries}
+    details = WORKOUT_STORE.details(ids)
+    missing = [w_id for w_id in ids if w_id not in details]
+    if not missing:
+        fetched = iter(())
+    elif isinstance(client, garmin_async.AsyncGarminClient):
+        fetched = garmin_async.iterate(WORKOUT_STORE.fetch_details_async(client, missing, workers))
+    else:
+        fetched = WORKOUT_STORE.fetch_details(client, missing, workers)
+
+    if ordered:
+        details.update(dict(fetched))
+        sequence = ((w_id, details.get(w_id)) for w_id in ids)
+    else:
+        sequence = chain(((w_id, details[w_id]) for w_id in ids if w_id in details), fetched)
 
+    try:
+        for w_id, w_data in sequence:
+            if w_data is None: continue
             try:
-                w_data = client.connectapi(f"/workout-service/workout/{w_id}", method="GET")
-                steps = w_data.get('workoutSegments', [{}])[0].get('workoutSteps', [])
-                
-                i = 0
-                while i < len(steps):
-                    step = steps[i]
-                    
-                    # Grupo
-                    if step['type'] == 'RepeatGroupDTO':
-                        iterations = step.get('numberOfIterations', 1)
-                        sub_steps = step.get('workoutSteps', [])
-                        
-                        ex_step = next((s for s in sub_steps if s.get('stepType', {}).get('stepTypeKey') == 'interval'), None)
-                        rest_step = next((s for s in sub_steps if s.get('stepType', {}).get('stepTypeKey') in ['rest', 'recovery']), None)
-                        
-                        if ex_step:
-                            cat = ex_step.get('category')
-                            name = ex_step.get('exerciseName')
-                            found_id, found_label = resolve_exercise_label(cat, name)
-                            
-                            full_data.append({
-                                "workoutName": w_name,
-                                "exerciseId": found_id,
-                                "exerciseLabel": found_label,
-                                "exerciseSearch": found_label,
-                                "note": ex_step.get('description', ''),
-                                "sets": iterations,
-                                "reps": ex_step.get('endConditionValue', 0),
-                                "weight": ex_step.get('weightValue', 0),
-                                "rest": rest_step.get('endConditionValue', 0) if rest_step else 0
-                            })
-                    
-                    # Passo Simples
-                    elif step['type'] == 'ExecutableStepDTO' and step.get('stepType', {}).get('stepTypeKey') == 'interval':
-                         cat = step.get('category')
-                         name = step.get('exerciseName')
-                         found_id, found_label = resolve_exercise_label(cat, name)
-                         
-                         rest_val = 0
-                         if i + 1 < len(steps):
-                             next_step = steps[i+1]
-                             if next_step['type'] == 'ExecutableStepDTO' and next_step.get('stepType', {}).get('stepTypeKey') in ['rest', 'recovery']:
-                                 rest_val = next_step.get('endConditionValue', 0)
-                                 i += 1 
-
-                         full_data.append({
-                            "workoutName": w_name,
-                            "exerciseId": found_id,
-                            "exerciseLabel": found_label,
-                            "exerciseSearch": found_label,
-                            "note": step.get('description', ''),
-                            "sets": 1,
-                            "reps": step.get('endConditionValue', 0),
-                            "weight": step.get('weightValue', 0),
-                            "rest": rest_val 
-                        })
-                    
-                    i += 1 
-                
-                count += 1
+                rows = flatten_workout(names[w_id], w_data)
             except Exception as e:
-                print(f"Erro ao processar treino {w_name}: {e}")
+                print(f"Erro ao processar treino {names[w_id]}: {e}")
                 continue
+            yield w_id, rows
+    finally:
+        # Consumidor parou no meio (desconexão ou job cancelado): para os downloads
+        if hasattr(fetched, 'close'): fetched.close()
+
+def pull_workout_rows(client, summaries, workers=PULL_WORKERS, ordered=True):
+    """Linhas do editor de todos os treinos (ver pull_workout_groups)"""
+    for _, rows in pull_workout_groups(client, summaries, workers, ordered):
+        yield from rows
+
+def refresh_mirror(client, store=None):
+    """Baixa a lista de treinos da Garmin (páginas em paralelo) e atualiza os resumos do espelho"""
+    store = store or WORKOUT_STORE
+    if isinstance(client, garmin_async.AsyncGarminClient):
+        return store.refresh_summaries(client, garmin_async.iterate(fetch_summaries_async(client)))
+    return store.refresh_summaries(client)
+
+def needs_sync(refresh):
+    """Vai à Garmin só no refresh explícito ou se o espelho nunca foi sincronizado"""
+    return refresh or WORKOUT_STORE.last_sync() is None
+
+def prepare_pull(refresh, limit=None):
+    """
+    Sincroniza o espelho se preciso e escolhe os treinos de força do PULL.
+    Retorna (cliente ou None se tudo está no espelho, resumos).
+    """
+    client = None
+    if needs_sync(refresh):
+        client = get_garmin_client()
+        if not client: raise ConnectionError("Erro de Autenticação")
+        refresh_mirror(client)
 
-        return jsonify(full_data)
+    strength = WORKOUT_STORE.summaries('strength_training')
+    if limit is not None and limit >= 0: strength = strength[:limit]
+
+    # Algum detalhe desatualizado no espelho: precisa do cliente para baixar
+    stale = set(WORKOUT_STORE.stale_ids('strength_training'))
+    if client is None and any(w['workoutId'] in stale for w in strength):
+        client = get_garmin_client()
+        if not client: raise ConnectionError("Erro de Autenticação")
+    return client, strength
+
+@app.route('/api/pull_workouts', methods=['GET'])
+def api_pull_workouts():
+    """
+    Treinos de força servidos pelo espelho local. Parâmetros opcionais:
+    refresh=1 (sincroniza com a Garmin antes), limit (máximo de treinos),
+    workers (downloads simultâneos) e format=ndjson para receber uma linha
+    JSON por exercício à medida que os treinos chegam.
+    """
+    try:
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        try:
+            limit = int_param(request.args, 'limit', None, 0)
+            workers = int_param(request.args, 'workers', PULL_WORKERS, 1, PULL_MAX_WORKERS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        stream = request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+        try:
+            client, strength = prepare_pull(refresh, limit)
+        except ConnectionError as e:
+            return jsonify({"error": str(e)}), 500
+
+        if stream:
+            def generate():
+                for row in pull_workout_rows(client, strength, workers, ordered=False):
+                    yield json.dumps(row, ensure_ascii=False) + "\n"
+            return Response(generate(), mimetype='application/x-ndjson')
+
+        return jsonify(list(pull_workout_rows(client, strength, workers)))
 
     except Exception as e:
         traceback.print_exc()
@@ -420,39 +702,192 @@ def api_pull_workouts():
 
 @app.route('/api/list_workouts', methods=['POST'])
 def api_list_workouts():
+    """
+    Busca paginada no espelho local. Corpo: filterType (all, starts_with,
+    ends_with, contains ou regex) e filterText, sport, dateFrom/dateTo
+    (YYYY-MM-DD), offset, limit e refresh (sincroniza com a Garmin antes).
+    Responde {total, offset, limit, items, sports}.
+    """
     try:
-        data = request.json
-        filter_type, filter_text = data.get('filterType'), data.get('filterText', '').lower().strip()
-        client = get_garmin_client()
-        if not client: return jsonify({"error": "Auth Error"}), 500
-
-        workouts = client.get_workouts()
-        filtered = []
-        for w in workouts:
-            name = w['workoutName'].lower()
-            match = False
-            if filter_type == 'all': match = True
-            elif filter_type == 'starts_with': match = name.startswith(filter_text)
-            elif filter_type == 'ends_with': match = name.endswith(filter_text)
-            elif filter_type == 'contains': match = filter_text in name
-            
-            if match:
-                filtered.append({"id": w['workoutId'], "name": w['workoutName'], "sport": w.get('sportType', {}).get('sportTypeKey')})
-        return jsonify(filtered)
+        data = request.json or {}
+        try:
+            matches = name_filter(data.get('filterType'), data.get('filterText'))
+            offset = int_param(data, 'offset', 0, 0)
+            limit = int_param(data, 'limit', LIST_PAGE_SIZE, 1, LIST_MAX_PAGE_SIZE)
+            date_from, date_to = date_param(data, 'dateFrom'), date_param(data, 'dateTo')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if date_from and date_to and date_from > date_to:
+            return jsonify({"error": "'dateFrom' é depois de 'dateTo'"}), 400
+
+        if needs_sync(bool(data.get('refresh'))):
+            client = get_garmin_client()
+            if not client: return jsonify({"error": "Auth Error"}), 500
+            refresh_mirror(client)
+
+        total, rows = WORKOUT_STORE.search(matches, data.get('sport') or None, date_from, date_to, offset, limit)
+        items = [{"id": r['workout_id'], "name": r['name'], "sport": r['sport'], "updateDate": r['update_date']} for r in rows]
+        return jsonify({"total": total, "offset": offset, "limit": limit, "items": items, "sports": WORKOUT_STORE.sports()})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
 @app.route('/api/delete_workouts', methods=['POST'])
 def api_delete_workouts():
+    """Apaga em paralelo e devolve o resultado de cada id (deleted / not_found / failed)"""
     try:
-        ids = request.json.get('ids', [])
-        client = get_garmin_client()
-        deleted = 0
-        for w_id in ids:
-            try: client.connectapi(f"/workout-service/workout/{w_id}", method="DELETE"); deleted+=1
-            except: pass
-        return jsonify({"success": True, "deleted": deleted})
+        data = request.json or {}
+        ids = data.get('ids', [])
+        try:
+            workers = int_param(data, 'workers', DELETE_WORKERS, 1, DELETE_MAX_WORKERS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            results = delete_workouts(ids, workers)
+        except ConnectionError as e:
+            return jsonify({"error": str(e)}), 500
+        return jsonify(dict(delete_summary(results), results=results))
     except Exception as e: return jsonify({"error": str(e)}), 500
 
+def delete_workouts(ids, workers=DELETE_WORKERS, on_result=None, cancel=None):
+    """Apaga na Garmin em paralelo e tira do espelho o que não existe mais lá"""
+    client = get_garmin_client()
+    if not client: raise ConnectionError("Erro de Autenticação")
+
+    if isinstance(client, garmin_async.AsyncGarminClient):
+        results = garmin_async.run(delete_workouts_bulk_async(client, ids, workers=workers, on_result=on_result, cancel=cancel))
+    else:
+        results = delete_workouts_bulk(client, ids, workers=workers, on_result=on_result, cancel=cancel)
+    # Não encontrado também some do espelho: já não existe na Garmin
+    WORKOUT_STORE.remove([r['id'] for r in results if r['status'] in (DELETED, NOT_FOUND)])
+    return results
+
+def delete_summary(results):
+    counts = summarize(results)
+    return {"success": counts[FAILED] == 0, "deleted": counts[DELETED], "counts": counts}
+
+# --- JOBS (tarefas longas em segundo plano) ---
+
+MAIN_ACCOUNT = (garmin_session.DEFAULT_ACCOUNT,)    # Jobs sem "accounts" mexem só na conta do .env
+
+def job_accepted(job):
+    response = jsonify(job.to_dict(results=False))
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    return response
+
+@app.route('/api/jobs/push', methods=['POST'])
+def api_job_push():
+    """PUSH em lote em segundo plano: mesmo corpo do /api/upload_batch, responde 202 com o job"""
+    try:
+        payloads, workers, accounts = batch_payloads(request.json or {}, "/api/jobs/push")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if accounts:
+        # Várias contas: um evento de progresso por conta concluída
+        def run_fanout(job):
+            print(f"📤 Job {job.id[:8]}: enviando {len(payloads)} treinos para {len(accounts)} contas")
+            return fanout_summary(push_fanout(payloads, accounts, workers, on_result=job.progress, cancel=job.cancel_event))
+
+        return job_accepted(JOBS.submit("push", run_fanout, accounts, total=len(accounts)))
+
+    def run(job):
+        print(f"📤 Job {job.id[:8]}: enviando {len(payloads)} treinos ({workers} em paralelo)")
+        return push_summary(push_payloads(payloads, workers, on_result=job.progress, cancel=job.cancel_event))
+
+    return job_accepted(JOBS.submit("push", run, MAIN_ACCOUNT, total=len(payloads)))
+
+@app.route('/api/jobs/pull', methods=['POST'])
+def api_job_pull():
+    """PULL em segundo plano: cada treino concluído chega como um evento com as suas linhas"""
+    data = request.json or {}
+    refresh = bool(data.get('refresh'))
+    try:
+        limit = int_param(data, 'limit', None, 0)
+        workers = int_param(data, 'workers', PULL_WORKERS, 1, PULL_MAX_WORKERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def run(job):
+        client, strength = prepare_pull(refresh, limit)
+        job.set_total(len(strength))
+        groups = pull_workout_groups(client, strength, workers, ordered=False)
+        rows = 0
+        try:
+            for w_id, workout_rows in groups:
+                job.check_cancelled()
+                rows += len(workout_rows)
+                job.progress({"workoutId": w_id, "rows": workout_rows})
+        finally:
+            groups.close()
+        return {"workouts": job.done, "rows": rows}
+
+    return job_accepted(JOBS.submit("pull", run, MAIN_ACCOUNT))
+
+@app.route('/api/jobs/delete', methods=['POST'])
+def api_job_delete():
+    """Deleção em segundo plano: mesmo corpo do /api/delete_workouts"""
+    data = request.json or {}
+    ids = data.get('ids', [])
+    try:
+        workers = int_param(data, 'workers', DELETE_WORKERS, 1, DELETE_MAX_WORKERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not ids: return jsonify({"error": "Nenhum treino selecionado"}), 400
+
+    def run(job):
+        return delete_summary(delete_workouts(ids, workers, on_result=job.progress, cancel=job.cancel_event))
+
+    return job_accepted(JOBS.submit("delete", run, MAIN_ACCOUNT, total=len(ids)))
+
+@app.route('/api/accounts')
+def api_accounts():
+    """Contas que podem receber o PUSH (a do .env e as de ACCOUNTS_FILE)"""
+    return jsonify(garmin_session.get_pool().accounts())
+
+@app.route('/api/jobs')
+def api_jobs():
+    return jsonify([job.to_dict(results=False) for job in JOBS.list()])
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Status do job; results=0 omite os resultados item a item"""
+    job = JOBS.get(job_id)
+    if job is None: return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(job.to_dict(results=request.args.get('results', '1') != '0'))
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_job_cancel(job_id):
+    job = JOBS.cancel(job_id)
+    if job is None: return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(job.to_dict(results=False))
+
+@app.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """
+    Progresso por Server-Sent Events: "progress" a cada item, "status" ao
+    começar e "end" com o resumo. Reconexões continuam do Last-Event-ID.
+    """
+    job = JOBS.get(job_id)
+    if job is None: return jsonify({"error": "Job não encontrado"}), 404
+    after = request.headers.get('Last-Event-ID', request.args.get('after', 0))
+    try:
+        after = max(0, int(after))
+    except ValueError:
+        after = 0
+
+    def generate():
+        for event in job.events(after):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            seq, kind, data = event
+            yield f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'    # nginx: não segura os eventos no buffer
+    return response
+
 if __name__ == '__main__':
     load_data()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da importação de um CSV grande (mesociclo sintético, 10.000 linhas).
+
+Um mesociclo repete os mesmos exercícios semana após semana, então o
+arquivo tem poucos termos únicos para muitas linhas. Sobre o mesmo arquivo:
+
+    csv.ingest        leitura e conversão linha a linha (csv_ingest)
+    match.per_row     um find por linha (como o import fazia antes)
+    match.batch       find_many: cada termo único resolvido uma vez só
+    api.import_csv    a rota inteira, upload pelo cliente de teste do Flask
+
+Uso:
+    python bench_import.py                  # 10.000 linhas
+    python bench_import.py --rows 50000 --pool 120
+"""
+import os
+import io
+import csv
+import random
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+from benchmark import load_exercises, load_rules, measure, SEED
+from csv_ingest import WorkoutCsv, COLUMNS
+from search_engine import ExerciseSearchIndex
+
+ROWS = 10000
+POOL = 60               # exercícios diferentes no mesociclo
+EXERCISES_PER_WORKOUT = 8
+WORKOUTS_PER_WEEK = 5
+
+
+def mesocycle_csv(path, catalog, rows=ROWS, pool=POOL, seed=SEED):
+    """
+    Semanas de treinos A..E com os mesmos exercícios (`pool` no total). Um
+    terço das linhas traz o ID; o resto só o nome, às vezes em maiúsculas.
+    """
+    rng = random.Random(seed)
+    chosen = rng.sample(catalog, pool)
+    plans = [[rng.choice(chosen) for _ in range(EXERCISES_PER_WORKOUT)] for _ in range(WORKOUTS_PER_WEEK)]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            workout = (i // EXERCISES_PER_WORKOUT) % WORKOUTS_PER_WEEK
+            week = i // (EXERCISES_PER_WORKOUT * WORKOUTS_PER_WEEK)
+            item = plans[workout][i % EXERCISES_PER_WORKOUT]
+            has_id = i % 3 == 0
+            note = item['label'].upper() if i % 2 else item['label']
+            writer.writerow([
+                f"S{week + 1:03d}_Treino_{'ABCDE'[workout]}",
+                item['id'] if has_id else "",
+                note,
+                rng.choice([3, 4]),
+                rng.choice([8, 10, 12]),
+                str(rng.choice([10, 22.5, 40])).replace('.', ','),
+                rng.choice([45, 60, 90]),
+            ])
+
+
+def ingest_peak(path):
+    """Pico de memória (bytes) só da leitura, sem guardar as linhas."""
+    tracemalloc.start()
+    for _ in WorkoutCsv(path): pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(rows, pool):
+    base, rules = load_exercises(), load_rules()
+    index = ExerciseSearchIndex(base, rules)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'mesociclo.csv')
+        mesocycle_csv(path, base, rows, pool)
+        with open(path, 'rb') as f:
+            data = f.read()
+        parsed = list(WorkoutCsv(path))
+        terms = [row['exercicio'] or row['nota_personalizada'] for row in parsed]
+        unique = len({index.term_key(t) for t in terms})
+        print(f"📄 {len(parsed)} linhas, {len(data) / 1024:.0f} KiB, {unique} termos únicos")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        client = app.app.test_client()
+
+        def import_csv(_):
+            r = client.post('/api/import_csv', data={'file': (io.BytesIO(data), 'mesociclo.csv')},
+                            content_type='multipart/form-data')
+            assert r.status_code == 200, r.get_data(as_text=True)[:200]
+
+        results = {
+            "csv.ingest": measure(lambda _: WorkoutCsv(path).workouts()),
+            "match.per_row": measure(lambda _: [index.find_scored(t) for t in terms]),
+            "match.batch": measure(lambda _: index.find_many(terms, scored=True)),
+            "api.import_csv": measure(import_csv),
+        }
+        for name, r in results.items():
+            print(f"   {name:<18} {r['median'] * 1000:10.2f} ms  (mín. {r['min'] * 1000:.2f} ms, {r['runs']} execuções)")
+        per_row, batch = results["match.per_row"]['min'], results["match.batch"]['min']
+        print(f"   busca em lote {per_row / batch:.1f}x mais rápida que uma por linha")
+        print(f"   pico de memória da leitura: {ingest_peak(path) / 1024:.0f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da importação de CSV grande.")
+    parser.add_argument("--rows", type=int, default=ROWS, help=f"Linhas do CSV (padrão: {ROWS})")
+    parser.add_argument("--pool", type=int, default=POOL, help=f"Exercícios diferentes (padrão: {POOL})")
+    args = parser.parse_args()
+    run(args.rows, args.pool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks da busca, do build do catálogo e da montagem de payloads.
+
+Tudo roda sobre dados sintéticos gerados a partir do catálogo real
+(1x, 10x e 100x os exercícios atuais) e de CSVs sintéticos lidos pelo
+csv_ingest; o PUSH usa um
+cliente Garmin falso em memória, então nada vai para a rede.
+
+Uso:
+    python benchmark.py --save            # mede e grava a linha de base
+    python benchmark.py                   # mede e compara (sai com 1 se piorou)
+    python benchmark.py --scales 1,10 --only search
+
+A linha de base fica em data/benchmarks/baseline.json (ou em --baseline) e
+não vai para o git: tempos só se comparam na mesma máquina. No CI, o mesmo
+job mede as duas versões:
+
+    git checkout <base>  && python src/benchmark.py --scales 1,10 --save --baseline /tmp/base.json
+    git checkout <pr>    && python src/benchmark.py --scales 1,10 --baseline /tmp/base.json
+
+Um benchmark é regressão se o melhor tempo (mínimo das execuções) passar de
+baseline * (1 + tolerância): o mínimo oscila bem menos que a média numa
+máquina com outras coisas rodando.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import csv
+import contextlib
+import threading
+
+import build_db
+import upload_csv
+from csv_ingest import WorkoutCsv, COLUMNS
+from search_engine import ExerciseSearchIndex
+from workout_store import WorkoutStore
+from bulk_ops import sync_workouts_bulk
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(CURRENT_DIR)
+EXERCISES_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.json')
+RULES_FILE = os.path.join(ROOT_DIR, 'data', 'config', 'search_rules.json')
+RAW_SAMPLE_FILE = os.path.join(ROOT_DIR, 'data', 'raw', 'exercise_types_pt_BR_5.21.0.16.txt')
+BASELINE_FILE = os.path.join(ROOT_DIR, 'data', 'benchmarks', 'baseline.json')
+
+SCALES = (1, 10, 100)
+TOLERANCE = 0.30        # 30% mais lento que a linha de base = regressão
+MIN_RUNS = 3
+MAX_RUNS = 15
+TIME_BUDGET = 2.0       # segundos por benchmark (depois de MIN_RUNS)
+SEED = 42
+
+QUERY_COUNT = 300
+CSV_ROWS = 500          # linhas por 1x de escala
+ROWS_PER_WORKOUT = 8
+PUSH_WORKOUTS = 200
+
+VARIANTS = ["com barra", "com halteres", "unilateral", "inclinado", "declinado",
+            "na polia", "no banco", "sentado", "em pe", "alternado", "com kettlebell",
+            "na maquina", "com faixa", "isometrico", "pegada aberta", "pegada fechada"]
+TYPOS = str.maketrans("aeio", "eaoi")
+
+
+# --- Dados sintéticos ---
+
+def load_exercises():
+    with open(EXERCISES_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_rules():
+    if not os.path.exists(RULES_FILE): return {}
+    with open(RULES_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def synthetic_catalog(base, scale, seed=SEED):
+    """Catálogo com len(base) * scale itens: o original + variações (id/label/termos novos)."""
+    rng = random.Random(seed)
+    catalog = list(base)
+    for v in range(1, scale):
+        for item in base:
+            variant = rng.choice(VARIANTS)
+            catalog.append(dict(item,
+                                id=f"{item['id']}_V{v}",
+                                label=f"{item['label']} {variant}",
+                                search_term=f"{item['search_term']} {variant} v{v}",
+                                internal_key=f"{item.get('internal_key') or item['id']}_V{v}"))
+    return catalog
+
+def synthetic_queries(catalog, count=QUERY_COUNT, seed=SEED):
+    """Mistura do que chega de verdade: labels, pedaços, ids exatos, erros e lixo."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        item = rng.choice(catalog)
+        words = item['label'].split()
+        kind = i % 5
+        if kind == 0: queries.append(item['label'])
+        elif kind == 1: queries.append(" ".join(words[:2]))
+        elif kind == 2: queries.append(item['id'])
+        elif kind == 3: queries.append(item['label'].lower().translate(TYPOS))
+        else: queries.append(f"exercicio inexistente {i}")
+    return queries
+
+def synthetic_raw_file(path, scale, seed=SEED):
+    """Arquivo .properties (mesmo formato da Garmin) com scale x as linhas reais."""
+    rng = random.Random(seed)
+    with open(RAW_SAMPLE_FILE, 'r', encoding='utf-8') as f:
+        lines = [line.rstrip('\n') for line in f if '=' in line]
+    with open(path, 'w', encoding='utf-8') as out:
+        for v in range(scale):
+            for line in lines:
+                if v == 0:
+                    out.write(line + '\n')
+                    continue
+                key, value = line.split('=', 1)
+                out.write(f"{key}_V{v}={value} {rng.choice(VARIANTS)}\n")
+
+def synthetic_csv(path, catalog, rows, seed=SEED):
+    """Arquivo no formato do treino_manual.csv."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            item = rng.choice(catalog)
+            has_id = i % 3 != 0
+            writer.writerow([
+                f"Treino_{i // ROWS_PER_WORKOUT:05d}",
+                item['id'] if has_id else "",
+                item['label'] if not has_id else rng.choice(["", "CADENCIA 3-1"]),
+                rng.choice([1, 3, 4]),
+                rng.choice([8, 10, 12, 15]),
+                rng.choice([0, 10, 22.5, 40]),
+                rng.choice([0, 45, 60, 90]),
+            ])
+
+@contextlib.contextmanager
+def build_db_workspace(work_dir, raw_file):
+    """Aponta o build_db para work_dir (só o arquivo bruto sintético, cache e saídas lá dentro)."""
+    raw_dir, processed_dir = os.path.join(work_dir, 'raw'), os.path.join(work_dir, 'processed')
+    os.makedirs(raw_dir, exist_ok=True)
+    if not os.path.exists(os.path.join(raw_dir, os.path.basename(raw_file))): shutil.copy(raw_file, raw_dir)
+    paths = {
+        'RAW_DATA_DIR': raw_dir,
+        'OUTPUT_FILE': os.path.join(processed_dir, 'exercises.json'),
+        'CATALOG_FILE': os.path.join(processed_dir, 'exercises.bin'),
+        'BUILD_CACHE_FILE': os.path.join(processed_dir, '.build_cache.json'),
+        'DOWNLOAD_META_FILE': os.path.join(raw_dir, '.download_meta.json'),
+    }
+    saved = {name: getattr(build_db, name) for name in paths}
+    for name, value in paths.items(): setattr(build_db, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items(): setattr(build_db, name, value)
+
+def editor_steps(rows):
+    """Linhas do CSV no formato que o editor web manda para o /api/upload."""
+    return [{
+        "exerciseId": row['exercicio'] or None, "sets": row['series'], "reps": row['reps'],
+        "weight": row['peso_kg'], "restDuration": row['intervalo_segundos'],
+        "note": row['nota_personalizada'],
+    } for row in rows]
+
+
+class FakeGarminClient:
+    """Lista e connectapi de treinos, em memória (ids sequenciais)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.workouts = {}
+
+    def get_workouts(self, start=0, limit=100):
+        # Espelho vazio: o PUSH lista a conta antes de planejar
+        with self._lock:
+            return list(self.workouts.values())[start:start + limit]
+
+    def connectapi(self, path, method="GET", json=None, **kwargs):
+        with self._lock:
+            if method == "POST":
+                workout = dict(json, workoutId=self._next_id, updateDate="2024-01-01T00:00:00.0")
+                self.workouts[self._next_id] = workout
+                self._next_id += 1
+                return workout
+            w_id = int(path.rsplit('/', 1)[1])
+            if method == "PUT":
+                self.workouts[w_id] = dict(json, updateDate="2024-01-02T00:00:00.0")
+                return None
+            if method == "DELETE":
+                return self.workouts.pop(w_id, None)
+            return self.workouts[w_id]
+
+
+# --- Execução ---
+
+def measure(fn, setup=None):
+    """Tempo (s) de cada execução de fn(estado); setup() roda fora do cronômetro."""
+    runs, started = [], time.perf_counter()
+    while len(runs) < MAX_RUNS:
+        state = setup() if setup else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn(state)
+            runs.append(time.perf_counter() - t0)
+        if len(runs) >= MIN_RUNS and time.perf_counter() - started > TIME_BUDGET: break
+        if runs[0] > TIME_BUDGET: break     # Escalas grandes: uma execução basta
+    return {"median": statistics.median(runs), "min": min(runs), "runs": len(runs)}
+
+def benchmarks(scale, base, rules, tmp_dir):
+    """Gera (nome, função, setup) de uma escala. Os dados são montados uma vez."""
+    catalog = synthetic_catalog(base, scale)
+    by_id = {item['id']: item for item in catalog}
+    queries = synthetic_queries(catalog)
+    index = ExerciseSearchIndex(catalog, rules)
+    csv_file = os.path.join(tmp_dir, f"treino_{scale}x.csv")
+    synthetic_csv(csv_file, catalog, CSV_ROWS * scale)
+    groups = list(WorkoutCsv(csv_file).workouts().items())
+    rows = [row for _, group in groups for row in group]
+    terms = [row['exercicio'] or row['nota_personalizada'] for row in rows]
+    steps = editor_steps(rows)
+    prefixes = [q[:4] for q in queries if q[:4].strip()]
+
+    raw_file = os.path.join(tmp_dir, f"exercise_types_pt_BR_{scale}x.txt")
+    synthetic_raw_file(raw_file, scale)
+
+    def parse_and_clean(_):
+        build_db.deduplicate_and_clean(build_db.parse_files([raw_file]))
+
+    build_dir = os.path.join(tmp_dir, f"build_{scale}x")
+
+    def full_build(_):
+        with build_db_workspace(build_dir, raw_file):
+            build_db.build(force=True)
+
+    def noop_build(_):
+        with build_db_workspace(build_dir, raw_file):
+            assert not build_db.build(), "build_db.noop refez a base"
+
+    def ensure_built():
+        with build_db_workspace(build_dir, raw_file), contextlib.redirect_stdout(io.StringIO()):
+            build_db.build()
+
+    import app
+
+    def api_payloads(_):
+        for i in range(0, len(steps), ROWS_PER_WORKOUT):
+            app.build_workout_payload(f"Treino_{i}", steps[i:i + ROWS_PER_WORKOUT], by_id)
+
+    payloads = [upload_csv.generate_payload(name, group, by_id) for name, group in groups[:PUSH_WORKOUTS]]
+
+    def fresh_store():
+        fd, path = tempfile.mkstemp(suffix='.db', dir=tmp_dir)
+        os.close(fd)
+        os.remove(path)
+        return WorkoutStore(path), FakeGarminClient()
+
+    def push_then_noop(state):
+        store, client = state
+        sync_workouts_bulk(lambda: client, payloads, store, workers=6)
+        sync_workouts_bulk(lambda: client, payloads, store, workers=6)
+
+    return [
+        ("search.index_build", lambda _: ExerciseSearchIndex(catalog, rules), None),
+        ("search.find", lambda _: [index.find(q) for q in queries], None),
+        ("search.find_many", lambda _: index.find_many(terms), None),
+        ("search.autocomplete", lambda _: [index.search(p, limit=50) for p in prefixes], None),
+        ("build_db.parse_and_clean", parse_and_clean, None),
+        ("build_db.full", full_build, None),
+        ("build_db.noop", noop_build, ensure_built),
+        ("csv.ingest", lambda _: WorkoutCsv(csv_file).workouts(), None),
+        ("payload.generate_payload", lambda _: [upload_csv.generate_payload(n, g, by_id) for n, g in groups], None),
+        ("payload.api_upload", api_payloads, None),
+        ("push.fake_client", push_then_noop, fresh_store),
+    ]
+
+def run(scales, only=None):
+    base, rules = load_exercises(), load_rules()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in scales:
+            print(f"⏱️  Escala {scale}x ({len(base) * scale} exercícios)...")
+            for name, fn, setup in benchmarks(scale, base, rules, tmp_dir):
+                if only and not name.startswith(only): continue
+                key = f"{name}[{scale}x]"
+                results[key] = measure(fn, setup)
+                r = results[key]
+                print(f"   {key:<36} {r['median'] * 1000:10.2f} ms  (mín. {r['min'] * 1000:.2f} ms, {r['runs']} execuções)")
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Lista de (nome, atual, base, razão) dos benchmarks que pioraram."""
+    regressions = []
+    for key, current in results.items():
+        if key not in baseline: continue
+        ratio = current['min'] / baseline[key]['min'] if baseline[key]['min'] else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append((key, current['min'], baseline[key]['min'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de busca, build e payloads.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in SCALES), help="Ex.: 1,10,100")
+    parser.add_argument("--only", help="Prefixo do nome (search, build_db, payload, push)")
+    parser.add_argument("--save", action="store_true", help="Grava o resultado como linha de base")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Piora aceita (0.3 = 30%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Arquivo da linha de base (padrão: data/benchmarks/baseline.json)")
+    args = parser.parse_args(argv)
+
+    results = run([int(s) for s in args.scales.split(',') if s.strip()], args.only)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(baseline, **results), f, indent=2)
+        print(f"💾 Linha de base gravada em {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"ℹ️  Sem linha de base em {args.baseline}. Rode com --save para criar.")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, current, base, ratio in regressions:
+        print(f"❌ {key}: {current * 1000:.2f} ms (base {base * 1000:.2f} ms, {ratio:.2f}x)")
+    if regressions:
+        return 1
+    print(f"✅ Nenhuma regressão acima de {args.tolerance:.0%}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
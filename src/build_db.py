@@ -2,13 +2,23 @@
 import os
 import json
 import re
+import hashlib
+import argparse
 import unidecode
+from catalog import write_catalog, VERSION as CATALOG_VERSION
 
 # --- CONFIGURAÇÕES ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DATA_DIR = os.path.join(os.path.dirname(CURRENT_DIR), 'data')
 RAW_DATA_DIR = os.path.join(BASE_DATA_DIR, 'raw')
 OUTPUT_FILE = os.path.join(BASE_DATA_DIR, 'processed', 'exercises.json')
+CATALOG_FILE = os.path.join(BASE_DATA_DIR, 'processed', 'exercises.bin')
+# Hash de cada arquivo bruto + linhas já interpretadas (build incremental)
+BUILD_CACHE_FILE = os.path.join(BASE_DATA_DIR, 'processed', '.build_cache.json')
+# Metadados gravados pelo extract_data.py (hash de cada arquivo baixado)
+DOWNLOAD_META_FILE = os.path.join(RAW_DATA_DIR, '.download_meta.json')
+# Mude ao alterar a lógica do parse para invalidar o cache
+PARSER_VERSION = 1
 
 # 🎛️ CONTROLES DE QUALIDADE (AQUI ESTÁ O QUE VOCÊ PEDIU)
 # Mude para True se quiser ignorar arquivos que não sejam pt_BR
@@ -31,7 +41,32 @@ KNOWN_CATEGORIES = [
     "SLED", "SLEDGE_HAMMER", "SQUAT", "STAIR_STEPPER", "SUSPENSION", "TIRE",
     "TOTAL_BODY", "TRICEPS_EXTENSION", "WARM_UP", "BIKE", "SWIM"
 ]
-KNOWN_CATEGORIES.sort(key=len, reverse=True)
+
+def build_category_trie(categories):
+    """Trie por partes da chave (separadas por "_"): BENCH -> PRESS -> categoria."""
+    trie = {}
+    for cat in categories:
+        node = trie
+        for part in cat.split('_'):
+            node = node.setdefault(part, {})
+        node[None] = cat
+    return trie
+
+CATEGORY_TRIE = build_category_trie(KNOWN_CATEGORIES)
+
+def match_category(full_key):
+    """(categoria, nome interno) pelo prefixo conhecido mais longo da chave."""
+    node = CATEGORY_TRIE
+    parts = full_key.split('_')
+    category, depth = None, 0
+    for i, part in enumerate(parts):
+        node = node.get(part)
+        if node is None: break
+        if None in node: category, depth = node[None], i + 1
+
+    if category is None: return "UNCATEGORIZED", full_key
+    if depth == len(parts): return category, category
+    return category, full_key[len(category)+1:]
 
 def sanitize_text(text):
     if not text: return ""
@@ -55,15 +90,15 @@ def get_sorted_files():
     valid_files.sort(key=lambda x: 0 if 'pt_BR' in x else 1)
     return valid_files
 
-def parse_files(file_list):
-    raw_data_map = {}
-    print("📖 Lendo arquivos...")
-
-    for file_path in file_list:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        for line in lines:
+def parse_file(file_path):
+    """
+    Lê um arquivo linha a linha (sem carregar tudo) e devolve as entradas
+    [full_key, pt_name, categoria, nome interno, termos de busca].
+    Não depende dos outros arquivos, então pode ir para o cache.
+    """
+    records = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
             line = line.strip()
             if not line or '=' not in line: continue
             if line.startswith("exercise_picker") or line.startswith("primary_muscle"): continue
@@ -74,16 +109,26 @@ def parse_files(file_list):
 
             if pt_name == full_key: continue
 
-            category = "UNCATEGORIZED"
-            internal_name = full_key
+            category, internal_name = match_category(full_key)
 
-            for cat in KNOWN_CATEGORIES:
-                if full_key.startswith(cat + "_") or full_key == cat:
-                    category = cat
-                    if full_key == cat: internal_name = cat
-                    else: internal_name = full_key[len(cat)+1:]
-                    break
-            
+            # Sanitização e Limpeza
+            clean_term = sanitize_text(pt_name)
+
+            # Aplica a Lista Negra (Remove termos errados de categorias específicas)
+            is_blacklisted = any(bad_term in clean_term for bad_term in TERM_BLACKLIST.get(category, ()))
+
+            terms = []
+            if not is_blacklisted:
+                # Adiciona o nome em inglês também (opcional, pode comentar se quiser só PT)
+                terms = [clean_term, sanitize_text(full_key.replace('_', ' '))]
+            records.append([full_key, pt_name, category, internal_name, terms])
+    return records
+
+def merge_records(records_per_file):
+    """Junta as entradas dos arquivos na ordem de prioridade (pt_BR primeiro)."""
+    raw_data_map = {}
+    for records in records_per_file:
+        for full_key, pt_name, category, internal_name, terms in records:
             # Prioriza categorias reais sobre UNCATEGORIZED
             if full_key in raw_data_map:
                 current_cat = raw_data_map[full_key]['category']
@@ -98,25 +143,13 @@ def parse_files(file_list):
                     "internal_key": internal_name,
                     "search_vocab": set()
                 }
-            
-            # Sanitização e Limpeza
-            clean_term = sanitize_text(pt_name)
-            
-            # Aplica a Lista Negra (Remove termos errados de categorias específicas)
-            is_blacklisted = False
-            if category in TERM_BLACKLIST:
-                for bad_term in TERM_BLACKLIST[category]:
-                    if bad_term in clean_term:
-                        is_blacklisted = True
-                        break
-            
-            if not is_blacklisted:
-                raw_data_map[full_key]["search_vocab"].add(clean_term)
-                # Adiciona o nome em inglês também (opcional, pode comentar se quiser só PT)
-                raw_data_map[full_key]["search_vocab"].add(sanitize_text(full_key.replace('_', ' ')))
-
+            raw_data_map[full_key]["search_vocab"].update(terms)
     return raw_data_map
 
+def parse_files(file_list):
+    print("📖 Lendo arquivos...")
+    return merge_records(parse_file(file_path) for file_path in file_list)
+
 def deduplicate_and_clean(data_dict):
     print("🧹 Iniciando a faxina...")
     grouped_by_label = {}
@@ -162,18 +195,120 @@ def save_json(clean_list):
 
     output.sort(key=lambda x: x['label'])
 
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    write_json_atomic(OUTPUT_FILE, output, indent=2)
+
+    # Formato binário compacto (mmap) usado pelo app e pelo upload_csv
+    write_catalog(output, CATALOG_FILE)
     
     print(f"✅ Banco gerado com {len(output)} exercícios.")
     print(f"ℹ️  Modo Apenas BR: {USE_ONLY_BR}")
 
-if __name__ == "__main__":
+def write_json_atomic(path, data, **kwargs):
+    """Grava num temporário e troca de uma vez: quem lê nunca vê arquivo pela metade."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp_path, path)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def settings_hash():
+    """Tudo (além dos arquivos) que muda o resultado do build."""
+    settings = {
+        "parser": PARSER_VERSION,
+        "catalog": CATALOG_VERSION,
+        "only_br": USE_ONLY_BR,
+        "blacklist": TERM_BLACKLIST,
+        "categories": sorted(KNOWN_CATEGORIES),
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+def output_stamp(path):
+    if not os.path.exists(path): return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def load_build_cache():
+    try:
+        with open(BUILD_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("settings") == settings_hash() else {}
+
+def load_download_meta():
+    try:
+        with open(DOWNLOAD_META_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def fingerprint(path, cached, downloaded=None):
+    """
+    (sha256, stat); só relê o arquivo se tamanho/mtime não batem nem com o
+    cache do build nem com o que o extract_data registrou ao baixar.
+    """
+    st = os.stat(path)
+    for known in (cached, downloaded):
+        if known and known.get("size") == st.st_size and known.get("mtime") == st.st_mtime_ns:
+            return known["sha256"], st
+    return file_sha256(path), st
+
+def build(force=False):
+    """
+    Build incremental. Retorna True se gerou a base de novo.
+    - Nada mudou (arquivos, configurações e saídas) -> não faz nada;
+    - Só reinterpreta os arquivos cujo hash mudou; os outros vêm do cache.
+    """
     files = get_sorted_files()
     if not files:
         print("❌ Nenhum arquivo encontrado.")
-    else:
-        raw_map = parse_files(files)
-        clean_data = deduplicate_and_clean(raw_map)
-        save_json(clean_data)
\ No newline at end of file
+        return False
+
+    cache = {} if force else load_build_cache()
+    cached_files = cache.get("files", {})
+    downloaded = load_download_meta()
+    names = [os.path.basename(p) for p in files]
+
+    entries, changed = {}, []
+    for path, name in zip(files, names):
+        cached = cached_files.get(name)
+        sha, st = fingerprint(path, cached, downloaded.get(name))
+        if cached and cached["sha256"] == sha:
+            records = cached["records"]
+        else:
+            records = parse_file(path)
+            changed.append(name)
+        entries[name] = {"sha256": sha, "size": st.st_size, "mtime": st.st_mtime_ns, "records": records}
+
+    outputs_intact = cache.get("outputs") == [output_stamp(OUTPUT_FILE), output_stamp(CATALOG_FILE)]
+    if not changed and cache.get("inputs") == names and outputs_intact:
+        print("✅ Nenhum arquivo mudou, base já está atualizada.")
+        return False
+
+    if changed: print(f"📖 Arquivos (re)lidos: {', '.join(changed)}")
+    else: print("📖 Arquivos sem mudança, usando o cache.")
+
+    raw_map = merge_records(entries[name]["records"] for name in names)
+    clean_data = deduplicate_and_clean(raw_map)
+    save_json(clean_data)
+
+    write_json_atomic(BUILD_CACHE_FILE, {
+        "settings": settings_hash(),
+        "inputs": names,
+        "files": entries,
+        "outputs": [output_stamp(OUTPUT_FILE), output_stamp(CATALOG_FILE)],
+    })
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a base de exercícios a partir dos arquivos brutos.")
+    parser.add_argument("--force", action="store_true", help="Ignora o cache e refaz tudo")
+    args = parser.parse_args()
+    build(force=args.force)
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Operações em massa na Garmin (compartilhadas entre o app e os scripts).
+
+Cada item roda num pool de threads limitado. Limite de taxa, retries em
+429/5xx e backoff ficam no api_scheduler, dentro do cliente entregue pelo
+garmin_session: aqui cada chamada é feita uma vez só e o que ainda falhar
+vira o resultado do item.
+
+As versões *_async fazem o mesmo com o cliente do garmin_async: os itens
+viram corrotinas no event loop (no máximo `workers` ao mesmo tempo).
+
+Com `cancel` (threading.Event, ex.: de um job), itens que ainda não
+começaram quando ele é ligado não vão para a rede e voltam como cancelados.
+"""
+import json
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_scheduler import error_status
+from workout_store import fetch_summaries_async
+
+DEFAULT_WORKERS = 4
+
+DELETED = "deleted"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+
+def guard(task, cancel, skipped):
+    """task(item), ou skipped(item) se o cancelamento já foi pedido."""
+    if cancel is None: return task
+
+    def guarded(item):
+        return skipped(item) if cancel.is_set() else task(item)
+    return guarded
+
+
+def run_bulk(items, task, workers=DEFAULT_WORKERS, on_result=None, cancel=None, skipped=None):
+    """Roda task(item) num pool limitado; resultados na ordem de entrada."""
+    task = guard(task, cancel, skipped)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(task, item): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result: on_result(result)
+    return [results[i] for i in range(len(items))]
+
+
+async def run_bulk_async(items, task, workers=DEFAULT_WORKERS, on_result=None, cancel=None, skipped=None):
+    """Como run_bulk, com task(item) corrotina; resultados na ordem de entrada."""
+    slots = asyncio.Semaphore(max(1, workers))
+
+    async def run_one(item):
+        async with slots:
+            if cancel is not None and cancel.is_set(): result = skipped(item)
+            else: result = await task(item)
+        if on_result: on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(run_one(item) for item in items)))
+
+
+def delete_cancelled(w_id):
+    return {"id": w_id, "status": CANCELLED, "reason": "Cancelado"}
+
+
+def delete_result(w_id, error=None):
+    """Resultado de um DELETE: deleted, not_found (404) ou failed."""
+    if error is None:
+        return {"id": w_id, "status": DELETED, "reason": None}
+    status = error_status(error)
+    if status == 404:
+        return {"id": w_id, "status": NOT_FOUND, "reason": "Treino não existe mais"}
+    reason = f"HTTP {status}: {error}" if status else str(error)
+    return {"id": w_id, "status": FAILED, "reason": reason}
+
+
+def delete_workouts_bulk(client, workout_ids, workers=DEFAULT_WORKERS, on_result=None, cancel=None):
+    """
+    Apaga os treinos em paralelo. Retorna um resultado por id, na ordem de
+    entrada: {"id", "status": deleted | not_found | failed, "reason"}.
+    on_result(resultado) é chamado assim que cada item termina.
+    """
+    def delete_one(w_id):
+        try:
+            client.connectapi(f"/workout-service/workout/{w_id}", method="DELETE")
+            return delete_result(w_id)
+        except Exception as e:
+            return delete_result(w_id, e)
+
+    return run_bulk(workout_ids, delete_one, workers, on_result, cancel, delete_cancelled)
+
+
+async def delete_workouts_bulk_async(client, workout_ids, workers=DEFAULT_WORKERS, on_result=None, cancel=None):
+    """delete_workouts_bulk com o cliente assíncrono."""
+    async def delete_one(w_id):
+        try:
+            await client.connectapi(f"/workout-service/workout/{w_id}", method="DELETE")
+            return delete_result(w_id)
+        except Exception as e:
+            return delete_result(w_id, e)
+
+    return await run_bulk_async(workout_ids, delete_one, workers, on_result, cancel, delete_cancelled)
+
+
+def payload_hash(payload):
+    """Hash canônico do payload (independe da ordem das chaves)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def check_unique_names(payloads):
+    """
+    ValueError se dois payloads têm o mesmo workoutName: o PUSH casa treino
+    por nome, então os dois virariam POSTs (treino duplicado na conta) ou
+    PUTs concorrentes no mesmo id.
+    """
+    seen, repeated = set(), []
+    for payload in payloads:
+        name = payload.get('workoutName')
+        if name in seen and name not in repeated: repeated.append(name)
+        seen.add(name)
+    if repeated: raise ValueError(f"Treino repetido no lote: {', '.join(map(str, repeated))}")
+
+
+def plan_push(payloads, store):
+    """[(payload, hash, ação, workoutId)]: unchanged, updated (PUT) ou created (POST)."""
+    names = [p.get('workoutName') for p in payloads]
+    state = store.push_state(names)
+    known_ids = store.ids_by_name(names)
+
+    plan = []
+    for payload in payloads:
+        name = payload.get('workoutName')
+        content_hash = payload_hash(payload)
+        w_id, last_hash = state.get(name, (known_ids.get(name), None))
+        if w_id is not None and last_hash == content_hash:
+            plan.append((payload, content_hash, UNCHANGED, w_id))
+        else:
+            plan.append((payload, content_hash, UPDATED if w_id is not None else CREATED, w_id))
+    return plan
+
+
+def unchanged_results(plan, on_result=None):
+    """Resultados sem rede se nada mudou no lote inteiro; None se há algo a enviar."""
+    if not all(action == UNCHANGED for _, _, action, _ in plan): return None
+    results = [{"workoutName": p['workoutName'], "id": w_id, "action": UNCHANGED, "error": None} for p, _, _, w_id in plan]
+    if on_result:
+        for result in results: on_result(result)
+    return results
+
+
+def server_workout(response):
+    """A resposta é o treino como ficou na Garmin? (o PUT costuma voltar vazio, sem updateDate)"""
+    return isinstance(response, dict) and bool(response.get('workoutId')) and bool(response.get('updateDate'))
+
+
+def pushed_result(store, name, action, workout, content_hash, w_id=None):
+    """
+    Grava no espelho o treino como a Garmin devolveu e o hash do envio.
+    Sem ele (PUT sem corpo e a releitura falhou), o detalhe do espelho fica
+    marcado para ser baixado de novo na próxima sincronização.
+    """
+    w_id = (workout or {}).get('workoutId', w_id)
+    if workout: store.save_workout(workout)
+    elif w_id is not None: store.invalidate_details([w_id])
+    if w_id is not None: store.record_push(name, w_id, content_hash)
+    return {"workoutName": name, "id": w_id, "action": action, "error": None}
+
+
+def push_cancelled(item):
+    payload, _, _, w_id = item
+    return {"workoutName": payload['workoutName'], "id": w_id, "action": CANCELLED, "error": "Cancelado"}
+
+
+def push_error(name, action, e):
+    status = error_status(e)
+    error = f"HTTP {status}: {e}" if status else str(e)
+    return {"workoutName": name, "id": None, "action": action, "error": error}
+
+
+def sync_workouts_bulk(get_client, payloads, store, workers=DEFAULT_WORKERS, on_result=None, cancel=None):
+    """
+    PUSH idempotente. Para cada payload, pelo nome do treino:
+      - mesmo hash do último envio -> nada a fazer (unchanged, sem rede);
+      - treino já existe (enviado antes ou no espelho) -> PUT no mesmo id;
+      - senão -> POST criando um novo.
+    Espelho nunca sincronizado (ex.: primeira execução): a lista da conta é
+    baixada antes, senão os treinos que já existem lá seriam duplicados.
+    Fora isso, get_client só é chamado se houver algo para enviar. Retorna,
+    na ordem de entrada: {"workoutName", "id", "action": created|updated|unchanged|cancelled, "error"}.
+    Nomes repetidos no lote: ValueError antes de qualquer chamada (check_unique_names).
+    """
+    check_unique_names(payloads)
+    client = None
+    if store.last_sync() is None:
+        client = get_client()
+        store.refresh_summaries(client)
+
+    plan = plan_push(payloads, store)
+    results = unchanged_results(plan, on_result)
+    if results is not None: return results
+
+    client = client or get_client()
+
+    def create(payload):
+        return client.connectapi("/workout-service/workout", method="POST", json=payload)
+
+    def update(w_id, payload):
+        response = client.connectapi(f"/workout-service/workout/{w_id}", method="PUT", json=dict(payload, workoutId=w_id))
+        if server_workout(response): return response
+        # Relê o treino: o corpo do PUT não traz o updateDate da Garmin
+        try:
+            return client.connectapi(f"/workout-service/workout/{w_id}")
+        except Exception as e:
+            print(f"⚠️ Treino {w_id} atualizado, mas a releitura falhou: {e}")
+            return None
+
+    def push_one(item):
+        payload, content_hash, action, w_id = item
+        name = payload['workoutName']
+        if action == UNCHANGED:
+            return {"workoutName": name, "id": w_id, "action": UNCHANGED, "error": None}
+        try:
+            if action == UPDATED:
+                try:
+                    workout = update(w_id, payload)
+                except Exception as e:
+                    if error_status(e) != 404: raise
+                    # Apagado na Garmin por fora: cria de novo
+                    store.remove([w_id])
+                    action, w_id, workout = CREATED, None, create(payload)
+            else:
+                workout = create(payload)
+            return pushed_result(store, name, action, workout, content_hash, w_id)
+        except Exception as e:
+            return push_error(name, action, e)
+
+    return run_bulk(plan, push_one, workers, on_result, cancel, push_cancelled)
+
+
+async def sync_workouts_bulk_async(get_client, payloads, store, workers=DEFAULT_WORKERS, on_result=None, cancel=None):
+    """
+    sync_workouts_bulk com o cliente assíncrono (get_client continua síncrono).
+    O espelho (SQLite) é lido e gravado em threads, nunca no event loop
+    compartilhado: uma escrita esperando lock não trava as outras requisições.
+    """
+    check_unique_names(payloads)
+    client = None
+    if await asyncio.to_thread(store.last_sync) is None:
+        client = await asyncio.to_thread(get_client)
+        pages = [page async for page in fetch_summaries_async(client)]
+        await asyncio.to_thread(store.refresh_summaries, client, pages)
+
+    plan = await asyncio.to_thread(plan_push, payloads, store)
+    results = unchanged_results(plan, on_result)
+    if results is not None: return results
+
+    client = client or await asyncio.to_thread(get_client)
+
+    async def create(payload):
+        return await client.connectapi("/workout-service/workout", method="POST", json=payload)
+
+    async def update(w_id, payload):
+        response = await client.connectapi(f"/workout-service/workout/{w_id}", method="PUT", json=dict(payload, workoutId=w_id))
+        if server_workout(response): return response
+        try:
+            return await client.connectapi(f"/workout-service/workout/{w_id}")
+        except Exception as e:
+            print(f"⚠️ Treino {w_id} atualizado, mas a releitura falhou: {e}")
+            return None
+
+    async def push_one(item):
+        payload, content_hash, action, w_id = item
+        name = payload['workoutName']
+        if action == UNCHANGED:
+            return {"workoutName": name, "id": w_id, "action": UNCHANGED, "error": None}
+        try:
+            if action == UPDATED:
+                try:
+                    workout = await update(w_id, payload)
+                except Exception as e:
+                    if error_status(e) != 404: raise
+                    await asyncio.to_thread(store.remove, [w_id])
+                    action, w_id, workout = CREATED, None, await create(payload)
+            else:
+                workout = await create(payload)
+            return await asyncio.to_thread(pushed_result, store, name, action, workout, content_hash, w_id)
+        except Exception as e:
+            return push_error(name, action, e)
+
+    return await run_bulk_async(plan, push_one, workers, on_result, cancel, push_cancelled)
+
+
+def summarize(results):
+    """Contagem por status: {"deleted": n, "not_found": n, "failed": n} (+ "cancelled", se houver)."""
+    counts = {DELETED: 0, NOT_FOUND: 0, FAILED: 0}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Catálogo binário compacto de exercícios (data/processed/exercises.bin).
+
+Gerado pelo build_db.py junto com o exercises.json e lido via mmap: abrir
+o arquivo não faz json.load nem cria um dict por exercício, e as páginas
+ficam no cache do sistema, compartilhadas entre os processos. O índice de
+busca (search_engine) não fica no arquivo: cada processo ainda monta o seu
+a partir dos textos pré-normalizados, e ele é a maior parte da memória.
+
+Layout (little-endian):
+    cabeçalho   MAGIC, versão, nº de registros, nº de strings, nº de categorias
+    offsets     (n_strings + 1) x uint32 -> início de cada string no blob
+    categorias  n_categorias x uint32    -> índice da string da categoria
+    registros   n x (id, label, search_term, internal_key, search_text: uint32,
+                     categoria: uint16, flags: uint8) -> largura fixa
+    ordem_id    n x uint32 -> posições ordenadas por id (busca binária)
+    ordem_chave uint32 + k x uint32 -> posições ordenadas por internal_key
+    blob        strings UTF-8 internadas (cada string aparece uma vez)
+
+Para economizar espaço, campos deriváveis não são repetidos no blob (flags):
+o search_text guarda só o que vem depois de "search_term " e a internal_key
+é omitida quando o id é "CATEGORIA_INTERNAL_KEY".
+"""
+import os
+import json
+import mmap
+import struct
+from collections.abc import Mapping, Sequence
+
+from search_engine import normalize_text
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCESSED_DIR = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'processed')
+JSON_FILE = os.path.join(PROCESSED_DIR, 'exercises.json')
+CATALOG_FILE = os.path.join(PROCESSED_DIR, 'exercises.bin')
+
+MAGIC = b'GXCATLG\x00'
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct('<8sIIII')
+RECORD = struct.Struct('<IIIIIHBx')
+UINT32 = struct.Struct('<I')
+
+FIELDS = ('id', 'label', 'search_term', 'internal_key', 'search_text')
+
+TEXT_AFTER_TERM = 1     # search_text = search_term + " " + string guardada
+KEY_FROM_ID = 2         # internal_key = id sem o prefixo "CATEGORIA_"
+NO_TERM = 4             # item sem a chave search_term no JSON
+NO_CATEGORY = 8         # item sem a chave category (guardado como UNCATEGORIZED)
+
+
+def search_text_for(item):
+    """Texto de busca normalizado (o mesmo que o índice calcularia)."""
+    return normalize_text((item.get('search_term', '') or '') + " " + item['label'])
+
+
+def write_catalog(exercises, path=CATALOG_FILE):
+    """Serializa a lista de exercícios (ordem do JSON) no formato binário."""
+    strings, string_ids = [], {}
+    categories, category_ids = [], {}
+
+    def intern(value):
+        if value is None: return NONE
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    records = []
+    for item in exercises:
+        category = item.get('category') or 'UNCATEGORIZED'
+        if category not in category_ids:
+            category_ids[category] = len(categories)
+            categories.append(intern(category))
+        values = dict(item, search_text=search_text_for(item))
+        flags = 0
+        if 'search_term' not in item: flags |= NO_TERM
+        if 'category' not in item: flags |= NO_CATEGORY
+
+        term_prefix = (item.get('search_term') or '') + " "
+        if item.get('search_term') and values['search_text'].startswith(term_prefix):
+            values['search_text'] = values['search_text'][len(term_prefix):]
+            flags |= TEXT_AFTER_TERM
+        if item.get('internal_key') and item['id'] == f"{category}_{item['internal_key']}":
+            values['internal_key'] = None
+            flags |= KEY_FROM_ID
+
+        records.append(tuple(intern(values.get(field)) for field in FIELDS) + (category_ids[category], flags))
+
+    positions = range(len(exercises))
+    id_order = sorted(positions, key=lambda p: exercises[p]['id'])
+    # sorted é estável: entre chaves repetidas a última posição fica por último
+    key_order = sorted((p for p in positions if exercises[p].get('internal_key') is not None),
+                       key=lambda p: exercises[p]['internal_key'])
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets, cursor = [], 0
+    for raw in encoded:
+        offsets.append(cursor)
+        cursor += len(raw)
+    offsets.append(cursor)
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(records), len(strings), len(categories))]
+    parts.append(struct.pack(f'<{len(offsets)}I', *offsets))
+    parts.append(struct.pack(f'<{len(categories)}I', *categories))
+    parts.extend(RECORD.pack(*r) for r in records)
+    parts.append(struct.pack(f'<{len(id_order)}I', *id_order))
+    parts.append(UINT32.pack(len(key_order)))
+    parts.append(struct.pack(f'<{len(key_order)}I', *key_order))
+    parts.extend(encoded)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
+    return path
+
+
+class CompactCatalog(Mapping):
+    """
+    Catálogo mapeado em memória. Funciona como o antigo dict {id: item}:
+    cada item é decodificado do mmap só quando acessado.
+    """
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, n_strings, n_categories = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._buf.close()
+            raise ValueError(f"Catálogo inválido ou de versão antiga: {path}")
+
+        self._count = count
+        self._offsets_at = HEADER.size
+        self._categories_at = self._offsets_at + (n_strings + 1) * 4
+        self._records_at = self._categories_at + n_categories * 4
+        self._id_order_at = self._records_at + count * RECORD.size
+        key_count_at = self._id_order_at + count * 4
+        self._key_count = UINT32.unpack_from(self._buf, key_count_at)[0]
+        self._key_order_at = key_count_at + 4
+        self._blob_at = self._key_order_at + self._key_count * 4
+
+        self._categories = [self._string(UINT32.unpack_from(self._buf, self._categories_at + i * 4)[0])
+                            for i in range(n_categories)]
+        self.records = CatalogRecords(self)
+        self.internal_keys = InternalKeyMap(self)
+
+    def close(self):
+        self._buf.close()
+
+    # --- Acesso de baixo nível ---
+
+    def _string(self, idx):
+        if idx == NONE: return None
+        start, end = struct.unpack_from('<II', self._buf, self._offsets_at + idx * 4)
+        return self._buf[self._blob_at + start:self._blob_at + end].decode('utf-8')
+
+    def _field(self, pos, field_idx):
+        return self._string(UINT32.unpack_from(self._buf, self._records_at + pos * RECORD.size + field_idx * 4)[0])
+
+    def _unpack(self, pos):
+        """Registro completo, com os campos deriváveis já reconstruídos."""
+        ex_id, label, search_term, internal_key, search_text, cat, flags = \
+            RECORD.unpack_from(self._buf, self._records_at + pos * RECORD.size)
+        ex_id, search_term, category = self._string(ex_id), self._string(search_term), self._categories[cat]
+
+        if flags & KEY_FROM_ID: internal_key = ex_id[len(category) + 1:]
+        else: internal_key = self._string(internal_key)
+
+        search_text = self._string(search_text)
+        if flags & TEXT_AFTER_TERM: search_text = search_term + " " + search_text
+        return ex_id, label, search_term, internal_key, search_text, category, flags
+
+    def _internal_key(self, pos):
+        return self._unpack(pos)[3]
+
+    def _order(self, base, i):
+        return UINT32.unpack_from(self._buf, base + i * 4)[0]
+
+    def record(self, pos):
+        """Item na posição `pos`, só com as chaves que ele tinha no exercises.json."""
+        ex_id, label, search_term, internal_key, _, category, flags = self._unpack(pos)
+        item = {"id": ex_id, "label": self._string(label)}
+        if not flags & NO_TERM: item["search_term"] = search_term
+        if not flags & NO_CATEGORY: item["category"] = category
+        if internal_key is not None: item["internal_key"] = internal_key
+        return item
+
+    def search_text(self, pos):
+        return self._unpack(pos)[4]
+
+    def search_texts(self):
+        """Textos de busca pré-normalizados, na ordem do catálogo."""
+        return [self.search_text(pos) for pos in range(self._count)]
+
+    def _bisect(self, base, count, get_value, key, right=False):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = get_value(self._order(base, mid))
+            if value < key or (right and value == key): lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def position_of(self, ex_id):
+        if not isinstance(ex_id, str): return None
+        i = self._bisect(self._id_order_at, self._count, lambda p: self._field(p, 0), ex_id)
+        if i < self._count:
+            pos = self._order(self._id_order_at, i)
+            if self._field(pos, 0) == ex_id: return pos
+        return None
+
+    # --- Interface de Mapping (id -> item) ---
+
+    def __getitem__(self, ex_id):
+        pos = self.position_of(ex_id)
+        if pos is None: raise KeyError(ex_id)
+        return self.record(pos)
+
+    def __contains__(self, ex_id):
+        return self.position_of(ex_id) is not None
+
+    def __iter__(self):
+        for pos in range(self._count):
+            yield self._field(pos, 0)
+
+    def __len__(self):
+        return self._count
+
+
+class CatalogRecords(Sequence):
+    """Visão por posição (ordem do catálogo), usada pelo índice de busca."""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self._catalog.record(p) for p in range(len(self))[pos]]
+        if pos < 0: pos += len(self)
+        if not 0 <= pos < len(self): raise IndexError(pos)
+        return self._catalog.record(pos)
+
+    def __len__(self):
+        return len(self._catalog)
+
+
+class InternalKeyMap(Mapping):
+    """internal_key -> id (em chaves repetidas vence a última, como no dict antigo)."""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def _position(self, key):
+        c = self._catalog
+        if not isinstance(key, str) or not c._key_count: return None
+        i = c._bisect(c._key_order_at, c._key_count, c._internal_key, key, right=True) - 1
+        if i >= 0:
+            pos = c._order(c._key_order_at, i)
+            if c._internal_key(pos) == key: return pos
+        return None
+
+    def __getitem__(self, key):
+        pos = self._position(key)
+        if pos is None: raise KeyError(key)
+        return self._catalog._field(pos, 0)
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __iter__(self):
+        c = self._catalog
+        seen = set()
+        for i in range(c._key_count):
+            key = c._internal_key(c._order(c._key_order_at, i))
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def load_catalog(path=CATALOG_FILE):
+    """Abre o catálogo binário; None se não existir ou estiver inválido."""
+    if not os.path.exists(path): return None
+    try:
+        return CompactCatalog(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️ Erro ao abrir catálogo binário: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # Converte o exercises.json atual sem precisar rodar o build_db.py inteiro
+    with open(JSON_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    write_catalog(data)
+    print(f"✅ Catálogo binário gerado com {len(data)} exercícios: {CATALOG_FILE}")
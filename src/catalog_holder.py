@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Catálogo de exercícios + regras de busca com recarga a quente.
+
+O app pega sempre o retrato atual (CatalogSnapshot) com holder.current(): é
+só ler um atributo, sem abrir arquivo nenhum. Uma thread de fundo confere o
+mtime/tamanho do exercises.bin, do exercises.json e do search_rules.json a
+cada RELOAD_INTERVAL segundos; se algo mudou, monta o índice novo fora do
+caminho das requisições e troca o retrato de uma vez. Quem já pegou o
+retrato antigo termina com ele (o mmap antigo continua válido até ser
+coletado), então rodar o build_db com o app no ar não derruba nada.
+
+on_load(snapshot) roda antes de cada retrato entrar no ar (na primeira
+carga e na thread de recarga): é onde o app pré-monta o que só depende da
+versão do catálogo, como as respostas JSON já comprimidas.
+"""
+import os
+import copy
+import json
+import threading
+import time
+
+from catalog import load_catalog
+from search_engine import ExerciseSearchIndex
+
+RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "2") or 0)   # 0 = sem recarga
+
+
+class CatalogSnapshot:
+    """Versão imutável do catálogo: tudo que uma requisição precisa, coerente entre si."""
+
+    def __init__(self, exercises, internal_keys, rules, index, stamps):
+        self.exercises = exercises          # {id: item} (ou CompactCatalog)
+        self.internal_keys = internal_keys  # {internal_key: id}
+        self.rules = rules                  # search_rules.json como veio do disco
+        self.index = index                  # ExerciseSearchIndex já com as regras
+        self.stamps = stamps                # (mtime, tamanho) dos arquivos de origem
+        self.loaded_at = time.time()
+        self.responses = {}                 # Preenchido pelo on_load do app
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class CatalogHolder:
+    def __init__(self, catalog_file, json_file, rules_file, interval=RELOAD_INTERVAL, on_load=None):
+        self.catalog_file = catalog_file
+        self.json_file = json_file
+        self.rules_file = rules_file
+        self.interval = interval
+        self.on_load = on_load
+        self.reloads = 0
+        self._snapshot = None
+        self._failed_stamps = None
+        self._lock = threading.Lock()
+        self._watching = False
+        if hasattr(os, 'register_at_fork'):
+            # Threads não sobrevivem ao fork (gunicorn --preload): cada worker liga a sua
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._watching = False
+
+    def current(self):
+        """Retrato atual. Só a primeira chamada do processo carrega do disco."""
+        snapshot = self._snapshot
+        if snapshot is not None and (self._watching or not self.interval):
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                snapshot = self._load(self._stamps(), None)
+                if snapshot is None:
+                    # Sem catálogo: sobe vazio e a recarga pega quando o build_db gerar os arquivos
+                    snapshot = CatalogSnapshot({}, {}, {}, None, None)
+                self._snapshot = self._prepare(snapshot)
+            if self.interval and not self._watching:
+                self._watching = True
+                threading.Thread(target=self._watch, name="catalog-reload", daemon=True).start()
+            return self._snapshot
+
+    def _prepare(self, snapshot):
+        if self.on_load: self.on_load(snapshot)
+        return snapshot
+
+    def _stamps(self):
+        return tuple(file_stamp(p) for p in (self.catalog_file, self.json_file, self.rules_file))
+
+    def _load_rules(self):
+        if not os.path.exists(self.rules_file): return {}
+        try:
+            with open(self.rules_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar regras: {e}")
+            return None
+
+    def _load(self, stamps, previous):
+        """Monta um retrato novo. Se só as regras mudaram, reaproveita o índice."""
+        rules = self._load_rules()
+        if rules is None:
+            # Arquivo no meio de uma edição/inválido: segue com as regras que estavam no ar
+            rules = previous.rules if previous is not None else {}
+
+        if previous is not None and previous.index is not None and previous.stamps[:2] == stamps[:2]:
+            index = copy.copy(previous.index)   # Cópia rasa: postings compartilhados, regras novas
+            index.set_rules(rules)
+            return CatalogSnapshot(previous.exercises, previous.internal_keys, rules, index, stamps)
+
+        # Preferência: catálogo binário via mmap (o índice é montado aqui, por processo)
+        catalog = load_catalog(self.catalog_file)
+        if catalog is not None:
+            index = ExerciseSearchIndex(catalog.records, rules, search_texts=catalog.search_texts())
+            print(f"📦 Catálogo binário carregado: {len(catalog)} itens.")
+            return CatalogSnapshot(catalog, catalog.internal_keys, rules, index, stamps)
+
+        if not os.path.exists(self.json_file):
+            print(f"❌ DB não encontrado em: {self.json_file}")
+            return None
+        try:
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ Erro ao carregar DB: {e}")
+            return None
+        exercises = {item['id']: item for item in data}
+        internal_keys = {item.get('internal_key'): item['id'] for item in data if 'internal_key' in item}
+        print(f"📦 DB Carregado: {len(exercises)} itens.")
+        return CatalogSnapshot(exercises, internal_keys, rules, ExerciseSearchIndex(data, rules), stamps)
+
+    def refresh(self):
+        """Confere os arquivos e troca o retrato se mudaram. True se recarregou."""
+        stamps = self._stamps()
+        current = self._snapshot
+        if current is not None and stamps == current.stamps: return False
+        if stamps == self._failed_stamps: return False
+
+        snapshot = self._load(stamps, current)
+        if snapshot is None:
+            # Mantém o que estava no ar; tenta de novo quando os arquivos mudarem
+            self._failed_stamps = stamps
+            return False
+        self._snapshot = self._prepare(snapshot)
+        self._failed_stamps = None
+        self.reloads += 1
+        print(f"🔄 Catálogo/regras recarregados ({len(snapshot.exercises)} itens, {len(snapshot.rules)} regras).")
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Erro ao recarregar catálogo: {e}")
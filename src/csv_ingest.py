@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura das planilhas de treino (treino_manual.csv e o CSV do editor).
+
+Lê linha a linha com o módulo csv (sem pandas): nada além da linha atual
+fica em memória enquanto o arquivo é lido. Cada linha vira um dict com as
+colunas já limpas e convertidas; valores vazios usam o padrão da coluna e
+valores inválidos também, mas ficam anotados em `errors` (com o número da
+linha) para quem chamou avisar o usuário.
+
+Aceita vírgula, ponto e vírgula (Excel em português) ou tab como separador
+e vírgula decimal no peso ("22,5").
+"""
+import io
+import os
+import csv
+
+COLUMNS = ('treino', 'exercicio', 'nota_personalizada', 'series', 'reps', 'peso_kg', 'intervalo_segundos')
+
+# Padrão quando a célula está vazia ou inválida (mesmos do editor web)
+DEFAULT_WORKOUT = "Treino Importado"
+NUMERIC_DEFAULTS = {'series': 3, 'reps': 10, 'peso_kg': 0.0, 'intervalo_segundos': 60}
+INTEGER_COLUMNS = ('series', 'reps', 'intervalo_segundos')
+
+DELIMITERS = ",;\t"
+MAX_ROWS = int(os.getenv("CSV_MAX_ROWS", "50000") or 50000)
+
+
+class CsvFormatError(ValueError):
+    """Arquivo que não dá para ler como planilha de treino."""
+
+
+def open_text(source):
+    """Caminho, stream binário (upload) ou stream de texto -> stream de texto."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'r', encoding='utf-8-sig', newline='')
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+
+
+def parse_number(value, column):
+    """Texto da célula -> número da coluna. ValueError se inválido."""
+    number = float(value.replace(',', '.'))
+    if number != number or number < 0: raise ValueError(value)    # NaN ou negativo
+    return int(number) if column in INTEGER_COLUMNS else number
+
+
+class WorkoutCsv:
+    """
+    Itera as linhas já convertidas:
+    {"line", "treino", "exercicio", "nota_personalizada", "series", "reps",
+     "peso_kg", "intervalo_segundos"}. Problemas ficam em self.errors:
+    {"line", "column", "value", "message"}.
+    """
+
+    def __init__(self, source, max_rows=MAX_ROWS):
+        self.source = source
+        self.max_rows = max_rows
+        self.columns = None
+        self.errors = []
+        self.rows_read = 0
+
+    def _error(self, line, column, value, message):
+        self.errors.append({"line": line, "column": column, "value": value, "message": message})
+
+    def _reader(self, text):
+        header_line = text.readline()
+        if not header_line.strip(): raise CsvFormatError("Arquivo vazio")
+        delimiter = max(DELIMITERS, key=header_line.count)
+        header = next(csv.reader([header_line], delimiter=delimiter))
+        self.columns = [c.lower().strip() for c in header]
+        return csv.reader(text, delimiter=delimiter)
+
+    def __iter__(self):
+        text = open_text(self.source)
+        try:
+            reader = self._reader(text)
+            width = len(self.columns)
+            for values in reader:
+                line = reader.line_num + 1      # + cabeçalho
+                if not any(v.strip() for v in values): continue
+                if self.rows_read >= self.max_rows:
+                    self._error(line, None, None, f"Limite de {self.max_rows} linhas: o resto do arquivo foi ignorado")
+                    return
+                if len(values) > width:
+                    self._error(line, None, None, f"{len(values)} colunas, cabeçalho tem {width}: sobras ignoradas")
+                self.rows_read += 1
+                yield self._convert(line, dict(zip(self.columns, values)))
+        except UnicodeDecodeError as e:
+            raise CsvFormatError(f"Arquivo não está em UTF-8: {e}") from e
+        except csv.Error as e:
+            raise CsvFormatError(f"CSV inválido: {e}") from e
+        finally:
+            if text is not self.source: text.close()
+
+    def _convert(self, line, raw):
+        row = {"line": line}
+        for column in ('treino', 'exercicio', 'nota_personalizada'):
+            row[column] = (raw.get(column) or "").strip()
+        if 'treino' not in raw: row['treino'] = DEFAULT_WORKOUT
+
+        for column, default in NUMERIC_DEFAULTS.items():
+            value = (raw.get(column) or "").strip()
+            if not value:
+                row[column] = default
+                continue
+            try:
+                row[column] = parse_number(value, column)
+            except ValueError:
+                row[column] = default
+                self._error(line, column, value, f"'{value}' inválido em {column}, usando {default}")
+        return row
+
+    def workouts(self):
+        """Lê o arquivo todo agrupando por treino: {nome: [linhas]} na ordem de aparição."""
+        groups = {}
+        for row in self:
+            groups.setdefault(row['treino'], []).append(row)
+        return groups
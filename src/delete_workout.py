@@ -1,45 +1,53 @@
 import os
 import argparse
-from garminconnect import Garmin
 from dotenv import load_dotenv
+from workout_store import WorkoutStore, name_filter
+import garmin_session
+from bulk_ops import delete_workouts_bulk, summarize, DEFAULT_WORKERS, DELETED, NOT_FOUND, FAILED
 
 load_dotenv()
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKOUT_STORE_FILE = os.path.join(ROOT_DIR, 'data', 'workouts.db')
+
 def authenticate():
-    email = os.getenv("GARMIN_EMAIL")
-    password = os.getenv("GARMIN_PASSWORD")
-    if not email or not password:
-        print("❌ Credenciais ausentes no arquivo .env")
-        exit()
     try:
-        client = Garmin(email, password)
-        client.login()
-        return client
+        # Reaproveita os tokens salvos; só faz login com senha se preciso
+        return garmin_session.get_client()
     except Exception as e:
         print(f"❌ Erro no login: {e}")
         exit()
 
-def get_all_workouts(client):
-    """Busca a lista completa de treinos com fallback de método."""
+def load_workouts(client, store):
+    """
+    Lista atual da Garmin (o espelho local é sincronizado antes). Deleção
+    nunca filtra pelo espelho antigo: um treino renomeado ou recriado desde
+    a última sincronização seria apagado (ou poupado) pelo nome velho.
+    """
+    print("🔄 Sincronizando lista de treinos com a Garmin...")
     try:
-        if hasattr(client, 'get_workouts'):
-            return client.get_workouts()
-        else:
-            print("⚠️ Método get_workouts nativo não encontrado, usando API direta...")
-            return client.connectapi("/workout-service/workouts", method="GET")
+        # Lista paginada (start/limit), várias páginas em paralelo
+        store.refresh_summaries(client)
     except Exception as e:
         print(f"❌ Erro ao buscar lista de treinos: {e}")
-        return []
+        return None
+    return store.summaries()
 
-def delete_workouts(filter_name=None, delete_all=False):
-    if not filter_name and not delete_all:
-        print("❌ Você precisa especificar um filtro (--filter) ou usar --all.")
+def delete_workouts(filter_name=None, delete_all=False, workers=DEFAULT_WORKERS, pattern=None):
+    if not filter_name and not pattern and not delete_all:
+        print("❌ Você precisa especificar um filtro (--filter ou --regex) ou usar --all.")
+        return
+    try:
+        matches_regex = name_filter('regex', pattern) if pattern else None
+    except ValueError as e:
+        print(f"❌ {e}")
         return
 
     client = authenticate()
-    print("🔐 Logado. Buscando treinos...")
+    print("🔐 Sessão pronta. Buscando treinos...")
 
-    workouts_list = get_all_workouts(client)
+    store = WorkoutStore(WORKOUT_STORE_FILE)
+    workouts_list = load_workouts(client, store)
     
     if not isinstance(workouts_list, list):
         print("❌ Formato de resposta inválido da Garmin.")
@@ -57,6 +65,9 @@ def delete_workouts(filter_name=None, delete_all=False):
         elif filter_name and filter_name in w_name:
             # Verifica se o nome do treino CONTÉM o texto do filtro
             targets.append(w)
+        elif matches_regex and matches_regex(w_name):
+            # Nome casa com a expressão regular (sem diferenciar maiúsculas)
+            targets.append(w)
 
     if not targets:
         print("✅ Nenhum treino encontrado com os critérios fornecidos.")
@@ -66,7 +77,7 @@ def delete_workouts(filter_name=None, delete_all=False):
     if delete_all:
         print(f"🚨 MODO DELETAR TUDO ATIVADO! Isso apagará TODOS os seus treinos.")
     else:
-        print(f"🎯 Filtro aplicado: '{filter_name}'")
+        print(f"🎯 Filtro aplicado: '{filter_name or pattern}'")
         # Lista os primeiros 5 nomes para o usuário conferir
         print("Exemplos que serão deletados:", [t['workoutName'] for t in targets[:5]])
 
@@ -76,23 +87,26 @@ def delete_workouts(filter_name=None, delete_all=False):
         print("⛔ Operação cancelada.")
         return
 
-    # Loop de Deleção
-    print("\n🚀 Iniciando remoção...")
-    count = 0
-    for w in targets:
-        w_id = w['workoutId']
-        w_name = w['workoutName']
-        
-        print(f"[{count+1}/{len(targets)}] Deletando: {w_name} (ID: {w_id})...", end=" ")
-        
-        try:
-            client.connectapi(f"/workout-service/workout/{w_id}", method="DELETE")
-            print("✅ Sucesso")
-            count += 1
-        except Exception as e:
-            print(f"❌ Falha: {e}")
+    # Deleção em paralelo (com backoff se a Garmin limitar)
+    print(f"\n🚀 Iniciando remoção ({workers} em paralelo)...")
+    names = {w['workoutId']: w['workoutName'] for w in targets}
+    done = []
+
+    def report(result):
+        done.append(result)
+        w_id = result['id']
+        prefix = f"[{len(done)}/{len(targets)}] {names.get(w_id)} (ID: {w_id})"
+        if result['status'] == DELETED: print(f"{prefix} ✅ Deletado")
+        elif result['status'] == NOT_FOUND: print(f"{prefix} ⚠️  Não encontrado (já removido?)")
+        else: print(f"{prefix} ❌ Falha: {result['reason']}")
+
+    results = delete_workouts_bulk(client, list(names), workers=workers, on_result=report)
+    store.remove([r['id'] for r in results if r['status'] in (DELETED, NOT_FOUND)])
 
-    print(f"\n🧹 Limpeza concluída! {count} treinos removidos.")
+    counts = summarize(results)
+    print(f"\n🧹 Limpeza concluída! {counts[DELETED]} removidos, {counts[NOT_FOUND]} não encontrados, {counts[FAILED]} falhas.")
+    for r in results:
+        if r['status'] == FAILED: print(f"   ❌ {names.get(r['id'])} (ID: {r['id']}): {r['reason']}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Script para deletar treinos do Garmin Connect")
@@ -100,10 +114,19 @@ if __name__ == "__main__":
     # Argumento Opcional: Filtro por nome
     parser.add_argument("--filter", type=str, help="Texto que deve estar no nome do treino para ser deletado (ex: 'DBG_')")
     
+    # Argumento Opcional: Filtro por expressão regular
+    parser.add_argument("--regex", type=str, help="Expressão regular para o nome do treino, sem diferenciar maiúsculas (ex: '^DBG_\\d+')")
+
     # Argumento Opcional: Deletar tudo
     parser.add_argument("--all", action="store_true", help="Deleta TODOS os treinos da conta")
 
+    # Sem efeito: a lista sempre vem da Garmin (aceito para não quebrar scripts antigos)
+    parser.add_argument("--refresh", action="store_true", help=argparse.SUPPRESS)
+
+    # Argumento Opcional: Quantas deleções simultâneas
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Deleções em paralelo (padrão: {DEFAULT_WORKERS})")
+
     args = parser.parse_args()
 
     # Executa a função passando os argumentos
-    delete_workouts(filter_name=args.filter, delete_all=args.all)
+    delete_workouts(filter_name=args.filter, delete_all=args.all, workers=max(1, args.workers), pattern=args.regex)
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 import os
+import json
+import codecs
+import hashlib
 import requests
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs
 
 # Links que descobrimos
@@ -15,6 +21,12 @@ URLS = [
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Sobe um nível e entra em data/raw
 RAW_DATA_DIR = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'raw')
+# ETag/Last-Modified e hash de cada arquivo baixado (lido também pelo build_db)
+DOWNLOAD_META_FILE = os.path.join(RAW_DATA_DIR, '.download_meta.json')
+
+DOWNLOAD_WORKERS = 4
+TIMEOUT = 30            # segundos
+CHUNK_SIZE = 1 << 16
 
 def get_filename_from_url(url):
     """Gera um nome de arquivo único baseado na URL e na versão (bust)."""
@@ -31,7 +43,97 @@ def get_filename_from_url(url):
     # Monta o nome final: exercise_types_pt_BR_5.21.0.16.txt
     return f"{name_without_ext}_{version}.txt"
 
-def download_data():
+def load_meta():
+    try:
+        with open(DOWNLOAD_META_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_meta(meta):
+    tmp_path = DOWNLOAD_META_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, DOWNLOAD_META_FILE)
+
+def make_session(workers=DOWNLOAD_WORKERS):
+    """Sessão com pool de conexões (keep-alive) compartilhada entre as threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fetch_file(session, url, previous):
+    """
+    Baixa uma URL com revalidação (If-None-Match / If-Modified-Since).
+    O corpo vai direto para um temporário em UTF-8 e só substitui o arquivo
+    se terminar inteiro. Retorna (nome, metadados novos, mudou?).
+    """
+    filename = get_filename_from_url(url)
+    filepath = os.path.join(RAW_DATA_DIR, filename)
+
+    headers = {}
+    if previous and os.path.exists(filepath):
+        if previous.get("etag"): headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"): headers["If-Modified-Since"] = previous["last_modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 304:
+            return filename, dict(previous, checked_at=datetime.now().isoformat(timespec='seconds')), False
+        response.raise_for_status() # Lança erro se der 404/500
+
+        # Mesmo que o response.text: respeita o charset do servidor, grava em UTF-8
+        encoding = response.encoding or 'utf-8'
+        decoder = None if codecs.lookup(encoding).name == 'utf-8' else codecs.getincrementaldecoder(encoding)()
+
+        tmp_path = filepath + '.part'
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if decoder: chunk = decoder.decode(chunk).encode('utf-8')
+                    digest.update(chunk)
+                    f.write(chunk)
+                if decoder:
+                    tail = decoder.decode(b'', final=True).encode('utf-8')
+                    digest.update(tail)
+                    f.write(tail)
+        except BaseException:
+            # Download interrompido: o arquivo anterior fica intacto e o pedaço sai
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        changed = not os.path.exists(filepath) or file_sha256(filepath) != sha256
+        if changed: os.replace(tmp_path, filepath)
+        else: os.remove(tmp_path)   # Mesmo conteúdo: não mexe no arquivo (nem no mtime)
+
+        st = os.stat(filepath)
+        return filename, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": sha256,
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "checked_at": datetime.now().isoformat(timespec='seconds'),
+        }, changed
+
+def download_data(urls=URLS, workers=DOWNLOAD_WORKERS):
+    """
+    Baixa as URLs em paralelo. Arquivos que a Garmin não mudou (304 ou
+    mesmo conteúdo) ficam intactos. Retorna a lista de arquivos alterados;
+    o campo "changed" do .download_meta.json avisa o build_db.
+    """
     print(f"🚀 Iniciando extração de dados...")
     print(f"📂 Pasta de destino: {RAW_DATA_DIR}")
     
@@ -40,26 +142,38 @@ def download_data():
         os.makedirs(RAW_DATA_DIR)
         print("   -> Pasta criada.")
 
-    for url in URLS:
-        filename = get_filename_from_url(url)
-        filepath = os.path.join(RAW_DATA_DIR, filename)
-        
-        print(f"⬇️  Baixando: {filename}...")
-        
-        try:
-            response = requests.get(url)
-            response.raise_for_status() # Lança erro se der 404/500
-            
-            # Salva o conteúdo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-                
-            print(f"   ✅ Salvo!")
-            
-        except Exception as e:
-            print(f"   ❌ Erro ao baixar {url}: {e}")
-
-    print("\n✨ Download concluído! Agora rode o 'build_db.py' para processar.")
+    meta = load_meta()
+    files_meta = meta.get("files", {})
+    changed = []
+
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(fetch_file, session, url, files_meta.get(get_filename_from_url(url))): url
+                   for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                filename, file_meta, file_changed = future.result()
+            except Exception as e:
+                print(f"   ❌ Erro ao baixar {url}: {e}")
+                continue
+            files_meta[filename] = file_meta
+            if file_changed:
+                changed.append(filename)
+                print(f"⬇️  {filename}: ✅ Salvo!")
+            else:
+                print(f"⬇️  {filename}: sem mudanças")
+
+    save_meta({
+        "files": files_meta,
+        "changed": sorted(changed),
+        "updated_at": datetime.now().isoformat(timespec='seconds'),
+    })
+
+    if changed:
+        print("\n✨ Download concluído! Agora rode o 'build_db.py' para processar.")
+    else:
+        print("\n✨ Nada mudou desde o último download, a base continua atual.")
+    return changed
 
 if __name__ == "__main__":
-    download_data()
\ No newline at end of file
+    download_data()
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor falso da API da Garmin para testes de carga locais.
+
+Implementa só o que o app, o upload_csv e o delete_workout usam:
+    GET    /workout-service/workouts?start=&limit=
+    GET    /workout-service/workout/<id>
+    POST   /workout-service/workout
+    PUT    /workout-service/workout/<id>
+    DELETE /workout-service/workout/<id>
+    GET    /userprofile-service/socialProfile            (login com tokens)
+    GET    /userprofile-service/userprofile/user-settings (login com tokens)
+
+Cada token de acesso (Authorization: Bearer ...) é uma conta com a sua
+biblioteca em memória, então o PUSH para várias contas também funciona.
+Latência, erros 5xx e 429 são configuráveis (ver Faults). Rotas de
+controle (sem falhas nem latência): GET /_fake/stats devolve as contagens
+por rota/status (DELETE zera) e POST /_fake/seed {"account", "count"} cria
+treinos direto na conta (ex.: para testar a deleção).
+
+O app fala com ele pelo cliente de verdade do garminconnect: aponte
+GARMIN_API_URL para o servidor e GARMIN_TOKEN_DIR para uma pasta com tokens
+falsos (seed_tokens). O login com senha continua indo à Garmin.
+
+Uso:
+    python fake_garmin.py --port 8765 --workouts 200 --latency 0.08 --jitter 0.04 --throttle-rate 0.02
+    GARMIN_API_URL=http://127.0.0.1:8765 GARMIN_TOKEN_DIR=data/fake_session python app.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api_scheduler import TokenBucket
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(CURRENT_DIR)
+EXERCISES_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.json')
+
+DEFAULT_PORT = 8765
+LOADTEST_ACCOUNT = "fake-loadtest"      # Token gravado por seed_tokens()
+WORKOUT_PATH = re.compile(r'^/workout-service/workout/(\d+)$')
+
+
+def seed_tokens(token_dir, token=LOADTEST_ACCOUNT):
+    """Grava tokens falsos (formato do garminconnect >= 0.3): o login só lê o disco."""
+    os.makedirs(token_dir, exist_ok=True)
+    with open(os.path.join(token_dir, 'garmin_tokens.json'), 'w', encoding='utf-8') as f:
+        json.dump({"di_token": token, "di_refresh_token": None, "di_client_id": None}, f)
+    return token
+
+
+def sample_workouts(count, seed=42, exercises_file=EXERCISES_FILE):
+    """Treinos de força com passos de exercícios reais do catálogo (mesmo formato da Garmin)."""
+    rng = random.Random(seed)
+    try:
+        with open(exercises_file, 'r', encoding='utf-8') as f:
+            catalog = [(e['category'], e.get('internal_key') or e['id']) for e in json.load(f) if e.get('category')]
+    except (OSError, ValueError, KeyError):
+        catalog = [("BENCH_PRESS", "BARBELL_BENCH_PRESS"), ("SQUAT", "BARBELL_BACK_SQUAT")]
+
+    workouts = []
+    for i in range(count):
+        steps = []
+        for order in range(1, rng.randint(4, 8) + 1):
+            category, name = rng.choice(catalog)
+            steps.append({
+                "type": "RepeatGroupDTO", "stepOrder": order, "numberOfIterations": rng.choice([3, 4]),
+                "workoutSteps": [
+                    {"type": "ExecutableStepDTO", "stepType": {"stepTypeId": 3, "stepTypeKey": "interval"},
+                     "category": category, "exerciseName": name, "endConditionValue": rng.choice([8, 10, 12])},
+                    {"type": "ExecutableStepDTO", "stepType": {"stepTypeId": 5, "stepTypeKey": "rest"},
+                     "endConditionValue": rng.choice([45, 60, 90])},
+                ],
+            })
+        workouts.append({
+            "workoutName": f"Carga {i:04d}",
+            "sportType": {"sportTypeId": 5, "sportTypeKey": "strength_training"},
+            "workoutSegments": [{"segmentOrder": 1, "sportType": {"sportTypeId": 5, "sportTypeKey": "strength_training"},
+                                 "workoutSteps": steps}],
+        })
+    return workouts
+
+
+class Faults:
+    """
+    Falhas injetadas em cada requisição de API:
+      latency/jitter  segundos de espera (latency + uniforme(0, jitter));
+      error_rate      fração respondida com 503;
+      throttle_rate   fração respondida com 429 (Retry-After: retry_after);
+      rate_limit      req/s por conta; acima disso, 429 com o tempo real de espera.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1.0, rate_limit=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+
+
+class FakeGarmin:
+    """Estado do servidor: bibliotecas por conta, falhas e contadores."""
+
+    def __init__(self, faults=None, seed_workouts=(), seed=42):
+        self.faults = faults or Faults()
+        self.seed_workouts = list(seed_workouts)
+        self.stats = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rng = random.Random(seed)
+        self._libraries = {}
+        self._buckets = {}
+        self._next_id = 100000
+        self._lock = threading.Lock()
+
+    def library(self, account):
+        """Biblioteca da conta; a primeira vez começa com os treinos de exemplo."""
+        with self._lock:
+            library = self._libraries.get(account)
+            if library is None:
+                library = self._libraries[account] = {}
+                for workout in self.seed_workouts:
+                    self._store(library, dict(workout))
+            return library
+
+    def seed(self, account, count, prefix="Seed"):
+        """Cria `count` treinos na conta sem passar pelas falhas. Retorna os ids."""
+        library = self.library(account)
+        workouts = sample_workouts(count, seed=len(library))
+        with self._lock:
+            return [self._store(library, dict(w, workoutName=f"{prefix} {i:05d}"))['workoutId']
+                    for i, w in enumerate(workouts)]
+
+    def _store(self, library, workout, w_id=None):
+        # Chamado com o lock
+        if w_id is None:
+            self._next_id += 1
+            w_id = self._next_id
+        now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+        workout.update(workoutId=w_id, updateDate=now)
+        workout.setdefault("createdDate", now)
+        library[w_id] = workout
+        return workout
+
+    def injected_fault(self, account):
+        """(status, Retry-After) a responder no lugar da requisição, ou None."""
+        faults = self.faults
+        if faults.rate_limit:
+            with self._lock:
+                bucket = self._buckets.get(account)
+                if bucket is None:
+                    bucket = self._buckets[account] = TokenBucket(rate=faults.rate_limit, burst=faults.rate_limit)
+            wait = bucket.reserve()
+            if wait: return 429, wait
+        with self._lock:
+            roll = self._rng.random()
+        if roll < faults.throttle_rate: return 429, faults.retry_after
+        if roll < faults.throttle_rate + faults.error_rate: return 503, None
+        return None
+
+    def delay(self):
+        faults = self.faults
+        if faults.latency or faults.jitter:
+            time.sleep(faults.latency + random.uniform(0, faults.jitter))
+
+    # --- Rotas (status, corpo) ---
+
+    def handle(self, method, path, query, account, body):
+        if path == '/userprofile-service/socialProfile':
+            return 200, {"displayName": account, "fullName": f"Conta {account}", "userName": account}
+        if path in ('/userprofile-service/userprofile/user-settings', '/userprofile-service/userprofile/settings'):
+            return 200, {"id": 1, "userData": {"measurementSystem": "metric", "weight": 70000.0}}
+
+        library = self.library(account)
+        if path == '/workout-service/workouts' and method == 'GET':
+            start = int(query.get('start', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+            with self._lock:
+                workouts = sorted(library.values(), key=lambda w: w['workoutId'], reverse=True)[start:start + limit]
+                return 200, [{k: v for k, v in w.items() if k != 'workoutSegments'} for w in workouts]
+        if path == '/workout-service/workout' and method == 'POST':
+            if not isinstance(body, dict) or not body.get('workoutName'):
+                return 400, {"message": "Invalid workout"}
+            with self._lock:
+                return 200, dict(self._store(library, dict(body)))
+
+        match = WORKOUT_PATH.match(path)
+        if not match: return 404, {"message": f"Unknown path {path}"}
+        w_id = int(match.group(1))
+        with self._lock:
+            if w_id not in library: return 404, {"message": "Workout not found"}
+            if method == 'GET': return 200, dict(library[w_id])
+            if method == 'DELETE':
+                del library[w_id]
+                return 204, None
+            if method == 'PUT':
+                if not isinstance(body, dict): return 400, {"message": "Invalid workout"}
+                self._store(library, dict(body), w_id)
+                return 204, None
+        return 405, {"message": "Method not allowed"}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self.stats),
+                "maxInFlight": self.max_in_flight,
+                "accounts": {account: len(library) for account, library in self._libraries.items()},
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+            self.max_in_flight = 0
+
+
+class FakeGarminHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'      # keep-alive, como na Garmin
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items(): self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        if url.path == '/_fake/stats':
+            if method == 'DELETE': fake.reset_stats()
+            return self._reply(200, fake.snapshot())
+        if url.path == '/_fake/seed' and method == 'POST':
+            options = json.loads(raw or b'{}')
+            ids = fake.seed(options.get('account', LOADTEST_ACCOUNT), int(options.get('count', 100)),
+                            options.get('prefix', "Seed"))
+            return self._reply(200, {"ids": ids})
+
+        auth = self.headers.get('Authorization', '')
+        if not auth.startswith('Bearer '): return self._reply(401, {"message": "Unauthorized"})
+        account = auth[len('Bearer '):]
+        route = WORKOUT_PATH.sub('/workout-service/workout/{id}', url.path)
+
+        with fake._lock:
+            fake.in_flight += 1
+            fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+        try:
+            fake.delay()
+            fault = fake.injected_fault(account)
+            if fault:
+                status, retry_after = fault
+                headers = {'Retry-After': f"{retry_after:.2f}"} if retry_after else None
+                body = {"message": "Too Many Requests" if status == 429 else "Service Unavailable"}
+                return self._count(method, route, status, body, headers)
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                return self._count(method, route, 400, {"message": "Invalid JSON"})
+            status, body = fake.handle(method, url.path, parse_qs(url.query), account, body)
+            self._count(method, route, status, body)
+        finally:
+            with fake._lock:
+                fake.in_flight -= 1
+
+    def _count(self, method, route, status, body, headers=None):
+        with self.server.fake._lock:
+            self.server.fake.stats[f"{method} {route} {status}"] += 1
+        self._reply(status, body, headers)
+
+    def do_GET(self): self._handle('GET')
+    def do_POST(self): self._handle('POST')
+    def do_PUT(self): self._handle('PUT')
+    def do_DELETE(self): self._handle('DELETE')
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, fake=None, background=False):
+    """Sobe o servidor (port=0 escolhe uma porta livre). Retorna o servidor; .fake tem o estado."""
+    server = ThreadingHTTPServer((host, port), FakeGarminHandler)
+    server.daemon_threads = True
+    server.fake = fake or FakeGarmin()
+    server.url = f"http://{host}:{server.server_port}"
+    if background:
+        threading.Thread(target=server.serve_forever, name="fake-garmin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso da API de treinos da Garmin.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workouts", type=int, default=100, help="Treinos de exemplo em cada conta nova")
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos por requisição")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Segundos extras aleatórios (0 a jitter)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fração de 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After dos 429 aleatórios")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Req/s por conta (0 = sem limite)")
+    parser.add_argument("--token-dir", help="Grava aqui tokens falsos para o app (GARMIN_TOKEN_DIR)")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after, args.rate_limit)
+    server = serve(args.host, args.port, FakeGarmin(faults, sample_workouts(args.workouts)))
+    print(f"🧪 Garmin falsa em {server.url} ({args.workouts} treinos por conta)")
+    if args.token_dir:
+        seed_tokens(args.token_dir)
+        print(f"   GARMIN_API_URL={server.url} GARMIN_TOKEN_DIR={args.token_dir} python app.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Encerrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
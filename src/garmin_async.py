@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Caminho assíncrono das chamadas à Garmin (PULL, PUSH, listagem e remoção).
+
+O garminconnect abre uma requests.Session nova a cada chamada (sem
+keep-alive) e cada operação em massa sobe o seu pool de threads. Aqui cada
+processo tem um único event loop (thread "garmin-io") com um AsyncSession
+do curl_cffi, que já vem com o garminconnect: conexões reaproveitadas, no
+máximo POOL_SIZE em uso, e o fan-out de detalhes/PUTs/DELETEs vira
+corrotinas no loop em vez de threads por requisição.
+
+Login e tokens continuam no GarminSession: daqui só se lê o header de
+autorização do cliente já logado e, num 401, a sessão é renovada por lá.
+Taxa, backoff e retries são os do ApiScheduler da conta (run_async). Com
+várias contas (SessionPool), cada sessão tem o seu cliente, mas todos usam
+o mesmo pool de conexões do processo.
+
+Rotas WSGI entregam a corrotina ao loop com run() (ou iterate(), para
+gerar à medida que chega). O que isso ganha: conexões keep-alive, um pool
+só por processo e o fan-out de uma requisição em corrotinas em vez de um
+pool de threads por rota. O que não ganha: a thread do servidor WSGI que
+atendeu a requisição continua esperando o resultado até o fim, então o
+número de usuários simultâneos ainda é o de threads do servidor (ex.:
+gunicorn --threads). Não há modo ASGI: o projeto não depende de Quart nem
+de um servidor ASGI.
+
+Sem o curl_cffi (ou com GARMIN_ASYNC=0), AVAILABLE fica falso e o app usa
+o caminho síncrono.
+"""
+import os
+import time
+import asyncio
+import threading
+
+import garmin_session
+import metrics
+from api_scheduler import error_status, is_idempotent
+
+try:
+    from curl_cffi.requests import AsyncSession
+except ImportError:
+    AsyncSession = None
+
+POOL_SIZE = int(os.getenv("GARMIN_POOL_SIZE", "10") or 10)     # conexões simultâneas por processo
+TIMEOUT = 30
+
+AVAILABLE = AsyncSession is not None and os.getenv("GARMIN_ASYNC", "1") != "0"
+
+_loop = None
+_http = None
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # O loop e o pool de conexões ficam no processo pai
+    global _loop, _http, _lock
+    _loop, _http, _lock = None, None, threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_loop():
+    """Event loop do processo, rodando numa thread própria."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="garmin-io", daemon=True).start()
+        return _loop
+
+
+def run(coro):
+    """Roda a corrotina no loop do processo e espera o resultado (para rotas WSGI)."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+def iterate(agen):
+    """Consome um gerador assíncrono do loop como um gerador comum."""
+    loop = get_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # Consumidor desistiu no meio: cancela o que ainda estava em andamento
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+class AsyncGarminClient:
+    """Chamadas à API da Garmin pelo pool keep-alive do processo, com a sessão/fila da conta."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def _http_session(self):
+        # Criado dentro do loop: o AsyncSession fica preso ao loop em que nasceu
+        global _http
+        if _http is None:
+            _http = AsyncSession(max_clients=POOL_SIZE, timeout=TIMEOUT)
+        return _http
+
+    async def _native(self, client):
+        """Cliente nativo do garminconnect, com o token renovado se estiver vencendo."""
+        native = client.client
+        if getattr(native, '_token_expires_soon', lambda: False)():
+            await asyncio.to_thread(native._refresh_session)
+        return native
+
+    def _url(self, native, path):
+        # Mesmo endereço que o cliente nativo usa (GARMIN_API_URL pode trocá-lo)
+        base = getattr(native, '_connectapi', None) or f"https://connectapi.{native.domain}"
+        return f"{base}/{path.lstrip('/')}"
+
+    async def _send(self, client, method, path, params, json):
+        native = await self._native(client)
+        response = await self._http_session().request(
+            method, self._url(native, path), headers=native.get_api_headers(), params=params, json=json)
+        if response.status_code >= 400: response.raise_for_status()
+        if response.status_code == 204 or not response.content: return {}
+        return response.json()
+
+    async def connectapi(self, path, method="GET", params=None, json=None):
+        """Mesmo contrato do client.connectapi: JSON da resposta ou exceção com o status."""
+        method = method.upper()
+        endpoint = metrics.endpoint_template(path)
+        label = f"{method} {path}"
+
+        async def timed(client):
+            started, status = time.perf_counter(), "ok"
+            try:
+                return await self._send(client, method, path, params, json)
+            except Exception as e:
+                status = error_status(e) or "error"
+                raise
+            finally:
+                metrics.GARMIN_LATENCY.observe(time.perf_counter() - started,
+                                               endpoint=endpoint, method=method, status=status)
+
+        def run_call(client):
+            return self.session.scheduler.run_async(
+                lambda: timed(client), retry_server_errors=is_idempotent("connectapi", {"method": method}), label=label)
+
+        # session.client() pega um lock e pode fazer login: só fora do loop
+        client = self.session.current_client() or await asyncio.to_thread(self.session.client)
+        if not hasattr(getattr(client, 'client', None), 'get_api_headers'):
+            # garminconnect antigo (garth): sem header pronto, vai pelo caminho síncrono numa thread
+            return await asyncio.to_thread(self.session.call, "connectapi", path, method=method, params=params, json=json)
+        try:
+            return await run_call(client)
+        except Exception as e:
+            if error_status(e) != 401: raise
+            print("🔄 Sessão expirada (401), renovando...")
+            metrics.GARMIN_REAUTH.inc()
+            client = await asyncio.to_thread(self.session.reauthenticate, client)
+            return await run_call(client)
+
+    async def get_workouts(self, start=0, limit=100):
+        return await self.connectapi("/workout-service/workouts", params={"start": start, "limit": limit})
+
+    async def get_workout_by_id(self, workout_id):
+        return await self.connectapi(f"/workout-service/workout/{workout_id}")
+
+
+def get_client(account=None):
+    """Cliente assíncrono da conta (a do .env por padrão); autentica (ou reaproveita tokens) se preciso."""
+    session = garmin_session.get_pool().get(account)
+    session.client()
+    return AsyncGarminClient(session)     # Leve: a conexão fica no pool do processo
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Sessão da Garmin compartilhada entre workers do gunicorn e scripts.
+
+Os tokens OAuth ficam salvos em disco (data/session/ ou
+GARMIN_TOKEN_DIR). Quem abre uma sessão reaproveita os tokens salvos; o login
+com usuário/senha só acontece na primeira vez ou quando os tokens não servem
+mais. Um lock de arquivo garante que só um processo faz login por vez e os
+outros leem os tokens que ele gravou.
+
+Não há mais "health check" antes de cada chamada: o cliente só é renovado
+quando a Garmin responde 401. Cada chamada passa pelo ApiScheduler da sessão
+(limite de taxa, concorrência e retries em 429/5xx).
+
+Além da conta do .env, o SessionPool mantém sessões de outras contas (ex.:
+alunos de um treinador) listadas em ACCOUNTS_FILE, cada uma com os seus
+tokens e o seu ApiScheduler. As sessões ficam em LRU: as menos usadas saem
+quando passa de MAX_SESSIONS ou ficam paradas mais que SESSION_IDLE_TTL;
+voltar a usar uma conta só recarrega os tokens do disco.
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from garminconnect import Garmin
+from dotenv import load_dotenv
+
+from api_scheduler import ApiScheduler, error_status, is_idempotent
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(CURRENT_DIR)
+
+load_dotenv(os.path.join(ROOT_DIR, '.env'))
+
+TOKEN_DIR = os.getenv("GARMIN_TOKEN_DIR") or os.path.join(ROOT_DIR, 'data', 'session')
+# garminconnect >= 0.3 grava garmin_tokens.json; versões com garth, oauth2_token.json
+TOKEN_FILES = ('garmin_tokens.json', 'oauth2_token.json')
+
+# Outras contas: {"ana": {"email": "...", "password": "...", "name": "Ana"}, ...}
+ACCOUNTS_FILE = os.getenv("GARMIN_ACCOUNTS_FILE") or os.path.join(ROOT_DIR, 'data', 'config', 'accounts.json')
+DEFAULT_ACCOUNT = "default"     # Conta do .env
+MAX_SESSIONS = int(os.getenv("GARMIN_MAX_SESSIONS", "32") or 32)
+SESSION_IDLE_TTL = int(os.getenv("GARMIN_SESSION_IDLE", "1800") or 1800)    # segundos
+ACCOUNT_KEY = re.compile(r'^[A-Za-z0-9_.@-]+$')
+# Outro endereço para a API (ex.: o fake_garmin.py nos testes de carga). O login
+# com senha continua indo ao SSO da Garmin: use tokens já gravados.
+API_URL = (os.getenv("GARMIN_API_URL") or "").rstrip('/')
+
+
+@contextmanager
+def token_lock(token_dir):
+    """Lock exclusivo entre processos para ler/gravar os tokens."""
+    os.makedirs(token_dir, exist_ok=True)
+    with open(os.path.join(token_dir, '.lock'), 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def new_garmin(email, password):
+    """Garmin(...) apontando para API_URL, se configurado."""
+    client = Garmin(email, password)
+    native = getattr(client, 'client', None)
+    if API_URL and hasattr(native, '_connectapi'):
+        native._connectapi = API_URL
+    return client
+
+
+def invoke(client, method_name, args, kwargs):
+    """
+    client.<method_name>(*args, **kwargs). No garminconnect >= 0.3 o
+    connectapi nativo só faz GET: com method=POST/PUT/DELETE a chamada vai
+    pelo request() do cliente nativo (o de garth aceitava method direto).
+    """
+    native = getattr(client, 'client', None)
+    if method_name != "connectapi" or 'method' not in kwargs or not hasattr(native, 'get_api_headers'):
+        return getattr(client, method_name)(*args, **kwargs)
+    kwargs = dict(kwargs)
+    method = str(kwargs.pop('method')).upper()
+    if method == "GET": return client.connectapi(*args, **kwargs)
+    response = native.request(method, "connectapi", *args, **kwargs)
+    return response.json() if response.content else {}
+
+
+class GarminSession:
+    def __init__(self, email=None, password=None, token_dir=TOKEN_DIR, scheduler=None):
+        self.email = email or os.getenv("GARMIN_EMAIL")
+        self.password = password or os.getenv("GARMIN_PASSWORD")
+        self.token_dir = token_dir
+        self.scheduler = scheduler or ApiScheduler()
+        self.logins = 0             # Logins completos (usuário/senha) feitos por este processo
+        self._client = None
+        self._tokens_version = None
+        self._lock = threading.Lock()
+
+    def _token_mtime(self):
+        mtimes = [os.path.getmtime(p) for p in (os.path.join(self.token_dir, f) for f in TOKEN_FILES)
+                  if os.path.exists(p)]
+        return max(mtimes) if mtimes else None
+
+    def _authenticate(self, force_login=False):
+        """Carrega os tokens do disco; se não der, faz login e grava os novos."""
+        with token_lock(self.token_dir):
+            if not force_login and self._token_mtime() is not None:
+                try:
+                    started = time.perf_counter()
+                    client = new_garmin(self.email, self.password)
+                    client.login(self.token_dir)
+                    self._tokens_version = self._token_mtime()
+                    metrics.GARMIN_LOGINS.inc(source="tokens")
+                    metrics.GARMIN_LOGIN_LATENCY.observe(time.perf_counter() - started, source="tokens")
+                    return client
+                except Exception as e:
+                    print(f"⚠️ Tokens salvos não funcionaram, fazendo login: {e}")
+
+            if not self.email or not self.password:
+                raise ValueError("Credenciais ausentes no .env e nenhum token salvo")
+            print(f"🔐 Login na Garmin ({self.email})...")
+            started = time.perf_counter()
+            client = new_garmin(self.email, self.password)
+            client.login()
+            self.logins += 1
+            # garminconnect >= 0.3 guarda os tokens em client.client; antes, em client.garth
+            tokens = getattr(client, 'garth', None) or client.client
+            tokens.dump(self.token_dir)
+            self._tokens_version = self._token_mtime()
+            metrics.GARMIN_LOGINS.inc(source="password")
+            metrics.GARMIN_LOGIN_LATENCY.observe(time.perf_counter() - started, source="password")
+            return client
+
+    def _refresh_tokens(self, client):
+        """
+        Renova o token de acesso com o refresh token, sem senha, e grava os
+        tokens novos. False se o cliente não tem como renovar ou se falhou.
+        """
+        native = getattr(client, 'client', None)
+        garth = getattr(client, 'garth', None)
+        try:
+            if getattr(native, 'di_refresh_token', None) and hasattr(native, '_refresh_di_token'):
+                native._refresh_di_token()      # garminconnect >= 0.3
+                tokens = native
+            elif garth is not None and hasattr(garth, 'refresh_oauth2'):
+                garth.refresh_oauth2()
+                tokens = garth
+            else:
+                return False
+            tokens.dump(self.token_dir)
+        except Exception as e:
+            print(f"⚠️ Renovação do token falhou, fazendo login: {e}")
+            return False
+        self._tokens_version = self._token_mtime()
+        metrics.GARMIN_LOGINS.inc(source="refresh")
+        return True
+
+    def current_client(self):
+        """Cliente já criado, ou None. Não espera o lock nem faz login (seguro no event loop)."""
+        return self._client
+
+    def client(self):
+        """Cliente Garmin autenticado (criado uma vez por processo)."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._authenticate()
+            return self._client
+
+    def reauthenticate(self, stale_client):
+        """Chamado após um 401. Outro thread/processo pode já ter renovado."""
+        with self._lock:
+            if self._client is not None and self._client is not stale_client:
+                return self._client
+            # Ninguém gravou tokens novos desde que carregamos: tenta o refresh
+            # token antes do login com senha
+            force_login = self._token_mtime() == self._tokens_version
+            if force_login and stale_client is not None:
+                with token_lock(self.token_dir):
+                    refreshed = self._refresh_tokens(stale_client)
+                if refreshed:
+                    self._client = stale_client
+                    return self._client
+            self._client = self._authenticate(force_login=force_login)
+            return self._client
+
+    def call(self, method_name, *args, **kwargs):
+        """
+        Chama client.<method_name> pelo agendador; num 401 renova a sessão e
+        tenta de novo uma vez.
+        """
+        idempotent = is_idempotent(method_name, kwargs)
+        if method_name == "connectapi" and args:
+            http_method = str(kwargs.get('method', 'GET')).upper()
+            endpoint = metrics.endpoint_template(args[0])
+            label = f"{http_method} {args[0]}"
+        else:
+            http_method, endpoint, label = "", method_name, method_name
+
+        def timed(client):
+            started, status = time.perf_counter(), "ok"
+            try:
+                return invoke(client, method_name, args, kwargs)
+            except Exception as e:
+                status = error_status(e) or "error"
+                raise
+            finally:
+                metrics.GARMIN_LATENCY.observe(time.perf_counter() - started,
+                                               endpoint=endpoint, method=http_method, status=status)
+
+        def run(client):
+            return self.scheduler.run(lambda: timed(client), retry_server_errors=idempotent, label=label)
+
+        client = self.client()
+        try:
+            return run(client)
+        except Exception as e:
+            if error_status(e) != 401: raise
+            print("🔄 Sessão expirada (401), renovando...")
+            metrics.GARMIN_REAUTH.inc()
+            client = self.reauthenticate(client)
+            return run(client)
+
+
+class SessionClient:
+    """Mesma interface do Garmin, mas cada método passa pelo GarminSession."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._session.client(), name)
+        if not callable(attr): return attr
+
+        def method(*args, **kwargs):
+            return self._session.call(name, *args, **kwargs)
+        return method
+
+
+class SessionPool:
+    """Uma GarminSession por conta, em LRU com expiração por ociosidade."""
+
+    def __init__(self, accounts_file=ACCOUNTS_FILE, max_size=MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL,
+                 token_dir=os.path.join(TOKEN_DIR, 'accounts')):
+        self.accounts_file = accounts_file
+        self.token_dir = token_dir      # Tokens de cada conta em <token_dir>/<conta>
+        self.max_size = max(1, max_size)
+        self.idle_ttl = idle_ttl
+        self.evictions = 0
+        self._sessions = OrderedDict()      # conta -> (sessão, último uso)
+        self._accounts = {}
+        self._accounts_stamp = None
+        self._lock = threading.Lock()
+
+    def _load_accounts(self):
+        # Chamado com o lock; relê o arquivo só quando ele muda
+        try:
+            stat = os.stat(self.accounts_file)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._accounts_stamp: return self._accounts
+
+        accounts = {}
+        if stamp is not None:
+            try:
+                with open(self.accounts_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for key, info in data.items():
+                    if not ACCOUNT_KEY.match(key) or key == DEFAULT_ACCOUNT or not isinstance(info, dict):
+                        print(f"⚠️ Conta ignorada em {os.path.basename(self.accounts_file)}: {key!r}")
+                        continue
+                    accounts[key] = info
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"⚠️ Erro ao ler contas ({self.accounts_file}): {e}")
+                return self._accounts       # Mantém as contas anteriores
+        self._accounts, self._accounts_stamp = accounts, stamp
+        return accounts
+
+    def accounts(self):
+        """[{"id", "name"}] das contas disponíveis, a do .env primeiro."""
+        with self._lock:
+            accounts = self._load_accounts()
+        default_name = get_session().email or "Conta principal"
+        return [{"id": DEFAULT_ACCOUNT, "name": default_name}] + [
+            {"id": key, "name": info.get('name') or info.get('email') or key} for key, info in accounts.items()]
+
+    def __contains__(self, account):
+        if account in (None, DEFAULT_ACCOUNT): return True
+        with self._lock:
+            return account in self._load_accounts()
+
+    def get(self, account=None):
+        """Sessão da conta (a do .env para None/"default"). KeyError se a conta não existe."""
+        if account in (None, DEFAULT_ACCOUNT): return get_session()
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.pop(account, None)
+            if entry is None:
+                info = self._load_accounts().get(account)
+                if info is None: raise KeyError(account)
+                session = GarminSession(info.get('email'), info.get('password'),
+                                        token_dir=os.path.join(self.token_dir, account))
+            else:
+                session = entry[0]
+            self._sessions[account] = (session, now)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            return session
+
+    def _expire(self, now):
+        # As sessões entram em ordem de uso: as paradas estão no começo
+        while self._sessions:
+            account, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_ttl: break
+            del self._sessions[account]
+            self.evictions += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+_default_session = None
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_session():
+    """Sessão padrão do processo (credenciais do .env)."""
+    global _default_session
+    with _default_lock:
+        if _default_session is None:
+            _default_session = GarminSession()
+        return _default_session
+
+
+def get_pool():
+    """Sessões das outras contas (ACCOUNTS_FILE) deste processo."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool()
+        return _default_pool
+
+
+def get_client(account=None):
+    """Cliente pronto para uso; autentica (ou reaproveita tokens) se preciso."""
+    session = get_pool().get(account)
+    session.client()
+    return SessionClient(session)
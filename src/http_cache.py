@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Respostas prontas para as rotas só de leitura (catálogo e regras de busca).
+
+O corpo é serializado e comprimido uma vez por versão do catálogo (gzip e,
+se o módulo brotli estiver instalado, br) e servido com ETag forte: a
+revalidação do navegador vira um 304 sem corpo e a resposta normal é só
+entregar bytes já prontos. Cada codificação tem o seu ETag ("<hash>",
+"<hash>-gz", "<hash>-br"): bytes diferentes não podem dividir um ETag forte,
+senão um cache poderia revalidar e servir a codificação errada.
+"""
+import gzip
+import json
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # Opcional: sem ele, só gzip
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Preferência quando o cliente aceita mais de uma
+ENCODINGS = ("br", "gzip")
+ETAG_SUFFIXES = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+
+class PrecompressedBody:
+    """Bytes de uma resposta em cada codificação, cada uma com o seu ETag."""
+
+    def __init__(self, data, content_type="application/json"):
+        self.content_type = content_type
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.encodings = {"identity": data, "gzip": gzip.compress(data, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(data, quality=BROTLI_QUALITY)
+
+    @classmethod
+    def from_json(cls, obj):
+        return cls(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def etag_for(self, encoding):
+        """ETag dos bytes numa codificação (None = identity)."""
+        return self.etag + ETAG_SUFFIXES[encoding or "identity"]
+
+    def choose(self, accepts):
+        """(codificação, bytes) para o cliente; accepts(nome) diz se ele aceita."""
+        for encoding in ENCODINGS:
+            if encoding in self.encodings and accepts(encoding):
+                return encoding, self.encodings[encoding]
+        return None, self.encodings["identity"]
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Fila de tarefas longas (PUSH, PULL e deleção) dentro do processo.
+
+A rota cria o job e responde na hora com o id; o trabalho roda num pool de
+threads e cada item concluído vira um evento, acompanhado por SSE
+(/api/jobs/<id>/events) ou pelo status (/api/jobs/<id>). Cada conta tem no
+máximo JOBS_PER_ACCOUNT jobs rodando; os outros esperam na fila, em ordem de
+chegada. Um job que mexe em várias contas (PUSH para alunos) ocupa uma vaga
+em cada uma e só começa quando todas estão livres; jobs posteriores das
+mesmas contas não passam na frente dele.
+
+Cancelar é cooperativo: o job para de começar itens novos (job.cancel_event
+vai para as operações em massa) e os que já estavam em andamento terminam.
+
+Os jobs ficam na memória do processo: com vários workers do gunicorn, o
+status só existe no worker que criou o job (use um worker com threads ou
+sticky sessions).
+"""
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4") or 4)
+JOBS_PER_ACCOUNT = int(os.getenv("JOBS_PER_ACCOUNT", "1") or 1)
+JOB_TTL = 3600          # segundos que um job terminado continua consultável
+HEARTBEAT = 15          # segundos entre keep-alives no SSE (proxies derrubam conexão parada)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Levantada pelo próprio job (check_cancelled) para parar no meio."""
+
+
+class Job:
+    def __init__(self, kind, accounts, fn, total=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.accounts = accounts
+        self.total = total
+        self.status = QUEUED
+        self.done = 0
+        self.results = []
+        self.summary = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._fn = fn
+        self._events = []       # (seq, tipo, dados); seq começa em 1
+        self._cond = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled: raise JobCancelled()
+
+    # --- Chamados pelo trabalho (de qualquer thread) ---
+
+    def set_total(self, total):
+        with self._cond:
+            self.total = total
+            self._emit("progress", {"done": self.done, "total": total})
+
+    def progress(self, item=None):
+        """Um item concluído (o resultado vai para o status e para o SSE)."""
+        with self._cond:
+            self.done += 1
+            if item is not None: self.results.append(item)
+            self._emit("progress", {"done": self.done, "total": self.total, "item": item})
+
+    # --- Ciclo de vida (JobRunner) ---
+
+    def _emit(self, kind, data):
+        self._events.append((len(self._events) + 1, kind, data))
+        self._cond.notify_all()
+
+    def _set_status(self, status, **fields):
+        with self._cond:
+            self.status = status
+            for name, value in fields.items(): setattr(self, name, value)
+            if status == RUNNING:
+                self.started_at = time.time()
+                self._emit("status", {"status": status})
+            elif status in FINISHED:
+                self.finished_at = time.time()
+                self._emit("end", self.to_dict(results=False))
+
+    def to_dict(self, results=True):
+        data = {
+            "id": self.id, "kind": self.kind, "accounts": list(self.accounts), "status": self.status,
+            "done": self.done, "total": self.total, "summary": self.summary, "error": self.error,
+            "createdAt": self.created_at, "startedAt": self.started_at, "finishedAt": self.finished_at,
+        }
+        if results: data["results"] = list(self.results)
+        return data
+
+    def events(self, after=0, heartbeat=HEARTBEAT):
+        """
+        Gera os eventos depois de `after` e espera os próximos até o fim do
+        job. None = nada novo em `heartbeat` segundos (hora do keep-alive).
+        """
+        while True:
+            with self._cond:
+                if len(self._events) <= after:
+                    self._cond.wait(heartbeat)
+                pending = self._events[after:]
+            if not pending:
+                yield None
+                continue
+            for event in pending:
+                yield event
+                if event[1] == "end": return
+            after = pending[-1][0]
+
+
+class JobRunner:
+    def __init__(self, workers=JOB_WORKERS, per_account=JOBS_PER_ACCOUNT, ttl=JOB_TTL):
+        self.per_account = max(1, per_account)
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._jobs = {}
+        self._pending = deque() # jobs esperando vaga, em ordem de chegada
+        self._running = {}      # conta -> jobs rodando
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, accounts=("default",), total=None):
+        """Enfileira fn(job) nas contas dadas; retorna o Job na hora (status queued ou running)."""
+        job = Job(kind, tuple(dict.fromkeys(accounts)), fn, total)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._start_ready()
+        return job
+
+    def _start_ready(self):
+        # Chamado com o lock: começa, em ordem, os jobs com vaga em todas as
+        # contas. Conta com job esperando fica bloqueada para os seguintes.
+        blocked = set()
+        for job in list(self._pending):
+            if blocked.isdisjoint(job.accounts) and all(self._running.get(a, 0) < self.per_account for a in job.accounts):
+                self._pending.remove(job)
+                for account in job.accounts: self._running[account] = self._running.get(account, 0) + 1
+                self._executor.submit(self._run, job)
+            else:
+                blocked.update(job.accounts)
+
+    def _run(self, job):
+        try:
+            if job.cancelled:
+                job._set_status(CANCELLED)
+                return
+            job._set_status(RUNNING)
+            try:
+                summary = job._fn(job)
+                job._set_status(CANCELLED if job.cancelled else DONE, summary=summary)
+            except JobCancelled:
+                job._set_status(CANCELLED)
+            except Exception as e:
+                traceback.print_exc()
+                job._set_status(FAILED, error=str(e))
+        finally:
+            with self._lock:
+                for account in job.accounts: self._running[account] -= 1
+                self._start_ready()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Pede o cancelamento. Job ainda na fila sai dela na hora."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None: return None
+            job.cancel_event.set()
+            if job in self._pending:
+                self._pending.remove(job)
+                job._set_status(CANCELLED)
+                self._start_ready()
+        return job
+
+    def list(self, account=None):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if account is None or account in j.accounts]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def _prune(self):
+        limit = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < limit]:
+            del self._jobs[job_id]
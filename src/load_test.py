@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga das rotas que falam com a Garmin (PUSH, PULL, listagem e
+deleção), contra o fake_garmin.py em vez da conta de verdade.
+
+Por padrão sobe tudo no próprio processo: a Garmin falsa (porta livre),
+tokens falsos numa pasta temporária, espelhos temporários e o app num
+servidor WSGI com threads. Cada cenário roda por --duration segundos com
+--concurrency clientes HTTP (keep-alive) e o relatório mostra vazão e
+latências p50/p95/p99 de cada rota, mais o que chegou na Garmin falsa.
+
+Uso:
+    python load_test.py                                  # todos os cenários
+    python load_test.py --only push,delete --concurrency 16 --latency 0.1
+    python load_test.py --throttle-rate 0.05 --error-rate 0.01 --json resultado.json
+    # App já rodando (apontado para um fake_garmin.py com GARMIN_API_URL):
+    python load_test.py --app-url http://127.0.0.1:5000 --garmin-url http://127.0.0.1:8765
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import logging
+import argparse
+import threading
+import contextlib
+
+import requests
+
+import fake_garmin
+
+SCENARIOS = ("list", "pull", "pull.refresh", "push", "push.unchanged", "delete")
+DURATION = 10.0         # segundos por cenário
+CONCURRENCY = 8
+BATCH = 5               # treinos por requisição no PUSH/deleção
+SEED_WORKOUTS = 100
+TIMEOUT = 120
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada."""
+    if not values: return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def editor_workouts(names, steps):
+    return [{"workoutName": name, "steps": steps} for name in names]
+
+
+def sample_steps(app_url, http):
+    """Alguns exercícios reais do catálogo do app, no formato do editor."""
+    exercises = http.get(f"{app_url}/api/exercises", timeout=TIMEOUT).json()
+    return [{"exerciseId": e['id'], "sets": 3, "reps": 10, "weight": 20, "rest": 60} for e in exercises[:6]]
+
+
+class Scenario:
+    """Uma rota sob carga: request(http, worker, i) -> resposta; ok(resposta) diz se deu certo."""
+
+    def __init__(self, name, request, ok=None, setup=None):
+        self.name = name
+        self.request = request
+        self.ok = ok or (lambda r: r.status_code == 200)
+        self.setup = setup
+
+
+def build_scenarios(app_url, garmin_url, steps, batch):
+    counter = {"n": 0}
+    lock = threading.Lock()
+    pending_ids = []
+
+    def unique_names(worker, count):
+        with lock:
+            counter["n"] += 1
+            n = counter["n"]
+        return [f"LT {worker:02d}-{n:06d}-{k}" for k in range(count)]
+
+    def no_error(r):
+        if r.status_code != 200: return False
+        body = r.json()
+        return not (isinstance(body, dict) and (body.get('error') or body.get('success') is False))
+
+    def push(http, worker, i):
+        return http.post(f"{app_url}/api/upload_batch",
+                         json={"workouts": editor_workouts(unique_names(worker, batch), steps)}, timeout=TIMEOUT)
+
+    fixed_names = [f"LT fixo {k}" for k in range(batch)]
+
+    def push_unchanged_setup(http):
+        http.post(f"{app_url}/api/upload_batch", json={"workouts": editor_workouts(fixed_names, steps)}, timeout=TIMEOUT)
+
+    def push_unchanged(http, worker, i):
+        return http.post(f"{app_url}/api/upload_batch",
+                         json={"workouts": editor_workouts(fixed_names, steps)}, timeout=TIMEOUT)
+
+    def delete_setup(http):
+        # Treinos para apagar, criados direto na Garmin falsa (fora da medição e do limite de taxa)
+        r = http.post(f"{garmin_url}/_fake/seed", json={"count": batch * 1000, "prefix": "LT apagar"}, timeout=TIMEOUT)
+        pending_ids.extend(r.json()['ids'])
+
+    def delete(http, worker, i):
+        with lock:
+            ids = [pending_ids.pop() for _ in range(min(batch, len(pending_ids)))]
+        if not ids: return None      # Acabaram os treinos: cenário encerrado
+        return http.post(f"{app_url}/api/delete_workouts", json={"ids": ids}, timeout=TIMEOUT)
+
+    return {
+        "list": Scenario("list", lambda http, w, i: http.post(
+            f"{app_url}/api/list_workouts", json={"filterType": "contains", "filterText": "carga"}, timeout=TIMEOUT)),
+        "pull": Scenario("pull", lambda http, w, i: http.get(f"{app_url}/api/pull_workouts?limit=20", timeout=TIMEOUT)),
+        "pull.refresh": Scenario("pull.refresh", lambda http, w, i: http.get(
+            f"{app_url}/api/pull_workouts?refresh=1&limit=20", timeout=TIMEOUT)),
+        "push": Scenario("push", push, no_error),
+        "push.unchanged": Scenario("push.unchanged", push_unchanged, no_error, push_unchanged_setup),
+        "delete": Scenario("delete", delete, no_error, delete_setup) if garmin_url else None,
+    }
+
+
+def run_scenario(scenario, duration, concurrency):
+    """Roda o cenário com `concurrency` clientes por `duration` segundos."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        with requests.Session() as http:
+            i = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = scenario.request(http, n, i)
+                    if response is None: return
+                    ok = scenario.ok(response)
+                    error = None if ok else f"HTTP {response.status_code}: {response.text[:120]}"
+                except Exception as e:
+                    error = str(e)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if error: errors.append(error)
+                i += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+        "max_ms": 1000 * latencies[-1] if latencies else None,
+        "sample_errors": sorted(set(errors))[:3],
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        result[f"p{p}_ms"] = 1000 * value if value is not None else None
+    return result
+
+
+def fake_stats(garmin_url, reset=False):
+    try:
+        method = requests.delete if reset else requests.get
+        return method(f"{garmin_url}/_fake/stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def summarize_garmin(stats):
+    """Total de chamadas à Garmin falsa e quantas foram 429/5xx."""
+    if not stats: return None
+    requests_by_key = stats.get('requests', {})
+    total = sum(requests_by_key.values())
+    throttled = sum(n for key, n in requests_by_key.items() if key.endswith(" 429"))
+    failed = sum(n for key, n in requests_by_key.items() if key.rsplit(' ', 1)[-1].startswith('5'))
+    return {"calls": total, "throttled": throttled, "server_errors": failed, "max_in_flight": stats.get('maxInFlight')}
+
+
+@contextlib.contextmanager
+def local_stack(args):
+    """Garmin falsa + app no próprio processo, com tokens e espelhos temporários."""
+    faults = fake_garmin.Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                                args.retry_after, args.rate_limit)
+    garmin = fake_garmin.serve(port=0, fake=fake_garmin.FakeGarmin(faults, fake_garmin.sample_workouts(args.workouts)),
+                               background=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        token_dir = os.path.join(tmp_dir, 'session')
+        fake_garmin.seed_tokens(token_dir)
+        # Antes de importar o app: garmin_session lê as variáveis ao carregar
+        os.environ.update(GARMIN_API_URL=garmin.url, GARMIN_TOKEN_DIR=token_dir, GARMIN_EMAIL="loadtest",
+                          GARMIN_ACCOUNTS_FILE=os.path.join(tmp_dir, 'accounts.json'))
+        if args.sync_client: os.environ["GARMIN_ASYNC"] = "0"
+
+        from werkzeug.serving import make_server
+        from workout_store import WorkoutStore
+        from api_scheduler import ApiScheduler
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        app.WORKOUT_STORE = WorkoutStore(os.path.join(tmp_dir, 'workouts.db'))
+        if args.client_rate:
+            # Limite do ApiScheduler do app (padrão: o mesmo usado com a Garmin de verdade)
+            rate = args.client_rate
+            app.garmin_session.get_session().scheduler = ApiScheduler(rate, max(1, int(rate)), max(1, int(rate)))
+        app.ACCOUNT_STORES_DIR = os.path.join(tmp_dir, 'accounts')
+
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)     # Sem uma linha de log por requisição
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="load-test-app", daemon=True).start()
+        try:
+            yield f"http://127.0.0.1:{server.server_port}", garmin.url
+        finally:
+            server.shutdown()
+            garmin.shutdown()
+
+
+def report(results):
+    print(f"\n{'cenário':<16} {'req':>6} {'erros':>6} {'req/s':>8} " + " ".join(f"{'p%d ms' % p:>9}" for p in PERCENTILES)
+          + f" {'garmin':>8} {'429':>5} {'5xx':>5}")
+    for name, r in results.items():
+        percentiles = " ".join(f"{r[f'p{p}_ms']:9.1f}" if r[f'p{p}_ms'] is not None else f"{'-':>9}" for p in PERCENTILES)
+        g = r.get('garmin') or {}
+        print(f"{name:<16} {r['requests']:6d} {r['errors']:6d} {r['throughput']:8.1f} {percentiles}"
+              f" {g.get('calls', '-'):>8} {g.get('throttled', '-'):>5} {g.get('server_errors', '-'):>5}")
+        for error in r['sample_errors']:
+            print(f"   ⚠️ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas da Garmin contra o fake_garmin.py.")
+    parser.add_argument("--only", help=f"Cenários separados por vírgula ({', '.join(SCENARIOS)})")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Segundos por cenário")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Clientes simultâneos")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Treinos por requisição no PUSH/deleção")
+    parser.add_argument("--app-url", help="App já rodando (senão, sobe um aqui)")
+    parser.add_argument("--garmin-url", help="fake_garmin.py do --app-url (para as contagens)")
+    parser.add_argument("--sync-client", action="store_true", help="Caminho síncrono (GARMIN_ASYNC=0)")
+    parser.add_argument("--client-rate", type=float, help="Limite de chamadas/s do app à Garmin (padrão: o do app)")
+    parser.add_argument("--workouts", type=int, default=SEED_WORKOUTS, help="Treinos de exemplo na conta falsa")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência da Garmin falsa (s)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fração de 429")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Req/s por conta na Garmin falsa")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(',')] if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"cenário desconhecido: {', '.join(unknown)}")
+
+    stack = contextlib.nullcontext((args.app_url, args.garmin_url)) if args.app_url else local_stack(args)
+    results = {}
+    with stack as (app_url, garmin_url):
+        print(f"🏋️  App em {app_url}" + (f", Garmin falsa em {garmin_url}" if garmin_url else ""))
+        with requests.Session() as http:
+            steps = sample_steps(app_url, http)
+            scenarios = build_scenarios(app_url, garmin_url, steps, args.batch)
+            for name in names:
+                scenario = scenarios[name]
+                if scenario is None:
+                    print(f"⏭️  {name}: precisa do --garmin-url")
+                    continue
+                if scenario.setup:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        scenario.setup(http)
+                if garmin_url: fake_stats(garmin_url, reset=True)
+                print(f"⏱️  {name}: {args.duration:g}s com {args.concurrency} clientes...")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[name] = run_scenario(scenario, args.duration, args.concurrency)
+                results[name]['garmin'] = summarize_garmin(fake_stats(garmin_url)) if garmin_url else None
+
+    report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados em {args.json}")
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas em memória no formato texto do Prometheus (servidas em /metrics).
+
+Sem dependência externa: contadores e histogramas com rótulos, protegidos
+por um lock. Registrar uma observação custa um bisect e um incremento, então
+dá para deixar ligado em produção. Cada processo (worker do gunicorn) tem os
+seus números; o Prometheus soma pelas instâncias.
+"""
+import re
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Segundos: de respostas locais (ms) até PUSH em lote lento
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # rótulos -> [contagem por bucket..., +Inf], soma
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labels))
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render():
+    """Todas as métricas registradas, no formato de exposição do Prometheus."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def endpoint_template(path):
+    """/workout-service/workout/123?x=1 -> /workout-service/workout/{id} (poucos rótulos)."""
+    path = path.split('?', 1)[0]
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+
+# --- Métricas do app ---
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das rotas do Flask.", ("route", "method", "status"))
+PAYLOAD_BUILD_LATENCY = Histogram(
+    "payload_build_duration_seconds", "Tempo para montar os payloads de treino de um pedido.", ("route",))
+GARMIN_LATENCY = Histogram(
+    "garmin_api_request_duration_seconds", "Latência de cada chamada à Garmin (cada tentativa).",
+    ("endpoint", "method", "status"))
+GARMIN_WAIT = Histogram(
+    "garmin_api_queue_wait_seconds", "Espera no agendador (limite de taxa, concorrência, backoff).")
+GARMIN_RETRIES = Counter(
+    "garmin_api_retries_total", "Chamadas à Garmin repetidas pelo agendador.", ("status",))
+GARMIN_LOGINS = Counter(
+    "garmin_logins_total", "Sessões abertas na Garmin (tokens salvos, refresh token ou usuário/senha).", ("source",))
+GARMIN_LOGIN_LATENCY = Histogram(
+    "garmin_login_duration_seconds", "Tempo para abrir/renovar a sessão na Garmin.", ("source",))
+GARMIN_REAUTH = Counter(
+    "garmin_reauthentications_total", "Sessões renovadas depois de um 401.")
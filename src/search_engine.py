@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+import math
+import heapq
+import bisect
+import unicodedata
+import multiprocessing
+
+# Tamanho dos n-gramas de caracteres usados para buscas por substring
+NGRAM_SIZE = 3
+# Pontuação mínima para considerar que achamos o exercício
+MIN_SCORE = 3
+# Lotes com menos termos únicos que isso não compensam o custo do pool
+POOL_MIN_TERMS = 2000
+# Termos de até N letras (autocomplete no começo da digitação) têm as regras pré-calculadas
+SYNONYM_SHORT_QUERY = NGRAM_SIZE
+
+# Busca aproximada: só roda quando a exata não passa do MIN_SCORE e alguma
+# palavra digitada não existe no catálogo (erro de digitação de verdade)
+FUZZY_TOKEN_MIN_SIM = 0.5       # Similaridade (Dice de trigramas) mínima entre duas palavras
+FUZZY_TOKEN_CHOICES = 3         # Palavras do catálogo consideradas para cada palavra digitada
+FUZZY_COMMON_RATIO = 0.2        # Palavras em mais de 20% do catálogo não geram candidatos
+FUZZY_MIN_CONFIDENCE = 0.6      # Abaixo disso, melhor não sugerir nada (acima, a interface pede conferência)
+FUZZY_MAX_STEPS = 5000          # Entradas de postings visitadas por termo; passou, desiste da aproximada
+
+EXACT = "exact"
+APPROXIMATE = "approximate"
+
+# Índice herdado pelos processos filhos (fork) no find_many
+_POOL_INDEX = None
+
+
+def normalize_text(text):
+    if not isinstance(text, str): return ""
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII').lower().strip()
+
+
+def score_phrase(phrase, db_text):
+    """Mesma pontuação histórica do find_exercise_id (None se não contém)."""
+    if phrase not in db_text: return None
+    score = len(phrase)
+    if db_text.startswith(phrase): score += 50
+    len_diff = len(db_text) - len(phrase)
+    score -= (len_diff * 0.1)
+    return score
+
+
+class ExerciseSearchIndex:
+    """
+    Índice invertido do catálogo de exercícios.
+    Construído uma vez: guarda o texto normalizado de cada exercício,
+    postings por token inteiro e por trigramas de caracteres. Uma busca só
+    pontua os exercícios que contêm todos os trigramas da frase. Se nada
+    passar do MIN_SCORE, uma busca aproximada palavra a palavra (trigramas
+    das palavras do catálogo) tenta absorver erros de digitação.
+    """
+
+    def __init__(self, exercises, search_rules=None, search_texts=None):
+        # exercises: lista (ou sequência do catálogo binário) na ordem do catálogo
+        self.entries = exercises    # Ordem do catálogo (desempate igual ao scan antigo)
+        self.db_texts = []          # Texto normalizado de busca de cada item
+        self.positions = {}
+        self.token_postings = {}
+        self.ngram_postings = {}
+
+        for pos in range(len(exercises)):
+            item = exercises[pos]
+            if search_texts is not None:
+                db_text = search_texts[pos]
+            else:
+                db_text = normalize_text((item.get('search_term', '') or '') + " " + item['label'])
+            self.db_texts.append(db_text)
+            self.positions[item['id']] = pos
+
+            for token in set(db_text.split()):
+                self.token_postings.setdefault(token, set()).add(pos)
+            for gram in self._ngrams(db_text):
+                self.ngram_postings.setdefault(gram, set()).add(pos)
+
+        self._vocab = self._build_vocab()   # Trigramas de cada palavra (busca aproximada)
+        self.synonyms = SynonymTable({}, self)
+        self.set_rules(search_rules or {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _ngrams(text):
+        return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+    def set_rules(self, search_rules):
+        """Compila as regras de sinônimos (só se mudaram) e troca de uma vez."""
+        if search_rules == self.synonyms.source: return
+        self.synonyms = SynonymTable(search_rules, self)
+
+    def expand_query(self, query_norm):
+        """Frases de busca: o termo + sinônimos das regras que o contêm."""
+        synonyms = self.synonyms
+        search_phrases = {query_norm}
+        for group in synonyms.matching_groups(query_norm):
+            search_phrases.update(synonyms.groups[group])
+        return search_phrases
+
+    def score_query(self, query_norm):
+        """
+        Pontuação de cada exercício para o termo e seus sinônimos. Só o termo
+        é buscado na hora; cada grupo de sinônimos usa a tabela pré-calculada.
+        Retorna (pontuações, frases usadas).
+        """
+        synonyms = self.synonyms
+        scores = self.score_candidates([query_norm])
+        phrases = {query_norm}
+        for group in synonyms.matching_groups(query_norm):
+            phrases.update(synonyms.groups[group])
+            for pos, score in synonyms.group_scores(group).items():
+                if pos not in scores or score > scores[pos]:
+                    scores[pos] = score
+        return scores, phrases
+
+    def candidates(self, phrase):
+        """Posições do catálogo que podem conter a frase (superconjunto)."""
+        if len(phrase) < NGRAM_SIZE:
+            return range(len(self.entries))
+
+        postings = []
+        # Tokens do meio da frase aparecem inteiros no texto do exercício
+        tokens = phrase.split(' ')
+        for token in tokens[1:-1]:
+            if not token: continue
+            posting = self.token_postings.get(token)
+            if not posting: return ()
+            postings.append(posting)
+        for gram in self._ngrams(phrase):
+            posting = self.ngram_postings.get(gram)
+            if not posting: return ()
+            postings.append(posting)
+
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result: break
+        return result
+
+    def score_candidates(self, phrases):
+        """Melhor pontuação de cada exercício que contém alguma das frases."""
+        scores = {}
+        for phrase in phrases:
+            for pos in self.candidates(phrase):
+                score = score_phrase(phrase, self.db_texts[pos])
+                if score is None: continue
+                if pos not in scores or score > scores[pos]:
+                    scores[pos] = score
+        return scores
+
+    def find(self, query):
+        """Retorna (id, label) do melhor exercício para o termo ou (None, "")."""
+        return self.find_scored(query)[:2]
+
+    def find_scored(self, query):
+        """
+        Como o find, mas com (id, label, confiança 0..1, nível). Nível "exact"
+        (confiança 1.0) é o casamento por substring de sempre; "approximate"
+        é a busca tolerante a erros de digitação, usada só se a exata falhar:
+        é sempre um palpite, que a interface pede para conferir.
+        """
+        if not query: return None, "", 0.0, None
+        query_norm = normalize_text(query)
+
+        if "_" in query and query.isupper() and query in self.positions:
+            return query, self.entries[self.positions[query]]['label'], 1.0, EXACT
+
+        best_pos = None
+        best_score = 0
+        for pos, score in self.score_query(query_norm)[0].items():
+            # Empate: vence quem aparece primeiro no catálogo
+            if score > best_score or (score == best_score and best_pos is not None and pos < best_pos):
+                best_score = score
+                best_pos = pos
+
+        if best_pos is not None and best_score > MIN_SCORE:
+            best_match = self.entries[best_pos]
+            return best_match['id'], best_match['label'], 1.0, EXACT
+
+        pos, confidence = self.find_approximate(query_norm)
+        if pos is not None and confidence >= FUZZY_MIN_CONFIDENCE:
+            best_match = self.entries[pos]
+            return best_match['id'], best_match['label'], confidence, APPROXIMATE
+        return None, "", 0.0, None
+
+    # --- Busca aproximada ---
+
+    @staticmethod
+    def _word_grams(word):
+        padded = f" {word} "
+        return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+    def _build_vocab(self):
+        """(palavras, nº de trigramas de cada uma, trigrama -> palavras)"""
+        words = sorted(self.token_postings)
+        sizes, postings = [], {}
+        for i, word in enumerate(words):
+            grams = self._word_grams(word)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        return words, sizes, postings
+
+    def similar_words(self, word):
+        """Palavras do catálogo parecidas com `word`: [(palavra, similaridade)]."""
+        if word in self.token_postings: return [(word, 1.0)]
+        words, sizes, postings = self._vocab
+        grams = self._word_grams(word)
+        shared = {}
+        for gram in grams:
+            for i in postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scored = ((2 * count / (len(grams) + sizes[i]), words[i]) for i, count in shared.items())
+        best = heapq.nlargest(FUZZY_TOKEN_CHOICES, (c for c in scored if c[0] >= FUZZY_TOKEN_MIN_SIM))
+        return [(w, sim) for sim, w in best]
+
+    def _vocab_steps(self, word):
+        """Entradas de postings que o similar_words visita para `word`."""
+        if word in self.token_postings: return 0
+        postings = self._vocab[2]
+        return sum(len(postings.get(gram, ())) for gram in self._word_grams(word))
+
+    def find_approximate(self, query_norm, budget=FUZZY_MAX_STEPS):
+        """
+        Casa palavra a palavra, tolerando erros ("agachamnto" ~
+        "agachamento"). Só roda se alguma palavra não existe no catálogo: com
+        todas conhecidas, a busca exata já recusou o termo de propósito.
+
+        A confiança é a média das similaridades, ponderada pela raridade
+        (palavras raras decidem mais que "com", "de"...), vezes a cobertura
+        do nome escolhido (palavras do nome que a busca casou; sobra de nome
+        derruba a confiança). O trabalho é limitado por `budget` entradas de
+        postings visitadas, não por tempo: o resultado não depende da carga
+        da máquina. Retorna (posição, confiança) ou (None, 0.0), inclusive se
+        o termo passar do limite (ex.: um parágrafo colado na nota).
+        """
+        words = [w for w in query_norm.split() if len(w) >= NGRAM_SIZE]
+        if all(w in self.token_postings for w in words): return None, 0.0
+        steps = sum(self._vocab_steps(w) for w in words)
+        if steps > budget: return None, 0.0
+
+        total = len(self.entries)
+        common = max(1, total * FUZZY_COMMON_RATIO)
+        weights, options, matched_words = [], [], set()
+        for word in words:
+            similar = self.similar_words(word)
+            # Peso pela raridade da melhor correspondência (sem nenhuma, pesa como a mais rara)
+            df = len(self.token_postings[similar[0][0]]) if similar else 1
+            weights.append(math.log(1 + total / df))
+            options.append([(self.token_postings[w], sim) for w, sim in similar])
+            matched_words.update(w for w, _ in similar)
+
+        # Palavras raras geram os candidatos; cada uma soma peso * similaridade
+        # da sua melhor correspondência presente no exercício
+        steps += sum(len(posting) for word_options in options for posting, _ in word_options if len(posting) <= common)
+        if steps > budget: return None, 0.0
+        scores, common_words = {}, []
+        for weight, word_options in zip(weights, options):
+            rare = [(posting, sim) for posting, sim in word_options if len(posting) <= common]
+            if len(rare) < len(word_options): common_words.append((weight, word_options))
+            credited = set()
+            for posting, sim in rare:
+                gain = weight * sim
+                for pos in posting:
+                    if pos in credited: continue
+                    credited.add(pos)
+                    scores[pos] = scores.get(pos, 0.0) + gain
+        if not scores: return None, 0.0
+
+        # Palavras comuns ("com", "de"...) só são conferidas nos candidatos
+        steps += len(scores) * sum(len(word_options) for _, word_options in common_words)
+        if steps > budget: return None, 0.0
+        for weight, word_options in common_words:
+            for pos in scores:
+                for posting, sim in word_options:
+                    if pos in posting:
+                        if len(posting) > common: scores[pos] += weight * sim
+                        break   # opções vêm da mais para a menos parecida
+
+        best_score = max(scores.values())
+        tied = [pos for pos, score in scores.items() if score >= best_score - 1e-9]
+        # Empate: nome mais curto (menos palavras sobrando), depois ordem do catálogo
+        best_pos = min(tied, key=lambda pos: (len(self.entries[pos]['label']), pos))
+
+        label_words = [w for w in normalize_text(self.entries[best_pos]['label']).split() if len(w) >= NGRAM_SIZE]
+        coverage = sum(1 for w in label_words if w in matched_words) / len(label_words) if label_words else 0.0
+        confidence = best_score / sum(weights) * (1 + coverage) / 2
+        return best_pos, confidence
+
+    def term_key(self, query):
+        """Chave de memoização: o resultado do find só depende dela."""
+        if not query: return None
+        if "_" in query and query.isupper() and query in self.positions: return query
+        return normalize_text(query)
+
+    def find_many(self, queries, processes=0, scored=False):
+        """
+        Versão em lote do find: deduplica os termos normalizados, resolve
+        cada termo único uma vez e devolve [(id, label)] na ordem de entrada
+        (com scored=True, as tuplas completas do find_scored).
+        Com processes > 1 e lotes grandes, divide os termos num pool (fork).
+        """
+        unique = {}
+        keys = []
+        for query in queries:
+            key = self.term_key(query)
+            keys.append(key)
+            if key not in unique: unique[key] = query
+
+        terms = list(unique.values())
+        if processes and processes > 1 and len(terms) >= POOL_MIN_TERMS \
+                and 'fork' in multiprocessing.get_all_start_methods():
+            global _POOL_INDEX
+            _POOL_INDEX = self
+            chunk = -(-len(terms) // processes)
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                parts = pool.map(_find_chunk, [terms[i:i + chunk] for i in range(0, len(terms), chunk)])
+            _POOL_INDEX = None
+            found = [match for part in parts for match in part]
+        else:
+            found = [self.find_scored(term) for term in terms]
+
+        if not scored: found = [match[:2] for match in found]
+        resolved = dict(zip(unique.keys(), found))
+        return [resolved[key] for key in keys]
+
+    def search(self, query, limit=20):
+        """
+        Autocomplete: top-k exercícios por pontuação (empate pela ordem do
+        catálogo) e as frases usadas na expansão por sinônimos.
+        """
+        query_norm = normalize_text(query)
+        if not query_norm: return [], []
+
+        scores, phrases = self.score_query(query_norm)
+        top = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+        results = [(self.entries[pos], score) for pos, score in top]
+        ordered_phrases = [query_norm] + sorted(phrases - {query_norm})
+        return results, ordered_phrases
+
+
+class SynonymTable:
+    """
+    Regras de sinônimos compiladas uma vez (por conjunto de regras).
+
+    Uma regra se aplica quando o termo buscado aparece dentro da chave ou de
+    um sinônimo. Em vez de testar regra por regra, todos os sufixos de todos
+    os termos das regras ficam numa lista ordenada: os sufixos que começam
+    com o termo buscado formam um intervalo contíguo (busca binária). Termo
+    curto (até SYNONYM_SHORT_QUERY letras) casa com boa parte dos sufixos:
+    esses já saem prontos de uma tabela montada aqui, sem percorrer o
+    intervalo. A pontuação do catálogo para cada grupo de frases é
+    calculada na primeira vez que o grupo é usado e reaproveitada depois,
+    então o custo de uma busca não cresce com o tamanho do dicionário.
+    """
+
+    def __init__(self, search_rules, index):
+        self.source = search_rules
+        self.groups = []        # frases normalizadas (chave + sinônimos) de cada regra
+        self._index = index
+        self._scores = {}
+        entries = []
+        for rule_key, synonyms in search_rules.items():
+            group = len(self.groups)
+            phrases = frozenset([normalize_text(rule_key)] + [normalize_text(s) for s in synonyms])
+            self.groups.append(phrases)
+            for phrase in phrases:
+                for i in range(max(1, len(phrase))):
+                    entries.append((phrase[i:], group))
+        entries.sort()
+        self._suffixes = [suffix for suffix, _ in entries]
+        self._suffix_groups = [group for _, group in entries]
+
+        short = {}
+        for suffix, group in entries:
+            for size in range(min(len(suffix), SYNONYM_SHORT_QUERY) + 1):
+                short.setdefault(suffix[:size], set()).add(group)
+        self._short = {prefix: tuple(sorted(groups)) for prefix, groups in short.items()}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def matching_groups(self, query_norm):
+        """Regras em que o termo aparece (na ordem do arquivo)."""
+        if len(query_norm) <= SYNONYM_SHORT_QUERY:
+            return list(self._short.get(query_norm, ()))
+        found = set()
+        i = bisect.bisect_left(self._suffixes, query_norm)
+        while i < len(self._suffixes) and self._suffixes[i].startswith(query_norm):
+            found.add(self._suffix_groups[i])
+            i += 1
+        return sorted(found)
+
+    def group_scores(self, group):
+        """{posição: melhor pontuação} das frases do grupo (memoizado)."""
+        scores = self._scores.get(group)
+        if scores is None:
+            scores = self._scores[group] = self._index.score_candidates(self.groups[group])
+        return scores
+
+
+def _find_chunk(terms):
+    return [_POOL_INDEX.find_scored(term) for term in terms]
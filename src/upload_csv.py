@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 import os
 import json
-import pandas as pd
-from garminconnect import Garmin
 from dotenv import load_dotenv
 import traceback
+from catalog import load_catalog
+from csv_ingest import WorkoutCsv, CsvFormatError
+from search_engine import ExerciseSearchIndex, APPROXIMATE
+from workout_store import WorkoutStore
+import garmin_session
+from bulk_ops import sync_workouts_bulk, CREATED, UPDATED
 
 # --- 1. Configurações de Caminhos ---
 # BASE_DIR é a pasta 'src'
@@ -15,27 +19,32 @@ ROOT_DIR = os.path.dirname(BASE_DIR)
 # Caminho corrigido conforme solicitado: /data/raw/treino_manual.csv
 CSV_FILE = os.path.join(ROOT_DIR, 'data', 'raw', 'treino_manual.csv')
 DB_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.json')
+CATALOG_FILE = os.path.join(ROOT_DIR, 'data', 'processed', 'exercises.bin')
+SEARCH_RULES_FILE = os.path.join(ROOT_DIR, 'data', 'config', 'search_rules.json')
+WORKOUT_STORE_FILE = os.path.join(ROOT_DIR, 'data', 'workouts.db')
 ENV_PATH = os.path.join(ROOT_DIR, '.env')
 
 load_dotenv(ENV_PATH)
 
+# Processos para lotes muito grandes de busca (0 = tudo no processo atual)
+MATCH_PROCESSES = int(os.getenv("MATCH_PROCESSES", "0") or 0)
+# Envios simultâneos para a Garmin
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "6") or 6)
+
 # --- 2. Funções Auxiliares ---
 
 def get_garmin_client():
-    email = os.getenv("GARMIN_EMAIL")
-    password = os.getenv("GARMIN_PASSWORD")
-    if not email or not password:
-        raise ValueError("❌ Credenciais não encontradas no .env")
-    
     try:
-        print(f"🔐 Autenticando {email}...")
-        client = Garmin(email, password)
-        client.login()
-        return client
+        # Reaproveita os tokens salvos; só faz login com senha se preciso
+        return garmin_session.get_client()
     except Exception as e:
         raise ConnectionError(f"❌ Erro ao conectar na Garmin: {e}")
 
 def load_exercise_db():
+    # Catálogo binário (mmap) quando existir; o JSON fica como fallback
+    catalog = load_catalog(CATALOG_FILE)
+    if catalog is not None:
+        return catalog
     try:
         with open(DB_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -44,26 +53,49 @@ def load_exercise_db():
         print(f"⚠️  Aviso: {DB_FILE} não encontrado. Categorias serão inferidas.")
         return {}
 
-def generate_payload(workout_name, group_df, db_cache):
+def build_search_index(db_cache):
+    """Índice de busca (mesmo do app) sobre o catálogo carregado"""
+    rules = {}
+    if os.path.exists(SEARCH_RULES_FILE):
+        with open(SEARCH_RULES_FILE, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+    if hasattr(db_cache, 'records'):
+        return ExerciseSearchIndex(db_cache.records, rules, search_texts=db_cache.search_texts())
+    return ExerciseSearchIndex(list(db_cache.values()), rules)
+
+def resolve_exercise_ids(rows, search_index):
+    """
+    Preenche 'exercicio' de cada linha com o ID do catálogo: usa o próprio
+    valor da coluna ou, se vazia, a nota personalizada. Cada termo único é
+    buscado uma vez só. Sem match, mantém o valor original. Casamentos
+    aproximados não são aplicados (sem ninguém para conferir): o palpite é
+    só avisado, para ir na coluna 'exercicio'.
+    """
+    terms = [row['exercicio'] or row['nota_personalizada'] for row in rows]
+
+    matches = search_index.find_many(terms, processes=MATCH_PROCESSES, scored=True)
+    warned = set()
+    for row, term, (found_id, label, confidence, tier) in zip(rows, terms, matches):
+        if tier == APPROXIMATE:
+            if term not in warned:
+                warned.add(term)
+                print(f"⚠️  '{term}' ~ '{label}' ({found_id}, confiança {confidence:.0%}): não aplicado, confira.")
+            continue
+        if found_id: row['exercicio'] = found_id
+    return rows
+
+def generate_payload(workout_name, rows, db_cache):
     workout_steps = []
     global_order_counter = 1
     
-    # Itera sobre cada exercício do treino
-    for i, (_, row) in enumerate(group_df.iterrows()):
+    # Itera sobre cada exercício do treino (linhas já validadas pelo csv_ingest)
+    for i, row in enumerate(rows):
         
         # Dados do CSV
-        ex_id = str(row['exercicio']).strip()
-        nota = str(row['nota_personalizada']).strip() if pd.notna(row['nota_personalizada']) else ""
-        
-        # Garante valores numéricos seguros
-        try:
-            series = int(float(row['series'])) # float->int para garantir caso venha 3.0
-            reps = int(float(row['reps']))
-            peso = float(row['peso_kg'])
-            descanso = int(float(row['intervalo_segundos']))
-        except ValueError:
-            print(f"⚠️ Erro de formato na linha {i}. Usando padrões.")
-            series, reps, peso, descanso = 1, 10, 0, 60
+        ex_id = row['exercicio']
+        nota = row['nota_personalizada']
+        series, reps = row['series'], row['reps']
+        peso, descanso = row['peso_kg'], row['intervalo_segundos']
 
         # Busca detalhes técnicos
         if ex_id in db_cache:
@@ -76,7 +108,7 @@ def generate_payload(workout_name, group_df, db_cache):
             internal_name = parts[1] if len(parts) > 1 else ex_id
 
         # Limpeza de categorias inválidas
-        if category in ['UNCATEGORIZED', 'NOT_FOUND', 'nan']:
+        if category in ['UNCATEGORIZED', 'NOT_FOUND', 'nan', '']:
             category = None
             internal_name = None
 
@@ -178,45 +210,56 @@ def main():
 
     # Carrega dados
     db_cache = load_exercise_db()
+    sheet = WorkoutCsv(CSV_FILE)
     try:
-        df = pd.read_csv(CSV_FILE)
-    except Exception as e:
+        treinos = sheet.workouts()
+    except (CsvFormatError, OSError) as e:
         print(f"❌ Erro ao ler CSV: {e}")
         return
     
     # Verifica coluna obrigatória
-    if 'treino' not in df.columns:
+    if 'treino' not in sheet.columns:
         print("❌ Erro: O CSV precisa ter uma coluna chamada 'treino' para agrupar os exercícios.")
-        print(f"   Colunas encontradas: {list(df.columns)}")
+        print(f"   Colunas encontradas: {sheet.columns}")
         return
 
-    treinos_unicos = df['treino'].unique()
-    print(f"✅ CSV carregado. {len(treinos_unicos)} treinos identificados: {treinos_unicos}")
+    for error in sheet.errors:
+        print(f"⚠️  Linha {error['line']}: {error['message']}")
+
+    # Resolve os exercícios do arquivo inteiro em lote
+    resolve_exercise_ids([row for rows in treinos.values() for row in rows], build_search_index(db_cache))
+
+    print(f"✅ CSV carregado. {len(treinos)} treinos identificados: {list(treinos)}")
 
-    client = get_garmin_client()
+    store = WorkoutStore(WORKOUT_STORE_FILE)
 
-    for nome_treino in treinos_unicos:
+    payloads = []
+    for nome_treino, linhas in treinos.items():
+        if not nome_treino:
+            print(f"⚠️  {len(linhas)} linhas sem nome de treino foram ignoradas.")
+            continue
         print(f"\n⚙️  Processando: {nome_treino}...")
         
-        # Filtra apenas as linhas desse treino
-        treino_df = df[df['treino'] == nome_treino]
-        
         try:
-            payload = generate_payload(nome_treino, treino_df, db_cache)
-            
-            print(f"📤 Enviando para Garmin Connect...")
-            # Envio usando connectapi (método seguro)
-            response = client.connectapi(
-                "/workout-service/workout",
-                method="POST",
-                json=payload
-            )
-            
-            print(f"✅ SUCESSO! Treino '{nome_treino}' criado.")
-            
+            payloads.append(generate_payload(nome_treino, linhas, db_cache))
         except Exception as e:
-            print(f"❌ Falha ao enviar '{nome_treino}': {e}")
+            print(f"❌ Falha ao montar '{nome_treino}': {e}")
             # traceback.print_exc() # Descomente para ver detalhes do erro se falhar
 
+    # PUSH idempotente: iguais ao último envio são pulados, alterados viram PUT
+    print(f"\n📤 Sincronizando {len(payloads)} treinos com o Garmin Connect...")
+
+    def report(result):
+        name = result['workoutName']
+        if result['error']: print(f"❌ Falha ao enviar '{name}': {result['error']}")
+        elif result['action'] == CREATED: print(f"✅ SUCESSO! Treino '{name}' criado.")
+        elif result['action'] == UPDATED: print(f"♻️  Treino '{name}' atualizado (ID: {result['id']}).")
+        else: print(f"⏭️  Treino '{name}' sem alterações.")
+
+    try:
+        sync_workouts_bulk(get_garmin_client, payloads, store, workers=PUSH_WORKERS, on_result=report)
+    except Exception as e:
+        print(f"❌ {e}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+Espelho local (SQLite) da biblioteca de treinos da Garmin.
+
+Guarda o resumo de cada treino e a árvore de passos (detalhe) indexados por
+workoutId + updateDate. A sincronização é incremental: a lista de resumos é
+baixada de novo, mas o detalhe só é buscado para treinos novos ou alterados.
+
+Também guarda, por nome de treino, o workoutId e o hash do último payload
+enviado por nós (tabela pushed), para o PUSH idempotente.
+"""
+import os
+import re
+import json
+import asyncio
+import sqlite3
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_FILE = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'workouts.db')
+
+# Lista de treinos paginada (start/limit da Garmin): tamanho da página e quantas baixar ao mesmo tempo
+PAGE_SIZE = int(os.getenv("WORKOUT_PAGE_SIZE", "100") or 100)
+PAGE_CONCURRENCY = int(os.getenv("WORKOUT_PAGE_CONCURRENCY", "4") or 4)
+
+# Filtros de nome da busca (a comparação ignora maiúsculas/minúsculas)
+NAME_FILTERS = ("all", "starts_with", "ends_with", "contains", "regex")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workouts (
+    workout_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    sport TEXT,
+    update_date TEXT,
+    summary TEXT NOT NULL,
+    detail TEXT,
+    detail_update_date TEXT
+);
+CREATE TABLE IF NOT EXISTS pushed (
+    name TEXT PRIMARY KEY,
+    workout_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    pushed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS workouts_recent ON workouts (update_date DESC, workout_id DESC);
+"""
+
+
+def summary_fields(workout):
+    """(id, nome, esporte, updateDate) de um resumo ou treino completo."""
+    return (
+        int(workout['workoutId']),
+        workout.get('workoutName', ''),
+        (workout.get('sportType') or {}).get('sportTypeKey'),
+        workout.get('updateDate') or workout.get('createdDate'),
+    )
+
+
+def like_escape(text):
+    """Texto literal para um LIKE ... ESCAPE '\\'."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+@lru_cache(maxsize=64)
+def _compiled(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _sql_regexp(pattern, value):
+    # "name REGEXP ?" no SQLite chama regexp(?, name)
+    return value is not None and _compiled(pattern).search(value) is not None
+
+
+def _sql_lower(value):
+    # lower() do SQLite só conhece ASCII: "ÇÃO" ficaria em maiúsculas
+    return value.lower() if isinstance(value, str) else value
+
+
+class NameFilter:
+    """
+    Filtro de nome (ver NAME_FILTERS). Chamável (nome -> bool) e também
+    traduzível para SQL com where(), para a busca filtrar no próprio SQLite.
+    """
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+
+    def __call__(self, name):
+        if self.kind == 'all': return True
+        if self.kind == 'regex': return _sql_regexp(self.text, name)
+        name = name.lower()
+        if self.kind == 'starts_with': return name.startswith(self.text)
+        if self.kind == 'ends_with': return name.endswith(self.text)
+        return self.text in name
+
+    def where(self):
+        """(cláusula, parâmetros) sobre a coluna name; (None, []) se não filtra nada."""
+        if self.kind == 'all': return None, []
+        if self.kind == 'regex': return "name REGEXP ?", [self.text]
+        literal = like_escape(self.text)
+        pattern = {'starts_with': literal + '%', 'ends_with': '%' + literal}.get(self.kind, '%' + literal + '%')
+        return "py_lower(name) LIKE ? ESCAPE '\\'", [pattern]
+
+
+def name_filter(kind, text):
+    """
+    NameFilter para o filtro `kind` (ver NAME_FILTERS). Regex inválida ou
+    filtro desconhecido levantam ValueError.
+    """
+    text = (text or '').strip()
+    if kind in (None, '', 'all'): return NameFilter('all', '')
+    if kind == 'regex':
+        try:
+            _compiled(text)
+        except re.error as e:
+            raise ValueError(f"Regex inválida: {e}")
+        return NameFilter('regex', text)
+    if kind in ('starts_with', 'ends_with', 'contains'): return NameFilter(kind, text.lower())
+    raise ValueError(f"Filtro desconhecido: {kind}")
+
+
+def _next_pages(pending, next_start, end, page_size, concurrency):
+    """Starts das próximas páginas a pedir (até `concurrency` em andamento, antes de `end`)."""
+    starts = []
+    while len(pending) + len(starts) < concurrency and (end is None or next_start < end):
+        starts.append(next_start)
+        next_start += page_size
+    return starts, next_start
+
+
+def fetch_summaries(client, page_size=PAGE_SIZE, concurrency=PAGE_CONCURRENCY):
+    """
+    Baixa a lista de treinos página a página (start/limit) e gera cada
+    página assim que chega. A primeira vai sozinha (biblioteca pequena = uma
+    chamada); se vier cheia, as seguintes vão até `concurrency` por vez, e a
+    primeira página incompleta marca o fim da lista. Erro em qualquer página
+    interrompe a geração.
+    """
+    first = client.get_workouts(0, page_size) or []
+    yield first
+    if len(first) < page_size: return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    pending = {}
+    next_start, end = page_size, None
+    try:
+        while True:
+            starts, next_start = _next_pages(pending, next_start, end, page_size, concurrency)
+            for start in starts:
+                pending[executor.submit(client.get_workouts, start, page_size)] = start
+            if not pending: return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = pending.pop(future)
+                page = future.result() or []
+                if len(page) < page_size:
+                    end = start + page_size if end is None else min(end, start + page_size)
+                if page: yield page
+    finally:
+        # Consumidor desistiu ou uma página falhou: não pede as que faltam
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def fetch_summaries_async(client, page_size=PAGE_SIZE, concurrency=PAGE_CONCURRENCY):
+    """Mesmo que fetch_summaries, com o cliente assíncrono (garmin_async)."""
+    first = await client.get_workouts(0, page_size) or []
+    yield first
+    if len(first) < page_size: return
+
+    pending = {}
+    next_start, end = page_size, None
+    try:
+        while True:
+            starts, next_start = _next_pages(pending, next_start, end, page_size, concurrency)
+            for start in starts:
+                pending[asyncio.ensure_future(client.get_workouts(start, page_size))] = start
+            if not pending: return
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                start = pending.pop(task)
+                page = task.result() or []
+                if len(page) < page_size:
+                    end = start + page_size if end is None else min(end, start + page_size)
+                if page: yield page
+    finally:
+        for task in pending: task.cancel()
+
+
+class WorkoutStore:
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Conexão curta por operação (commit no fim, seguro entre threads)."""
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=30) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                    conn.close()
+                    self._ready = True
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # Usadas pelos filtros de nome da busca (NameFilter.where)
+        conn.create_function("regexp", 2, _sql_regexp, deterministic=True)
+        conn.create_function("py_lower", 1, _sql_lower, deterministic=True)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Leitura ---
+
+    def last_sync(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        return row['value'] if row else None
+
+    def versions(self):
+        """{workoutId: updateDate} de tudo que está no espelho."""
+        with self._connect() as conn:
+            return {r['workout_id']: r['update_date'] for r in conn.execute(
+                "SELECT workout_id, update_date FROM workouts")}
+
+    def summaries(self, sport=None):
+        """Resumos no formato da Garmin (ordem: mais recentes primeiro)."""
+        query = "SELECT summary FROM workouts"
+        params = ()
+        if sport:
+            query += " WHERE sport = ?"
+            params = (sport,)
+        query += " ORDER BY update_date DESC, workout_id DESC"
+        with self._connect() as conn:
+            return [json.loads(r['summary']) for r in conn.execute(query, params)]
+
+    def search(self, matches=None, sport=None, date_from=None, date_to=None, offset=0, limit=None):
+        """
+        Busca paginada no espelho: (total, linhas) com id, nome, esporte e
+        updateDate, mais recentes primeiro. Tudo filtra no SQLite: esporte,
+        datas (YYYY-MM-DD, inclusivas) e `matches` (NameFilter, ver
+        name_filter); a página sai com LIMIT/OFFSET e o total com COUNT(*).
+        """
+        where, params = [], []
+        if matches is not None:
+            clause, clause_params = matches.where()
+            if clause:
+                where.append(clause)
+                params.extend(clause_params)
+        if sport:
+            where.append("sport = ?")
+            params.append(sport)
+        if date_from:
+            where.append("substr(update_date, 1, 10) >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("substr(update_date, 1, 10) <= ?")
+            params.append(date_to)
+        condition = " WHERE " + " AND ".join(where) if where else ""
+
+        query = "SELECT workout_id, name, sport, update_date FROM workouts" + condition
+        query += " ORDER BY update_date DESC, workout_id DESC LIMIT ? OFFSET ?"
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM workouts" + condition, params).fetchone()[0]
+            rows = [dict(r) for r in conn.execute(query, params + [-1 if limit is None else limit, offset])]
+        return total, rows
+
+    def sports(self):
+        """Esportes presentes no espelho (para o filtro da busca)."""
+        with self._connect() as conn:
+            return [r['sport'] for r in conn.execute(
+                "SELECT DISTINCT sport FROM workouts WHERE sport IS NOT NULL ORDER BY sport")]
+
+    def details(self, workout_ids):
+        """{workoutId: detalhe} dos treinos que já têm detalhe atualizado."""
+        if not workout_ids: return {}
+        result = {}
+        with self._connect() as conn:
+            for i in range(0, len(workout_ids), 500):
+                chunk = [int(w) for w in workout_ids[i:i + 500]]
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(
+                        f"SELECT workout_id, detail FROM workouts WHERE workout_id IN ({marks}) "
+                        "AND detail IS NOT NULL AND detail_update_date IS update_date", chunk):
+                    result[r['workout_id']] = json.loads(r['detail'])
+        return result
+
+    def stale_ids(self, sport=None):
+        """Treinos sem detalhe ou com detalhe de uma versão antiga."""
+        query = "SELECT workout_id FROM workouts WHERE (detail IS NULL OR detail_update_date IS NOT update_date)"
+        params = ()
+        if sport:
+            query += " AND sport = ?"
+            params = (sport,)
+        with self._connect() as conn:
+            return [r['workout_id'] for r in conn.execute(query, params)]
+
+    # --- Escrita ---
+
+    def refresh_summaries(self, client, pages=None):
+        """
+        Baixa a lista de treinos (ou consome `pages`, um iterável de listas
+        de resumos), grava cada página assim que chega e, com a lista
+        completa, remove os que sumiram da conta. Se uma página falhar, nada
+        é removido. Retorna os ids cujo detalhe precisa ser (re)baixado.
+        """
+        if pages is None: pages = fetch_summaries(client)
+        seen = set()
+        for page in pages:
+            seen.update(self.save_summaries(page))
+
+        with self._connect() as conn:
+            stored = [r['workout_id'] for r in conn.execute("SELECT workout_id FROM workouts")]
+            removed = [w_id for w_id in stored if w_id not in seen]
+            conn.executemany("DELETE FROM workouts WHERE workout_id = ?", [(w_id,) for w_id in removed])
+            conn.execute("DELETE FROM pushed WHERE workout_id NOT IN (SELECT workout_id FROM workouts)")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)",
+                         (datetime.now().isoformat(timespec='seconds'),))
+        return self.stale_ids()
+
+    def save_summaries(self, workouts):
+        """Grava (ou atualiza) os resumos de uma página da lista. Retorna os ids gravados."""
+        ids = []
+        with self._connect() as conn:
+            for w in workouts:
+                if not isinstance(w, dict) or 'workoutId' not in w: continue
+                w_id, name, sport, update_date = summary_fields(w)
+                ids.append(w_id)
+                conn.execute(
+                    "INSERT INTO workouts (workout_id, name, sport, update_date, summary) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(workout_id) DO UPDATE SET name = excluded.name, sport = excluded.sport, "
+                    "update_date = excluded.update_date, summary = excluded.summary",
+                    (w_id, name, sport, update_date, json.dumps(w, ensure_ascii=False)))
+        return ids
+
+    def save_detail(self, workout_id, detail, update_date=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE workouts SET detail = ?, detail_update_date = COALESCE(?, update_date) WHERE workout_id = ?",
+                (json.dumps(detail, ensure_ascii=False), update_date, int(workout_id)))
+
+    def save_workout(self, workout):
+        """Grava um treino completo (ex.: resposta do POST) como resumo e detalhe."""
+        if not isinstance(workout, dict) or 'workoutId' not in workout: return
+        w_id, name, sport, update_date = summary_fields(workout)
+        summary = {k: v for k, v in workout.items() if k != 'workoutSegments'}
+        raw_detail = json.dumps(workout, ensure_ascii=False)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workouts (workout_id, name, sport, update_date, summary, detail, detail_update_date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (w_id, name, sport, update_date, json.dumps(summary, ensure_ascii=False), raw_detail, update_date))
+
+    def invalidate_details(self, workout_ids):
+        """Descarta o detalhe guardado: volta para stale_ids e é baixado de novo."""
+        with self._connect() as conn:
+            conn.executemany("UPDATE workouts SET detail = NULL, detail_update_date = NULL WHERE workout_id = ?",
+                             [(int(w),) for w in workout_ids])
+
+    def remove(self, workout_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM workouts WHERE workout_id = ?", [(int(w),) for w in workout_ids])
+            conn.executemany("DELETE FROM pushed WHERE workout_id = ?", [(int(w),) for w in workout_ids])
+
+    # --- PUSH idempotente ---
+
+    def push_state(self, names):
+        """{nome: (workoutId, hash do último envio)} dos treinos já enviados."""
+        if not names: return {}
+        result = {}
+        with self._connect() as conn:
+            for i in range(0, len(names), 500):
+                chunk = list(names[i:i + 500])
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(f"SELECT name, workout_id, content_hash FROM pushed WHERE name IN ({marks})", chunk):
+                    result[r['name']] = (r['workout_id'], r['content_hash'])
+        return result
+
+    def ids_by_name(self, names):
+        """{nome: workoutId} pelo espelho (o mais recente, se houver repetidos)."""
+        if not names: return {}
+        result = {}
+        with self._connect() as conn:
+            for i in range(0, len(names), 500):
+                chunk = list(names[i:i + 500])
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(
+                        f"SELECT name, workout_id FROM workouts WHERE name IN ({marks}) "
+                        "ORDER BY update_date ASC, workout_id ASC", chunk):
+                    result[r['name']] = r['workout_id']
+        return result
+
+    def record_push(self, name, workout_id, content_hash):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pushed (name, workout_id, content_hash, pushed_at) VALUES (?, ?, ?, ?)",
+                         (name, int(workout_id), content_hash, datetime.now().isoformat(timespec='seconds')))
+
+    # --- Sincronização ---
+
+    def fetch_details(self, client, workout_ids, workers=8):
+        """
+        Baixa os detalhes num pool de threads limitado, grava cada um assim
+        que chega e gera (workoutId, detalhe) na ordem de conclusão.
+        """
+        if not workout_ids: return
+        versions = self.versions()
+
+        def fetch(w_id):
+            return client.connectapi(f"/workout-service/workout/{w_id}", method="GET")
+
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = {executor.submit(fetch, w_id): w_id for w_id in workout_ids}
+            for future in as_completed(futures):
+                w_id = futures[future]
+                try:
+                    detail = future.result()
+                except Exception as e:
+                    print(f"Erro ao baixar treino {w_id}: {e}")
+                    continue
+                self.save_detail(w_id, detail, versions.get(int(w_id)))
+                yield w_id, detail
+        finally:
+            # Consumidor desistiu no meio (ex.: cliente HTTP desconectou)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def fetch_details_async(self, client, workout_ids, concurrency=8):
+        """
+        Mesmo que fetch_details, com o cliente assíncrono (garmin_async):
+        até `concurrency` downloads em andamento no event loop. As gravações no
+        SQLite vão para uma thread, fora do loop compartilhado.
+        """
+        if not workout_ids: return
+        versions = await asyncio.to_thread(self.versions)
+
+        slots = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(w_id):
+            async with slots:
+                try:
+                    return w_id, await client.connectapi(f"/workout-service/workout/{w_id}")
+                except Exception as e:
+                    print(f"Erro ao baixar treino {w_id}: {e}")
+                    return w_id, None
+
+        tasks = [asyncio.ensure_future(fetch(w_id)) for w_id in workout_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                w_id, detail = await next_done
+                if detail is None: continue
+                await asyncio.to_thread(self.save_detail, w_id, detail, versions.get(int(w_id)))
+                yield w_id, detail
+        finally:
+            for task in tasks: task.cancel()
+
+    def sync(self, client, workers=8, sport=None):
+        """Sincronização incremental completa. Retorna estatísticas."""
+        stale = self.refresh_summaries(client)
+        if sport:
+            wanted = {w['workoutId'] for w in self.summaries(sport)}
+            stale = [w_id for w_id in stale if w_id in wanted]
+        fetched = sum(1 for _ in self.fetch_details(client, stale, workers))
+        return {"fetched": fetched, "stale": len(stale), "total": len(self.summaries())}
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import json
+import contextlib
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+
+# Mesmo esquema do app.py: os módulos de src/ se importam pelo nome
+if SRC_DIR not in sys.path: sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope="session")
+def exercises():
+    with open(os.path.join(DATA_DIR, 'processed', 'exercises.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def search_rules():
+    with open(os.path.join(DATA_DIR, 'config', 'search_rules.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def search_index(exercises, search_rules):
+    from search_engine import ExerciseSearchIndex
+    return ExerciseSearchIndex(exercises, search_rules)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    # O app imprime o carregamento do catálogo na importação
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
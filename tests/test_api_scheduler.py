@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from email.utils import formatdate
+
+import pytest
+
+from api_scheduler import error_status, retry_after, parse_retry_after, TooManyRequestsError, GarminConnectConnectionError
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class HTTPError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+def wrapped(cause, message="Connection error"):
+    """Como o garminconnect faz: raise GarminConnectConnectionError(...) from e"""
+    try:
+        raise cause
+    except Exception as e:
+        try:
+            raise RuntimeError(message) from e
+        except RuntimeError as outer:
+            return outer
+
+
+def test_status_comes_from_the_response():
+    assert error_status(HTTPError("boom", Response(503))) == 503
+    assert error_status(wrapped(HTTPError("boom", Response(404)))) == 404
+
+
+def test_numbers_in_the_message_are_not_a_status():
+    assert error_status(RuntimeError("Timeout after 500 ms")) is None
+    assert error_status(RuntimeError("workout 404 not in list; retried 429 times")) is None
+
+
+def test_status_attribute_without_response():
+    e = RuntimeError("falhou")
+    e.status_code = 502
+    assert error_status(e) == 502
+    e = RuntimeError("falhou")
+    e.status = "503"      # Não numérico: ignora
+    assert error_status(e) is None
+
+
+@pytest.mark.skipif(TooManyRequestsError is None, reason="garminconnect não instalado")
+def test_too_many_requests_without_response_is_429():
+    assert error_status(TooManyRequestsError("Rate limit exceeded")) == 429
+
+
+def test_retry_after_delta_seconds():
+    assert retry_after(HTTPError("429", Response(429, {'Retry-After': '2.5'}))) == 2.5
+    assert retry_after(HTTPError("429", Response(429))) is None
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('amanhã') is None
+
+
+def test_retry_after_http_date():
+    now = 1_700_000_000
+    assert parse_retry_after(formatdate(now + 30, usegmt=True), now=now) == pytest.approx(30)
+    assert parse_retry_after(formatdate(now - 30, usegmt=True), now=now) == 0.0
+    header = {'Retry-After': formatdate(usegmt=True)}
+    assert 0.0 <= retry_after(wrapped(HTTPError("429", Response(429, header)))) <= 1.0
+
+
+@pytest.mark.skipif(GarminConnectConnectionError is None, reason="garminconnect não instalado")
+def test_garminconnect_api_error_without_response():
+    inner = GarminConnectConnectionError("API Error 503 - Service Unavailable")
+    assert error_status(inner) == 503
+    # Garmin.connectapi embrulha: "HTTP error: API Error ..." from e
+    assert error_status(wrapped(inner, "HTTP error: API Error 503 - Service Unavailable")) == 503
+    assert error_status(GarminConnectConnectionError("Connection error: read 500 bytes")) is None
+    assert error_status(RuntimeError("API Error 500 - texto de outra biblioteca")) is None
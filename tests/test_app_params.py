@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+WORKOUT = {"workoutName": "Treino A", "steps": []}
+
+
+@pytest.mark.parametrize("route, body", [
+    ('/api/delete_workouts', {"ids": [1], "workers": "x"}),
+    ('/api/delete_workouts', {"ids": [1], "workers": [2]}),
+    ('/api/jobs/delete', {"ids": [1], "workers": "x"}),
+    ('/api/jobs/pull', {"workers": "x"}),
+    ('/api/jobs/pull', {"limit": "muitos"}),
+    ('/api/jobs/pull', {"limit": True}),
+    ('/api/upload_batch', {"workouts": [WORKOUT], "workers": "x"}),
+    ('/api/jobs/push', {"workouts": [WORKOUT], "workers": {}}),
+    ('/api/list_workouts', {"offset": "x"}),
+    ('/api/list_workouts', {"limit": "x"}),
+])
+def test_bad_numbers_are_rejected_with_400(client, route, body):
+    response = client.post(route, json=body)
+    assert response.status_code == 400
+    assert "número inteiro" in response.get_json()['error']
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "workers=x", "limit=1.5"])
+def test_bad_query_numbers_are_rejected_with_400(client, query):
+    response = client.get(f'/api/pull_workouts?{query}')
+    assert response.status_code == 400
+    assert "número inteiro" in response.get_json()['error']
+
+
+def test_int_param(app_module):
+    int_param = app_module.int_param
+    assert int_param({}, 'workers', 4, 1, 16) == 4
+    assert int_param({"workers": None}, 'workers', 4, 1, 16) == 4
+    assert int_param({"workers": "8"}, 'workers', 4, 1, 16) == 8
+    assert int_param({"workers": 0}, 'workers', 4, 1, 16) == 1
+    assert int_param({"workers": 99}, 'workers', 4, 1, 16) == 16
+    assert int_param({"limit": 500}, 'limit', None, 0) == 500
+    assert int_param({"limit": ""}, 'limit', None, 0) is None
+
+
+@pytest.mark.parametrize("route", ['/api/upload_batch', '/api/jobs/push'])
+def test_batch_with_a_repeated_name_is_rejected_with_400(client, route):
+    response = client.post(route, json={"workouts": [WORKOUT, {"workoutName": "Treino B"}, WORKOUT]})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Treino repetido no lote: Treino A"
+
+
+@pytest.mark.parametrize("body", [
+    {"dateFrom": "ontem"},
+    {"dateTo": "2024-13-01"},
+    {"dateFrom": "2024-02-30"},
+    {"dateTo": 20240101},
+    {"dateFrom": "2024-01-01' OR 1=1 --"},
+])
+def test_bad_dates_are_rejected_with_400(client, body):
+    response = client.post('/api/list_workouts', json=body)
+    assert response.status_code == 400
+    assert "AAAA-MM-DD" in response.get_json()['error']
+
+
+def test_inverted_date_range_is_rejected_with_400(client):
+    response = client.post('/api/list_workouts', json={"dateFrom": "2024-02-01", "dateTo": "2024-01-01"})
+    assert response.status_code == 400
+
+
+def test_date_param(app_module):
+    date_param = app_module.date_param
+    assert date_param({}, 'dateFrom') is None
+    assert date_param({"dateFrom": ""}, 'dateFrom') is None
+    assert date_param({"dateFrom": "2024-01-05"}, 'dateFrom') == "2024-01-05"
+    assert date_param({"dateFrom": "2024-1-5"}, 'dateFrom') == "2024-01-05"
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import benchmark
+
+
+def test_suite_runs_at_the_smallest_scale(monkeypatch):
+    # Uma execução por benchmark: aqui só importa que nada quebre
+    monkeypatch.setattr(benchmark, 'MIN_RUNS', 1)
+    monkeypatch.setattr(benchmark, 'MAX_RUNS', 1)
+    results = benchmark.run([1])
+
+    names = {key.split('[')[0] for key in results}
+    assert {"search.find", "build_db.full", "build_db.noop", "csv.ingest", "push.fake_client"} <= names
+    assert all(r['runs'] == 1 and r['min'] > 0 for r in results.values())
+
+
+def test_regression_check_against_a_saved_baseline(tmp_path, monkeypatch):
+    baseline = str(tmp_path / 'ci' / 'base.json')
+    timings = {"search.find[1x]": {"median": 0.010, "min": 0.010, "runs": 3}}
+    monkeypatch.setattr(benchmark, 'run', lambda scales, only=None: timings)
+
+    assert benchmark.main(["--scales", "1", "--baseline", baseline]) == 0     # Sem base ainda
+    assert benchmark.main(["--scales", "1", "--save", "--baseline", baseline]) == 0
+    assert benchmark.main(["--scales", "1", "--baseline", baseline]) == 0
+
+    timings["search.find[1x]"] = {"median": 0.020, "min": 0.020, "runs": 3}
+    assert benchmark.main(["--scales", "1", "--baseline", baseline]) == 1
+    assert benchmark.main(["--scales", "1", "--baseline", baseline, "--tolerance", "1.5"]) == 0
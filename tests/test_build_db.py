@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+
+import pytest
+
+import build_db
+from conftest import DATA_DIR
+
+SOURCES = ["exercise_types_pt_BR_5.21.0.16.txt", "exercise_types_pt_BR_5.21.0.15a.txt"]
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    for name in SOURCES:
+        shutil.copy(os.path.join(DATA_DIR, 'raw', name), raw / name)
+    processed = tmp_path / 'processed'
+    monkeypatch.setattr(build_db, 'RAW_DATA_DIR', str(raw))
+    monkeypatch.setattr(build_db, 'OUTPUT_FILE', str(processed / 'exercises.json'))
+    monkeypatch.setattr(build_db, 'CATALOG_FILE', str(processed / 'exercises.bin'))
+    monkeypatch.setattr(build_db, 'BUILD_CACHE_FILE', str(processed / '.build_cache.json'))
+    monkeypatch.setattr(build_db, 'DOWNLOAD_META_FILE', str(raw / '.download_meta.json'))
+
+    parsed = []
+    parse_file = build_db.parse_file
+
+    def counting_parse(path):
+        parsed.append(os.path.basename(path))
+        return parse_file(path)
+    monkeypatch.setattr(build_db, 'parse_file', counting_parse)
+    return raw, processed, parsed
+
+
+def outputs(processed):
+    return {name: (processed / name).read_bytes() for name in ('exercises.json', 'exercises.bin')}
+
+
+def stamps(processed):
+    return {name: (processed / name).stat().st_mtime_ns for name in ('exercises.json', 'exercises.bin')}
+
+
+def test_full_build_then_noop(workspace):
+    raw, processed, parsed = workspace
+    assert build_db.build() is True
+    assert sorted(parsed) == sorted(SOURCES)
+    assert len(json.loads((processed / 'exercises.json').read_text(encoding='utf-8'))) > 1000
+
+    before = stamps(processed)
+    parsed.clear()
+    assert build_db.build() is False
+    assert parsed == []
+    assert stamps(processed) == before
+
+
+def test_touch_without_content_change_is_noop(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    os.utime(raw / SOURCES[0], ns=(1, 1))
+    assert build_db.build() is False
+    assert parsed == []
+
+
+def test_changed_file_is_the_only_one_reparsed(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    with open(raw / SOURCES[1], 'a', encoding='utf-8') as f:
+        f.write("\nSQUAT_TESTE_INCREMENTAL=Agachamento de teste incremental\n")
+
+    assert build_db.build() is True
+    assert parsed == [SOURCES[1]]
+    incremental = outputs(processed)
+    labels = {item['label'] for item in json.loads(incremental['exercises.json'])}
+    assert "Agachamento de teste incremental" in labels
+
+    # Mesmo resultado que um build do zero
+    parsed.clear()
+    assert build_db.build(force=True) is True
+    assert sorted(parsed) == sorted(SOURCES)
+    assert outputs(processed) == incremental
+
+
+def test_settings_change_invalidates_cache(workspace, monkeypatch):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    monkeypatch.setattr(build_db, 'PARSER_VERSION', build_db.PARSER_VERSION + 1)
+    assert build_db.build() is True
+    assert sorted(parsed) == sorted(SOURCES)
+
+
+def test_missing_output_is_rebuilt_from_cache(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    expected = outputs(processed)
+    parsed.clear()
+    (processed / 'exercises.bin').unlink()
+    assert build_db.build() is True
+    assert parsed == []
+    assert outputs(processed) == expected
+
+
+def test_removed_input_triggers_rebuild(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    (raw / SOURCES[1]).unlink()
+    assert build_db.build() is True
+    assert parsed == []
+    assert json.loads((processed / '.build_cache.json').read_text(encoding='utf-8'))['inputs'] == [SOURCES[0]]
+
+
+def test_corrupt_cache_means_full_build(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    (processed / '.build_cache.json').write_text("{corrompido", encoding='utf-8')
+    assert build_db.build() is True
+    assert sorted(parsed) == sorted(SOURCES)
+
+
+def test_force_reparses_everything(workspace):
+    raw, processed, parsed = workspace
+    build_db.build()
+    parsed.clear()
+    assert build_db.build(force=True) is True
+    assert sorted(parsed) == sorted(SOURCES)
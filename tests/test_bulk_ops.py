@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+
+import pytest
+
+from workout_store import WorkoutStore
+from bulk_ops import sync_workouts_bulk, sync_workouts_bulk_async, CREATED, UPDATED
+
+
+class FakeClient:
+    """Conta com um treino "Treino A" (id 7) que o espelho local ainda não conhece."""
+
+    def __init__(self):
+        self.calls = []
+        self.library = [{"workoutId": 7, "workoutName": "Treino A", "updateDate": "2026-01-01T10:00:00.0"}]
+
+    def get_workouts(self, start=0, limit=100):
+        return self.library[start:start + limit]
+
+    def connectapi(self, path, method="GET", json=None, **kwargs):
+        if method == "GET":
+            return {"workoutId": int(path.rsplit('/', 1)[1]), "updateDate": "2026-02-01T10:00:00.0", "workoutSegments": []}
+        self.calls.append((method, path))
+        if method == "POST": return dict(json, workoutId=100 + len(self.calls), updateDate="2026-02-01T09:00:00.0")
+        return None     # PUT da Garmin: 204 sem corpo
+
+
+class AsyncFakeClient(FakeClient):
+    async def get_workouts(self, start=0, limit=100):
+        return FakeClient.get_workouts(self, start, limit)
+
+    async def connectapi(self, path, method="GET", json=None, **kwargs):
+        return FakeClient.connectapi(self, path, method, json)
+
+
+def payloads():
+    return [{"workoutName": "Treino A", "workoutSegments": []}, {"workoutName": "Treino B", "workoutSegments": []}]
+
+
+@pytest.mark.parametrize("client_class", [FakeClient, AsyncFakeClient])
+def test_first_push_lists_the_account_instead_of_duplicating(tmp_path, client_class):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    client = client_class()
+    if client_class is AsyncFakeClient:
+        results = asyncio.run(sync_workouts_bulk_async(lambda: client, payloads(), store))
+    else:
+        results = sync_workouts_bulk(lambda: client, payloads(), store)
+
+    assert [(r['workoutName'], r['action'], r['error']) for r in results] == [
+        ("Treino A", UPDATED, None), ("Treino B", CREATED, None)]
+    assert sorted(client.calls) == [("POST", "/workout-service/workout"), ("PUT", "/workout-service/workout/7")]
+    assert store.last_sync() is not None
+
+
+class OffLoopStore(WorkoutStore):
+    """Falha se o SQLite for tocado na thread do event loop."""
+    loop_thread = None
+
+    def _connect(self):
+        assert threading.get_ident() != self.loop_thread, "SQLite no event loop"
+        return WorkoutStore._connect(self)
+
+
+def test_async_push_keeps_sqlite_off_the_event_loop(tmp_path):
+    store = OffLoopStore(str(tmp_path / 'workouts.db'))
+    client = AsyncFakeClient()
+    client.library.append({"workoutId": 8, "workoutName": "Treino C", "updateDate": "2026-01-02T10:00:00.0"})
+
+    async def main():
+        store.loop_thread = threading.get_ident()
+        results = await sync_workouts_bulk_async(lambda: client, payloads(), store)
+        details = [w_id async for w_id, _ in store.fetch_details_async(client, [7, 8])]
+        return results, details
+
+    results, details = asyncio.run(main())
+    assert [r['error'] for r in results] == [None, None]
+    assert sorted(details) == [7, 8]
+
+
+@pytest.mark.parametrize("client_class", [FakeClient, AsyncFakeClient])
+def test_batch_with_a_repeated_name_is_rejected_before_any_call(tmp_path, client_class):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    client = client_class()
+    batch = payloads() + [{"workoutName": "Treino B", "workoutSegments": [{"segmentOrder": 1}]}]
+
+    with pytest.raises(ValueError, match="Treino B"):
+        if client_class is AsyncFakeClient:
+            asyncio.run(sync_workouts_bulk_async(lambda: client, batch, store))
+        else:
+            sync_workouts_bulk(lambda: client, batch, store)
+    assert client.calls == []
+    assert store.last_sync() is None
+
+
+class RereadFailsClient(FakeClient):
+    def connectapi(self, path, method="GET", json=None, **kwargs):
+        if method == "GET": raise ConnectionError("timeout")
+        return FakeClient.connectapi(self, path, method, json)
+
+
+def test_update_stores_the_workout_as_the_server_has_it(tmp_path):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    sync_workouts_bulk(FakeClient, payloads(), store)
+
+    # PUT sem corpo: o espelho guarda a releitura, com o updateDate da Garmin
+    assert store.versions()[7] == "2026-02-01T10:00:00.0"
+    assert 7 not in store.stale_ids()
+
+
+def test_update_without_reread_marks_the_detail_stale(tmp_path):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    results = sync_workouts_bulk(RereadFailsClient, payloads(), store)
+
+    assert [(r['id'], r['action'], r['error']) for r in results][0] == (7, UPDATED, None)
+    assert store.versions()[7] == "2026-01-01T10:00:00.0"
+    assert 7 in store.stale_ids()
+    assert store.push_state(["Treino A"])["Treino A"][0] == 7
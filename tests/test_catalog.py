@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from catalog import CompactCatalog, write_catalog
+
+
+def test_records_match_the_json(tmp_path, exercises):
+    catalog = CompactCatalog(write_catalog(exercises, str(tmp_path / 'exercises.bin')))
+    try:
+        assert list(catalog.records) == exercises
+        assert catalog[exercises[10]['id']] == exercises[10]
+    finally:
+        catalog.close()
+
+
+@pytest.mark.parametrize("item", [
+    {"id": "SQUAT_AIR", "label": "Agachamento livre"},
+    {"id": "SQUAT_AIR", "label": "Agachamento livre", "category": "SQUAT"},
+    {"id": "SQUAT_AIR", "label": "Agachamento livre", "search_term": "air squat"},
+    {"id": "SQUAT_AIR", "label": "Agachamento livre", "search_term": None, "internal_key": "AIR"},
+    {"id": "X_1", "label": "Sem categoria", "category": "UNCATEGORIZED", "search_term": "x", "internal_key": "X_1"},
+])
+def test_record_keeps_only_the_source_keys(tmp_path, item):
+    catalog = CompactCatalog(write_catalog([item], str(tmp_path / 'exercises.bin')))
+    try:
+        assert catalog.records[0] == item
+    finally:
+        catalog.close()
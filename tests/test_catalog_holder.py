@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import pytest
+
+from catalog_holder import CatalogHolder
+
+EXERCISES = [
+    {"id": "BENCH_PRESS", "label": "Supino reto", "category": "BENCH_PRESS"},
+    {"id": "SQUAT", "label": "Agachamento", "category": "SQUAT"},
+]
+RULES = {"supino": ["bench press"]}
+
+
+def write(path, data):
+    """Grava e adianta o mtime: o stamp muda mesmo com o relógio de baixa resolução."""
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding='utf-8')
+    os.utime(path, ns=(previous + 10**9, previous + 10**9))
+
+
+@pytest.fixture
+def files(tmp_path):
+    json_file, rules_file = tmp_path / 'exercises.json', tmp_path / 'search_rules.json'
+    write(json_file, EXERCISES)
+    write(rules_file, RULES)
+    return json_file, rules_file
+
+
+@pytest.fixture
+def holder(tmp_path, files):
+    json_file, rules_file = files
+    # Sem exercises.bin: carrega do JSON. interval=0: sem thread de recarga
+    holder = CatalogHolder(str(tmp_path / 'exercises.bin'), str(json_file), str(rules_file), interval=0)
+    holder.current()
+    return holder
+
+
+def test_rules_only_change_reuses_the_index(holder, files):
+    _, rules_file = files
+    before = holder.current()
+    write(rules_file, dict(RULES, agachamento=["squat"]))
+
+    assert holder.refresh() is True
+    after = holder.current()
+    assert after.rules == dict(RULES, agachamento=["squat"])
+    assert after.exercises is before.exercises
+    assert after.index is not before.index
+    assert after.index.token_postings is before.index.token_postings
+    assert after.index.synonyms.source == after.rules
+    assert before.index.synonyms.source == RULES     # o retrato antigo não muda
+
+
+def test_catalog_change_rebuilds_the_index(holder, files):
+    json_file, _ = files
+    before = holder.current()
+    write(json_file, EXERCISES + [{"id": "DEADLIFT", "label": "Levantamento terra", "category": "DEADLIFT"}])
+
+    assert holder.refresh() is True
+    after = holder.current()
+    assert "DEADLIFT" in after.exercises
+    assert after.index.token_postings is not before.index.token_postings
+    assert after.rules == RULES
+    assert holder.refresh() is False    # nada mudou desde a recarga
+
+
+def test_invalid_rules_keep_the_previous_rules(holder, files):
+    _, rules_file = files
+    write(rules_file, '{"supino": [')
+
+    holder.refresh()
+    assert holder.current().rules == RULES
+    assert holder.current().index.synonyms.source == RULES
+
+
+def test_failed_stamps_are_not_retried_until_the_files_change(holder, files, monkeypatch):
+    json_file, _ = files
+    before = holder.current()
+    write(json_file, '[{"id": ')
+
+    loads = []
+    real_load = holder._load
+    monkeypatch.setattr(holder, '_load', lambda stamps, previous: loads.append(stamps) or real_load(stamps, previous))
+
+    assert holder.refresh() is False
+    assert holder.refresh() is False
+    assert len(loads) == 1
+    assert holder.current() is before   # segue no ar com o retrato anterior
+
+    write(json_file, EXERCISES[:1])
+    assert holder.refresh() is True
+    assert len(loads) == 2
+    assert list(holder.current().exercises) == ["BENCH_PRESS"]
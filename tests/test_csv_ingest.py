@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import io
+import csv
+
+import pytest
+
+from csv_ingest import WorkoutCsv, CsvFormatError, DEFAULT_WORKOUT, NUMERIC_DEFAULTS
+
+HEADER = ["treino", "exercicio", "nota_personalizada", "series", "reps", "peso_kg", "intervalo_segundos"]
+ROWS = [["Treino A", "SQUAT_LEG_PRESS", "LEG PRESS 45", "4", "12", "80", "60"],
+        ["Treino A", "", "SUPINO RETO", "3", "10", "22,5", "90"],
+        ["Treino B", "", "PRANCHA", "3", "1", "0", "30"]]
+
+
+def sheet_text(delimiter=",", rows=ROWS, header=HEADER):
+    out = io.StringIO()
+    csv.writer(out, delimiter=delimiter, lineterminator="\n").writerows([header] + rows)
+    return out.getvalue()
+
+
+def read(text, **kwargs):
+    sheet = WorkoutCsv(io.BytesIO(text.encode('utf-8')), **kwargs)
+    return list(sheet), sheet
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t"])
+def test_delimiter_sniffed_from_header(delimiter):
+    rows, sheet = read(sheet_text(delimiter))
+    assert sheet.columns == HEADER
+    assert [(r['treino'], r['nota_personalizada'], r['peso_kg']) for r in rows] == [
+        ("Treino A", "LEG PRESS 45", 80.0), ("Treino A", "SUPINO RETO", 22.5), ("Treino B", "PRANCHA", 0.0)]
+    assert sheet.errors == []
+
+
+def test_utf8_bom_does_not_leak_into_first_column():
+    rows, sheet = read("\ufeff" + sheet_text(";"))
+    assert sheet.columns[0] == "treino"
+    assert rows[0]['treino'] == "Treino A"
+
+
+def test_path_and_text_stream_sources(tmp_path):
+    path = tmp_path / "treino.csv"
+    path.write_bytes(b"\xef\xbb\xbf" + sheet_text().encode('utf-8'))
+    from_path = list(WorkoutCsv(str(path)))
+    from_text = list(WorkoutCsv(io.StringIO(sheet_text())))
+    assert from_path == from_text
+    assert [r['line'] for r in from_path] == [2, 3, 4]
+
+
+def test_empty_cells_use_defaults_silently():
+    rows, sheet = read(sheet_text(rows=[["Treino A", "", "REMADA", "", "", "", ""]]))
+    assert {c: rows[0][c] for c in NUMERIC_DEFAULTS} == NUMERIC_DEFAULTS
+    assert sheet.errors == []
+
+
+def test_bad_values_use_defaults_and_are_reported():
+    rows, sheet = read(sheet_text(rows=[["Treino A", "", "REMADA", "tres", "-1", "nan", "45.9"]]))
+    row = rows[0]
+    assert (row['series'], row['reps'], row['peso_kg'], row['intervalo_segundos']) == (3, 10, 0.0, 45)
+    assert [(e['line'], e['column'], e['value']) for e in sheet.errors] == [
+        (2, 'series', 'tres'), (2, 'reps', '-1'), (2, 'peso_kg', 'nan')]
+
+
+def test_blank_lines_extra_columns_and_missing_workout_column():
+    text = "exercicio,series\n\nSQUAT_LEG_PRESS,4,sobra\n , \n"
+    rows, sheet = read(text)
+    assert len(rows) == 1
+    assert rows[0]['treino'] == DEFAULT_WORKOUT
+    assert rows[0]['series'] == 4
+    assert [e['line'] for e in sheet.errors] == [3]
+
+
+def test_row_limit_is_reported():
+    rows, sheet = read(sheet_text(), max_rows=2)
+    assert len(rows) == 2
+    assert "Limite de 2 linhas" in sheet.errors[-1]['message']
+
+
+def test_workouts_group_in_order():
+    sheet = WorkoutCsv(io.StringIO(sheet_text()))
+    groups = sheet.workouts()
+    assert list(groups) == ["Treino A", "Treino B"]
+    assert [len(g) for g in groups.values()] == [2, 1]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "vazio"),
+    (b"\n\n", "vazio"),
+    ("treino,exercicio\nSupino,Máquina\n".encode('latin-1'), "UTF-8"),
+    (b"treino,nota\nA," + b"x" * 200000 + b"\n", "CSV"),
+])
+def test_unreadable_files_raise_csv_format_error(data, message):
+    with pytest.raises(CsvFormatError, match=message):
+        list(WorkoutCsv(io.BytesIO(data)))
+
+
+def test_csv_format_error_is_a_value_error():
+    assert issubclass(CsvFormatError, ValueError)
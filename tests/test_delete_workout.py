@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from workout_store import WorkoutStore
+from delete_workout import load_workouts
+
+
+class FakeClient:
+    def __init__(self, workouts):
+        self.workouts = workouts
+
+    def get_workouts(self, start=0, limit=100):
+        return self.workouts[start:start + limit]
+
+
+def workout(w_id, name):
+    return {"workoutId": w_id, "workoutName": name, "updateDate": "2026-01-01T10:00:00.0"}
+
+
+def test_targets_come_from_garmin_not_a_stale_mirror(tmp_path):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    store.refresh_summaries(FakeClient([workout(1, "DBG_1"), workout(2, "Treino A")]))
+
+    # Na Garmin, o 1 foi renomeado e o 3 foi criado desde a última sincronização
+    garmin = FakeClient([workout(1, "Treino B"), workout(2, "Treino A"), workout(3, "DBG_3")])
+    names = {w['workoutId']: w['workoutName'] for w in load_workouts(garmin, store)}
+    assert names == {1: "Treino B", 2: "Treino A", 3: "DBG_3"}
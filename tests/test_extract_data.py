@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""extract_data contra um servidor HTTP local no lugar da Garmin."""
+import os
+import gzip
+import time
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import extract_data
+
+PATH = "/web-translations/exercise_types/"
+LATENCY = 0.2
+
+
+class PropertiesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), PropertiesHandler)
+        self.files = {}             # caminho -> (bytes, charset, etag)
+        self.truncate = set()       # caminhos que caem no meio do corpo
+        self.requests = []          # (caminho, If-None-Match)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def publish(self, name, text, charset="utf-8", version=1):
+        self.files[PATH + name] = (text.encode(charset), charset, f'"{name}-v{version}"')
+
+    def url(self, name, bust="5.21.0.16"):
+        return f"http://127.0.0.1:{self.server_port}{PATH}{name}?bust={bust}"
+
+
+class PropertiesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.requests.append((path, self.headers.get('If-None-Match')))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(LATENCY)
+            if path not in server.files:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body, charset, etag = server.files[path]
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzip.compress(body)
+                encoding = 'gzip'
+            else:
+                encoding = None
+            self.send_response(200)
+            self.send_header('Content-Type', f'text/plain; charset={charset}')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(usegmt=True))
+            if encoding: self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if path in server.truncate:
+                self.wfile.write(body[:len(body) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+NAMES = ["exercise_types_pt.properties", "exercise_types_pt_BR.properties",
+         "exercise_types_en.properties", "exercise_types_es.properties"]
+
+
+@pytest.fixture
+def server():
+    server = PropertiesServer()
+    for i, name in enumerate(NAMES):
+        server.publish(name, f"exercise_type_SQUAT_{i}=Agachamento {i}\nexercise_type_PRESS_{i}=Supino {i}\n")
+    # Um arquivo em latin-1: tem que chegar no disco em UTF-8
+    server.publish(NAMES[3], "exercise_type_LEG_CURL=Flexão de pernas\n", charset="iso-8859-1")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_data, 'RAW_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(extract_data, 'DOWNLOAD_META_FILE', str(tmp_path / '.download_meta.json'))
+    return tmp_path
+
+
+def download(server):
+    return sorted(extract_data.download_data([server.url(name) for name in NAMES], workers=4))
+
+
+def filename(name):
+    return extract_data.get_filename_from_url(f"http://x/{name}?bust=5.21.0.16")
+
+
+def test_first_download_is_concurrent_and_utf8(server, raw_dir):
+    started = time.perf_counter()
+    changed = download(server)
+    elapsed = time.perf_counter() - started
+
+    assert changed == sorted(filename(n) for n in NAMES)
+    assert server.max_in_flight == len(NAMES)
+    assert elapsed < LATENCY * len(NAMES)
+    assert (raw_dir / filename(NAMES[3])).read_text(encoding='utf-8') == "exercise_type_LEG_CURL=Flexão de pernas\n"
+    assert not list(raw_dir.glob('*.part'))
+
+    meta = extract_data.load_meta()
+    assert meta['changed'] == changed
+    assert meta['files'][filename(NAMES[0])]['etag'] == f'"{NAMES[0]}-v1"'
+
+
+def test_revalidation_returns_304_and_leaves_files_alone(server, raw_dir):
+    download(server)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in raw_dir.glob('*.txt')}
+    server.requests.clear()
+
+    assert download(server) == []
+    assert sorted(etag for _, etag in server.requests) == sorted(f'"{n}-v1"' for n in NAMES)
+    assert {p.name: p.stat().st_mtime_ns for p in raw_dir.glob('*.txt')} == mtimes
+    assert extract_data.load_meta()['changed'] == []
+
+
+def test_only_changed_files_are_rewritten(server, raw_dir):
+    download(server)
+    before = (raw_dir / filename(NAMES[1])).stat().st_mtime_ns
+    # Conteúdo novo num arquivo; noutro, ETag novo com o mesmo conteúdo
+    server.publish(NAMES[0], "exercise_type_SQUAT=Agachamento livre\n", version=2)
+    body, charset, _ = server.files[PATH + NAMES[1]]
+    server.files[PATH + NAMES[1]] = (body, charset, '"other-etag"')
+
+    assert download(server) == [filename(NAMES[0])]
+    assert (raw_dir / filename(NAMES[0])).read_text(encoding='utf-8') == "exercise_type_SQUAT=Agachamento livre\n"
+    assert (raw_dir / filename(NAMES[1])).stat().st_mtime_ns == before
+
+
+def test_interrupted_download_keeps_previous_file(server, raw_dir):
+    download(server)
+    target = raw_dir / filename(NAMES[2])
+    previous = target.read_bytes()
+    server.publish(NAMES[2], "exercise_type_NEW=Novo\n" * 5000, version=2)
+    server.truncate.add(PATH + NAMES[2])
+
+    assert download(server) == []
+    assert target.read_bytes() == previous
+    assert not list(raw_dir.glob('*.part'))
+    # Metadados do arquivo continuam os da versão que está no disco
+    assert extract_data.load_meta()['files'][filename(NAMES[2])]['etag'] == f'"{NAMES[2]}-v1"'
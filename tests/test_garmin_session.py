@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import garmin_async
+import garmin_session
+from garmin_session import GarminSession, SessionPool
+
+
+class NativeClient:
+    """Parte do garminconnect >= 0.3 que a renovação usa."""
+
+    def __init__(self, fail=False):
+        self.di_refresh_token = "refresh"
+        self.fail = fail
+        self.refreshes = 0
+
+    def _refresh_di_token(self):
+        self.refreshes += 1
+        if self.fail: raise RuntimeError("refresh token revogado")
+
+    def dump(self, path):
+        with open(f"{path}/garmin_tokens.json", 'w') as f: f.write('{}')
+
+
+class Client:
+    def __init__(self, native):
+        self.client = native
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    session = GarminSession("a@b.c", "senha", token_dir=str(tmp_path))
+    session.password_logins = []
+
+    def authenticate(force_login=False):
+        session.password_logins.append(force_login)
+        return Client(NativeClient())
+
+    monkeypatch.setattr(session, '_authenticate', authenticate)
+    return session
+
+
+def test_401_refreshes_the_token_before_a_password_login(session):
+    stale = Client(NativeClient())
+    session._client = stale
+    assert session.reauthenticate(stale) is stale
+    assert stale.client.refreshes == 1
+    assert session.password_logins == []
+
+
+def test_401_logs_in_when_the_refresh_fails(session):
+    stale = Client(NativeClient(fail=True))
+    session._client = stale
+    fresh = session.reauthenticate(stale)
+    assert fresh is not stale and session.password_logins == [True]
+
+
+def test_401_reuses_a_client_renewed_by_another_thread(session):
+    session._client = Client(NativeClient())
+    stale = Client(NativeClient())
+    assert session.reauthenticate(stale) is session._client
+    assert stale.client.refreshes == 0 and session.password_logins == []
+
+
+def test_async_client_never_waits_for_the_session_lock_on_the_loop(session):
+    session._client = Client(NativeClient())    # Sem get_api_headers: cai no caminho síncrono
+    session.call = lambda *args, **kwargs: {"ok": True}
+    client = garmin_async.AsyncGarminClient(session)
+
+    held, released = threading.Event(), threading.Event()
+
+    def login_in_progress():
+        # Outro thread segurando o lock da sessão (ex.: login com senha)
+        with session._lock:
+            held.set()
+            released.wait(1)
+        released.set()
+
+    threading.Thread(target=login_in_progress).start()
+    held.wait()
+    result = asyncio.run(client.connectapi("/workout-service/workouts"))
+    done_while_locked = not released.is_set()
+    released.set()
+    assert result == {"ok": True} and done_while_locked
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(garmin_session, 'time', SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    return clock
+
+
+def make_pool(tmp_path, max_size=32, idle_ttl=1800):
+    accounts_file = tmp_path / 'accounts.json'
+    accounts_file.write_text(json.dumps({key: {"email": f"{key}@exemplo.com", "password": "x"} for key in "abc"}))
+    return SessionPool(str(accounts_file), max_size=max_size, idle_ttl=idle_ttl, token_dir=str(tmp_path / 'tokens'))
+
+
+def test_pool_reuses_the_live_session_of_an_account(tmp_path, clock):
+    pool = make_pool(tmp_path)
+    first = pool.get("a")
+    clock.now += 60
+    assert pool.get("a") is first
+    assert first.email == "a@exemplo.com"
+    assert len(pool) == 1 and pool.evictions == 0
+    with pytest.raises(KeyError):
+        pool.get("nao-existe")
+
+
+def test_pool_evicts_the_least_recently_used_session(tmp_path, clock):
+    pool = make_pool(tmp_path, max_size=2)
+    a, b = pool.get("a"), pool.get("b")
+    pool.get("a")                   # "a" volta a ser a mais recente
+    pool.get("c")
+
+    assert list(pool._sessions) == ["a", "c"]
+    assert pool.evictions == 1
+    assert pool.get("a") is a
+    assert pool.get("b") is not b   # recriada do zero
+    assert list(pool._sessions) == ["a", "b"]
+
+
+def test_pool_expires_idle_sessions(tmp_path, clock):
+    pool = make_pool(tmp_path, idle_ttl=60)
+    a = pool.get("a")
+    clock.now += 30
+    b = pool.get("b")
+    clock.now += 60                 # "a" parada há 90 s, "b" há 60 s (no limite)
+
+    assert pool.get("c") is not None
+    assert list(pool._sessions) == ["b", "c"]
+    assert pool.evictions == 1
+    assert pool.get("b") is b
+    assert pool.get("a") is not a
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import gzip
+
+import pytest
+
+from http_cache import PrecompressedBody
+
+
+def test_each_encoding_has_its_own_etag():
+    body = PrecompressedBody(b'{"a":1}' * 50)
+    etags = {body.etag_for(None), body.etag_for("gzip")} | ({body.etag_for("br")} if "br" in body.encodings else set())
+    assert len(etags) == len(body.encodings)
+    assert body.etag_for("gzip") == body.etag + "-gz"
+
+
+@pytest.mark.parametrize("accept", ["gzip", "identity"])
+def test_revalidation_matches_the_served_encoding(client, accept):
+    first = client.get('/api/exercises', headers={'Accept-Encoding': accept})
+    assert first.status_code == 200
+    assert first.headers['Vary'] == 'Accept-Encoding'
+    etag = first.headers['ETag']
+    assert etag.endswith('-gz"') == (accept == "gzip")
+    if accept == "gzip":
+        assert gzip.decompress(first.get_data())
+
+    again = client.get('/api/exercises', headers={'Accept-Encoding': accept, 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+    # ETag de outra codificação não vale: o corpo tem que vir de novo
+    other = "identity" if accept == "gzip" else "gzip"
+    switched = client.get('/api/exercises', headers={'Accept-Encoding': other, 'If-None-Match': etag})
+    assert switched.status_code == 200
+    assert switched.headers['ETag'] != etag
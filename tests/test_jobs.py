@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+
+import pytest
+
+from jobs import JobRunner, QUEUED, RUNNING, DONE, CANCELLED
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline: raise AssertionError("tempo esgotado esperando o job")
+        time.sleep(0.01)
+
+
+class Gate:
+    """Trabalho que só termina quando liberado; anota a ordem em que os jobs começam."""
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+
+    def work(self, name):
+        self.release[name] = threading.Event()
+
+        def fn(job):
+            self.started.append(name)
+            while not self.release[name].wait(0.01):
+                job.check_cancelled()
+            return name
+        return fn
+
+
+@pytest.fixture
+def runner():
+    return JobRunner(workers=8, per_account=1, ttl=60)
+
+
+def test_jobs_of_one_account_run_in_arrival_order(runner):
+    gate = Gate()
+    jobs = [runner.submit("push", gate.work(name), ["default"]) for name in "abc"]
+    wait_for(lambda: gate.started == ["a"])
+    assert [j.status for j in jobs] == [RUNNING, QUEUED, QUEUED]
+
+    for name, job in zip("abc", jobs):
+        wait_for(lambda: name in gate.started)
+        gate.release[name].set()
+        wait_for(lambda: job.status == DONE)
+    assert gate.started == ["a", "b", "c"]
+
+
+def test_fanout_job_is_keyed_by_its_target_accounts(runner):
+    gate = Gate()
+    main = runner.submit("pull", gate.work("main"), ["default"])
+    fanout = runner.submit("push", gate.work("fanout"), ["ana", "bruno"])
+    wait_for(lambda: sorted(gate.started) == ["fanout", "main"])
+
+    # "bruno" está ocupada pelo fan-out; "carla" não
+    waiting = runner.submit("push", gate.work("bruno"), ["bruno"])
+    free = runner.submit("push", gate.work("carla"), ["carla"])
+    wait_for(lambda: "carla" in gate.started)
+    assert waiting.status == QUEUED
+
+    gate.release["fanout"].set()
+    wait_for(lambda: "bruno" in gate.started)
+    for name in ("main", "bruno", "carla"): gate.release[name].set()
+    wait_for(lambda: all(j.status == DONE for j in (main, fanout, waiting, free)))
+    assert runner.list("ana") == [fanout]
+
+
+def test_later_jobs_do_not_jump_ahead_of_a_waiting_fanout(runner):
+    gate = Gate()
+    runner.submit("pull", gate.work("ana"), ["ana"])
+    fanout = runner.submit("push", gate.work("fanout"), ["ana", "bruno"])
+    later = runner.submit("push", gate.work("bruno"), ["bruno"])
+    wait_for(lambda: gate.started == ["ana"])
+    time.sleep(0.05)
+    assert (fanout.status, later.status) == (QUEUED, QUEUED)
+
+    gate.release["ana"].set()
+    wait_for(lambda: "fanout" in gate.started)
+    gate.release["fanout"].set()
+    wait_for(lambda: "bruno" in gate.started)
+    gate.release["bruno"].set()
+    wait_for(lambda: later.status == DONE)
+    assert gate.started == ["ana", "fanout", "bruno"]
+
+
+def test_cancelling_a_queued_job_never_runs_it(runner):
+    gate = Gate()
+    running = runner.submit("push", gate.work("a"), ["default"])
+    queued = runner.submit("push", gate.work("b"), ["default"])
+    wait_for(lambda: gate.started == ["a"])
+
+    assert runner.cancel(queued.id) is queued
+    assert queued.status == CANCELLED
+    gate.release["a"].set()
+    wait_for(lambda: running.status == DONE)
+    time.sleep(0.05)
+    assert gate.started == ["a"]
+    assert runner.cancel("nao-existe") is None
+
+
+def test_cancelling_a_running_job_stops_it_cooperatively(runner):
+    gate = Gate()
+    job = runner.submit("delete", gate.work("a"), ["default"])
+    wait_for(lambda: job.status == RUNNING)
+
+    runner.cancel(job.id)
+    wait_for(lambda: job.status == CANCELLED)
+    assert job.finished_at is not None
+    # A vaga da conta foi liberada
+    after = runner.submit("delete", lambda job: "ok", ["default"])
+    wait_for(lambda: after.status == DONE)
+
+
+def test_events_resume_after_the_last_event_id(runner):
+    def work(job):
+        job.set_total(3)
+        for i in range(3): job.progress({"n": i})
+        return {"done": 3}
+
+    job = runner.submit("push", work, ["default"])
+    wait_for(lambda: job.status == DONE)
+
+    everything = list(job.events(0, heartbeat=0.01))
+    assert [seq for seq, _, _ in everything] == list(range(1, len(everything) + 1))
+    assert everything[-1][1] == "end"
+
+    resumed = list(job.events(3, heartbeat=0.01))
+    assert resumed == everything[3:]
+
+
+def test_sse_route_honours_last_event_id(app_module, client):
+    def work(job):
+        for i in range(3): job.progress({"n": i})
+
+    job = app_module.JOBS.submit("push", work, app_module.MAIN_ACCOUNT)
+    wait_for(lambda: job.status == DONE)
+
+    body = client.get(f'/api/jobs/{job.id}/events', headers={'Last-Event-ID': '2'}).get_data(as_text=True)
+    ids = [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+    assert ids == list(range(3, len(job._events) + 1))
+    assert 'event: end' in body
+
+
+def test_finished_jobs_are_pruned_after_the_ttl(runner):
+    gate = Gate()
+    old = runner.submit("push", lambda job: None, ["default"])
+    wait_for(lambda: old.status == DONE)
+    old.finished_at -= 120
+    running = runner.submit("push", gate.work("a"), ["ana"])
+    recent = runner.submit("push", lambda job: None, ["bruno"])
+    wait_for(lambda: recent.status == DONE)
+
+    runner.submit("push", lambda job: None, ["carla"])
+    assert runner.get(old.id) is None
+    assert runner.get(running.id) is running
+    assert runner.get(recent.id) is recent
+    gate.release["a"].set()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import metrics
+from metrics import Counter, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Métricas dos testes num registro à parte (não aparecem no /metrics do app)
+    monkeypatch.setattr(metrics, '_REGISTRY', [])
+
+
+def buckets(histogram, **labels):
+    """{le: contagem não cumulativa} de uma série."""
+    counts = histogram._series[tuple(str(labels.get(n, "")) for n in histogram.labels)][0]
+    return dict(zip(histogram.buckets + (float('inf'),), counts))
+
+
+def test_histogram_bounds_are_inclusive():
+    h = Histogram("t_seconds", "Teste.", buckets=(0.1, 1.0))
+    for value in (0.1, 0.1000001, 1.0, 1.5, 0):
+        h.observe(value)
+    assert buckets(h) == {0.1: 2, 1.0: 2, float('inf'): 1}
+    assert h.count() == 5
+
+
+def test_counter_keeps_one_value_per_label_set():
+    c = Counter("t_total", "Teste.", ("status",))
+    c.inc(status=429)
+    c.inc(2, status="429")
+    c.inc(status=503)
+    assert c.value(status=429) == 3
+    assert c.value(status=503) == 1
+    assert c.value(status=500) == 0
+
+
+def test_prometheus_text_output():
+    c = Counter("t_total", "Chamadas.", ("route",))
+    h = Histogram("t_seconds", "Latência.", ("route",), buckets=(0.5, 1.0))
+    c.inc(route='/a"b')
+    h.observe(0.25, route="/x")
+    h.observe(2, route="/x")
+
+    assert metrics.render() == (
+        '# HELP t_total Chamadas.\n'
+        '# TYPE t_total counter\n'
+        't_total{route="/a\\"b"} 1\n'
+        '# HELP t_seconds Latência.\n'
+        '# TYPE t_seconds histogram\n'
+        't_seconds_bucket{route="/x",le="0.5"} 1\n'
+        't_seconds_bucket{route="/x",le="1.0"} 1\n'
+        't_seconds_bucket{route="/x",le="+Inf"} 2\n'
+        't_seconds_sum{route="/x"} 2.25\n'
+        't_seconds_count{route="/x"} 2\n'
+    )
+
+
+def test_endpoint_template_hides_ids():
+    assert metrics.endpoint_template("/workout-service/workout/123?x=1") == "/workout-service/workout/{id}"
+    assert metrics.endpoint_template("/workout-service/workouts") == "/workout-service/workouts"
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+
+import pytest
+
+from conftest import DATA_DIR
+from search_engine import APPROXIMATE, EXACT, FUZZY_MIN_CONFIDENCE, SynonymTable, normalize_text
+
+
+def manual_notes():
+    with open(os.path.join(DATA_DIR, 'raw', 'treino_manual.csv'), 'r', encoding='utf-8') as f:
+        return sorted({row['nota_personalizada'] for row in csv.DictReader(f)})
+
+
+# --- Busca aproximada ---
+
+@pytest.mark.parametrize("query", [
+    "costas", "peito", "treino A",
+    # Linhas reais do treino_manual.csv que a exata recusa
+    "PULL DOWN POLIA", "TRICEPS MERGULHO", "ELEVACAO LATERAL POLIA",
+])
+def test_known_words_rejected_by_exact_stay_unmatched(search_index, query):
+    assert search_index.find_scored(query) == (None, "", 0.0, None)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("agachamnto bulgaro", "LUNGE_DUMBBELL_OVERHEAD_BULGARIAN_SPLIT_SQUAT"),
+    ("hiperextencao", "HYPEREXTENSION_HYPEREXTENSION"),
+])
+def test_typo_resolves_as_approximate(search_index, query, expected):
+    found_id, _, confidence, tier = search_index.find_scored(query)
+    assert (found_id, tier) == (expected, APPROXIMATE)
+    assert FUZZY_MIN_CONFIDENCE <= confidence < 1.0
+
+
+def test_label_coverage_lowers_confidence(search_index):
+    # "Remada na frente com polia": um erro de digitação casa 1 de 4 palavras do nome
+    _, confidence = search_index.find_approximate("pulley frente")
+    assert confidence < FUZZY_MIN_CONFIDENCE
+
+
+def test_fuzzy_work_is_bounded_by_steps_not_time(search_index):
+    pos, confidence = search_index.find_approximate("agachamnto bulgaro")
+    assert pos is not None and confidence >= FUZZY_MIN_CONFIDENCE
+    assert search_index.find_approximate("agachamnto bulgaro", budget=10) == (None, 0.0)
+    # Um parágrafo colado na nota passa do limite e desiste
+    paragraph = " ".join(normalize_text(item['label']) for item in search_index.entries[:40]) + " xqzw"
+    assert search_index.find_approximate(paragraph) == (None, 0.0)
+
+
+def test_every_approximate_match_asks_for_review(app_module):
+    assert app_module.is_weak_match(APPROXIMATE)
+    assert not app_module.is_weak_match(EXACT)
+
+
+def test_exact_tier_unchanged(search_index):
+    assert search_index.find_scored("agachamento bulgaro") == (
+        "LUNGE_DUMBBELL_OVERHEAD_BULGARIAN_SPLIT_SQUAT", "Agachamento búlgaro", 1.0, EXACT)
+    assert search_index.find_scored("SQUAT_LEG_PRESS") == ("SQUAT_LEG_PRESS", "Leg Press", 1.0, EXACT)
+
+
+def test_upload_csv_leaves_weak_matches_for_review(search_index, capsys):
+    from upload_csv import resolve_exercise_ids
+    rows = [{"exercicio": "", "nota_personalizada": "agachamnto bulgaro"},
+            {"exercicio": "", "nota_personalizada": "agachamento bulgaro"}]
+    resolve_exercise_ids(rows, search_index)
+    assert rows[0]["exercicio"] == ""
+    assert rows[1]["exercicio"] == "LUNGE_DUMBBELL_OVERHEAD_BULGARIAN_SPLIT_SQUAT"
+    assert "LUNGE_DUMBBELL_OVERHEAD_BULGARIAN_SPLIT_SQUAT" in capsys.readouterr().out
+
+
+def test_synonym_groups_match_a_plain_substring_scan(search_rules):
+    table = SynonymTable(search_rules, None)
+    queries = {""} | {phrase[i:i + size] for group in table.groups for phrase in group
+                      for size in (1, 2, 3, 5) for i in range(len(phrase))} | {"zz", "q", "xyzw"}
+    for query in queries:
+        expected = [g for g, phrases in enumerate(table.groups) if any(query in p for p in phrases)]
+        assert table.matching_groups(query) == expected, query
+
+
+def test_short_synonym_queries_do_not_walk_the_suffixes():
+    rules = {f"regra {i:04d}": [f"sinonimo {i:04d} da regra"] for i in range(2000)}
+    table = SynonymTable(rules, None)
+    table._suffixes = None      # Termo curto não pode depender da busca no intervalo
+
+    assert len(table.matching_groups("re")) == 2000
+    assert table.matching_groups("1") == sorted({g for g, k in enumerate(rules) if "1" in k})
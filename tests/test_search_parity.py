@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Paridade do índice invertido com o scan linear original do find_exercise_id.
+"""
+import os
+import csv
+
+import pytest
+
+from conftest import DATA_DIR
+from search_engine import normalize_text, APPROXIMATE
+
+
+def linear_find(query, exercises, rules, db_texts):
+    """find_exercise_id de antes do índice (só o texto de cada item vem pré-normalizado)."""
+    if not query: return None, ""
+    query_norm = normalize_text(query)
+
+    if "_" in query and query.isupper() and query in exercises:
+        return query, exercises[query]['label']
+
+    search_phrases = set()
+    search_phrases.add(query_norm)
+    for rule_key, synonyms in rules.items():
+        norm_key = normalize_text(rule_key)
+        norm_synonyms = [normalize_text(s) for s in synonyms]
+        if query_norm in norm_key or any(query_norm in s for s in norm_synonyms):
+            search_phrases.add(norm_key)
+            for s in norm_synonyms: search_phrases.add(s)
+
+    best_match = None
+    best_score = 0
+    for ex_id, ex_data in exercises.items():
+        db_text = db_texts[ex_id]
+        for phrase in search_phrases:
+            if phrase in db_text:
+                score = len(phrase)
+                if db_text.startswith(phrase): score += 50
+                len_diff = len(db_text) - len(phrase)
+                score -= (len_diff * 0.1)
+                if score > best_score:
+                    best_score = score
+                    best_match = ex_data
+
+    if best_match and best_score > 3:
+        return best_match['id'], best_match['label']
+    return None, ""
+
+
+def parity_queries(exercises, rules):
+    """Termos reais e sintéticos: regras, palavras e prefixos dos nomes, IDs, o CSV de exemplo."""
+    queries = set()
+    for rule_key, synonyms in rules.items():
+        queries.add(rule_key)
+        queries.update(synonyms)
+    for i, item in enumerate(exercises):
+        words = item['label'].split()
+        if i % 7 == 0: queries.add(item['label'])
+        if i % 11 == 0: queries.add(" ".join(words[:2]))
+        if i % 13 == 0: queries.add(words[0][:4])
+        if i % 29 == 0: queries.add(item['id'])
+        if i % 31 == 0: queries.add(item['label'].upper())
+    with open(os.path.join(DATA_DIR, 'raw', 'treino_manual.csv'), 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            queries.update((row['exercicio'], row['nota_personalizada']))
+    queries.update(["", "ab", "supino reto", "NOT_AN_ID", "zzzz"])
+    return sorted(queries)
+
+
+@pytest.fixture(scope="module")
+def linear(exercises, search_rules):
+    by_id = {item['id']: item for item in exercises}
+    db_texts = {ex_id: normalize_text((item.get('search_term', '') or '') + " " + item['label'])
+                for ex_id, item in by_id.items()}
+    return lambda query: linear_find(query, by_id, search_rules, db_texts)
+
+
+def test_index_matches_linear_scan(search_index, exercises, search_rules, linear):
+    queries = parity_queries(exercises, search_rules)
+    assert len(queries) > 400
+
+    mismatches = []
+    for query in queries:
+        expected = linear(query)
+        found_id, label, _, tier = search_index.find_scored(query)
+        if tier == APPROXIMATE:
+            # A aproximada só pode aparecer onde o scan antigo não achava nada
+            if expected != (None, ""): mismatches.append((query, expected, found_id))
+        elif (found_id, label) != expected:
+            mismatches.append((query, expected, found_id))
+    assert mismatches == []
+
+
+def test_find_many_matches_find(search_index, exercises, search_rules):
+    queries = parity_queries(exercises, search_rules)
+    assert search_index.find_many(queries + queries[:50]) == [search_index.find(q) for q in queries + queries[:50]]
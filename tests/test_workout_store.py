@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from workout_store import WorkoutStore, name_filter
+
+NAMES = ["Treino A", "treino b", "SUPINO 100%", "Supino_Reto", "Força ÇÃO", "força ção 2",
+         "Corrida leve", "A\\B costas", "Perna 50% off", "Treino Z"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WorkoutStore(str(tmp_path / 'workouts.db'))
+    store.save_summaries([
+        {"workoutId": i + 1, "workoutName": name,
+         "sportType": {"sportTypeKey": "running" if "Corrida" in name else "strength_training"},
+         "updateDate": f"2026-01-{i + 1:02d}T10:00:00.0"}
+        for i, name in enumerate(NAMES)])
+    return store
+
+
+def expected(store, matches, sport=None):
+    """Resposta da busca antiga: filtro em Python sobre a tabela inteira."""
+    rows = [r for r in store.search(sport=sport)[1] if matches(r['name'])]
+    return len(rows), rows
+
+
+@pytest.mark.parametrize("kind, text", [
+    ("all", ""), ("contains", "treino"), ("contains", "%"), ("contains", "_"), ("contains", "\\"),
+    ("starts_with", "supino"), ("ends_with", "ÇÃO"), ("contains", "ção"), ("contains", "50% o"),
+    ("regex", r"^treino [a-b]$"), ("regex", r"\d"), ("contains", "nada disso"),
+])
+def test_sql_filters_match_the_python_predicate(store, kind, text):
+    matches = name_filter(kind, text)
+    assert store.search(matches) == expected(store, matches)
+    assert store.search(matches, sport="strength_training") == expected(store, matches, "strength_training")
+
+
+def test_pagination_uses_the_filtered_total(store):
+    matches = name_filter("contains", "o")
+    total, rows = expected(store, matches)
+    assert total > 4
+    assert store.search(matches, offset=1, limit=3) == (total, rows[1:4])
+    assert store.search(matches, offset=total, limit=3) == (total, [])
+    assert [r['name'] for r in store.search(offset=0, limit=2)[1]] == ["Treino Z", "Perna 50% off"]
+
+
+def test_dates_are_inclusive(store):
+    total, rows = store.search(date_from="2026-01-02", date_to="2026-01-03")
+    assert total == 2 and [r['workout_id'] for r in rows] == [3, 2]
+
+
+def test_bad_filters(store):
+    with pytest.raises(ValueError): name_filter("regex", "(")
+    with pytest.raises(ValueError): name_filter("fuzzy", "x")
+    assert name_filter("regex", "treino")("TREINO A")